@@ -1,21 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, func, or_, select, delete
+from typing import List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import base64
+import json
+import os
+import tempfile
 from app.core.database import get_db
 from app.schemas import (
     QuestionResponse, QuestionCreate, QuestionUpdate, DashboardStats,
-    UserResponse
+    UserResponse, TimeseriesResponse
 )
 from app.models import (
     Question, QuestionOption, QuestionnaireResponse, RecommendationResult, 
     User, UserRole
 )
 from app.api.v1.auth import get_current_user
+from app.api.v1.questionnaire import questions_cache, inference_executor, ml_service, result_cache, response_writer
+from app.ml.snapshot import bump_revision, questionnaire_snapshot
+from app.services.aggregates import (
+    RESULTS_COURSE_PREFIX, TOTAL_RESPONSES, TOTAL_RESULTS, TOTAL_USERS,
+    read_dashboard_counters, responses_day_key
+)
+from app.services.export import (
+    EXPORT_FILE_TYPES, EXPORT_FORMATS, export_filename, stream_csv, write_export
+)
+from app.services.export_jobs import ExportJobLimitError, export_jobs
+from app.services.results_snapshot import (
+    ResultsColumns, confidence_percentiles, course_crosstab, results_snapshot, score_histograms
+)
+from app.services.rollups import DEFAULT_RANGES, GRANULARITIES, read_timeseries, to_utc_naive
 
 router = APIRouter(prefix="/admin", tags=["administration"])
 
+# Tamanho máximo de página em /admin/responses
+MAX_PAGE_SIZE = 1000
+
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
     """Dependency para verificar se usuário é admin"""
     if current_user.role != UserRole.ADMIN:
@@ -25,44 +50,56 @@ async def get_admin_user(current_user: User = Depends(get_current_user)) -> User
         )
     return current_user
 
+async def questions_changed(db: AsyncSession):
+    """Grava as alterações nas perguntas com a revisão incrementada, publica novo snapshot e invalida o cache
+
+    A revisão sobe na mesma transação das alterações; os outros workers a comparam com a sua a cada leitura.
+    """
+    await db.run_sync(bump_revision)
+    await db.commit()
+    await db.run_sync(questionnaire_snapshot.refresh)
+    questions_cache.invalidate()
+
+async def load_question(db: AsyncSession, question_id: int) -> Optional[Question]:
+    """Carrega pergunta com suas opções (relacionamentos não carregam sob demanda em async)"""
+    return await db.scalar(
+        select(Question).options(
+            selectinload(Question.options)
+        ).where(
+            Question.id == question_id
+        ).execution_options(populate_existing=True)
+    )
+
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Retorna estatísticas do dashboard administrativo"""
     
-    # Total de respostas
-    total_responses = db.query(QuestionnaireResponse).count()
-    
-    # Total de usuários
-    total_users = db.query(User).count()
-    
-    # Respostas hoje
+    # Contadores mantidos a cada submissão e cadastro; leitura independe do tamanho das tabelas
     today = datetime.utcnow().date()
-    responses_today = db.query(QuestionnaireResponse).filter(
-        func.date(QuestionnaireResponse.created_at) == today
-    ).count()
+    counters = await read_dashboard_counters(db, today)
     
-    # Curso mais recomendado
-    most_recommended = db.query(
-        RecommendationResult.recommended_course,
-        func.count(RecommendationResult.recommended_course).label('count')
-    ).group_by(
-        RecommendationResult.recommended_course
-    ).order_by(desc('count')).first()
+    def counter(key: str) -> int:
+        return counters.get(key, (0, 0.0))[0]
     
-    most_recommended_course = most_recommended[0] if most_recommended else "Nenhum"
+    # Curso mais recomendado
+    course_counts = [
+        (count, key[len(RESULTS_COURSE_PREFIX):])
+        for key, (count, _) in counters.items()
+        if key.startswith(RESULTS_COURSE_PREFIX) and count > 0
+    ]
+    most_recommended_course = max(course_counts)[1] if course_counts else "Nenhum"
     
     # Confiança média
-    avg_confidence = db.query(
-        func.avg(RecommendationResult.confidence_score)
-    ).scalar() or 0.0
+    results_count, confidence_sum = counters.get(TOTAL_RESULTS, (0, 0.0))
+    avg_confidence = confidence_sum / results_count if results_count else 0.0
     
     return DashboardStats(
-        total_responses=total_responses,
-        total_users=total_users,
-        responses_today=responses_today,
+        total_responses=counter(TOTAL_RESPONSES),
+        total_users=counter(TOTAL_USERS),
+        responses_today=counter(responses_day_key(today)),
         most_recommended_course=most_recommended_course,
         average_confidence=round(avg_confidence, 2)
     )
@@ -71,17 +108,19 @@ async def get_dashboard_stats(
 async def get_all_questions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Lista todas as perguntas (admin)"""
-    questions = db.query(Question).offset(skip).limit(limit).all()
-    return questions
+    result = await db.execute(
+        select(Question).options(selectinload(Question.options)).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 @router.post("/questions", response_model=QuestionResponse)
 async def create_question(
     question_data: QuestionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Cria nova pergunta"""
@@ -95,7 +134,7 @@ async def create_question(
             is_active=question_data.is_active
         )
         db.add(db_question)
-        db.flush()  # Para obter o ID
+        await db.flush()  # Para obter o ID
         
         # Criar opções
         for option_data in question_data.options:
@@ -112,12 +151,11 @@ async def create_question(
             )
             db.add(db_option)
         
-        db.commit()
-        db.refresh(db_question)
-        return db_question
+        await questions_changed(db)
+        return await load_question(db, db_question.id)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao criar pergunta: {str(e)}"
@@ -127,11 +165,11 @@ async def create_question(
 async def update_question(
     question_id: int,
     question_data: QuestionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Atualiza pergunta existente"""
-    question = db.query(Question).filter(Question.id == question_id).first()
+    question = await db.get(Question, question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,9 +192,9 @@ async def update_question(
         # Se novas opções foram fornecidas, substituir as existentes
         if question_data.options is not None:
             # Remover opções existentes
-            db.query(QuestionOption).filter(
-                QuestionOption.question_id == question_id
-            ).delete()
+            await db.execute(
+                delete(QuestionOption).where(QuestionOption.question_id == question_id)
+            )
             
             # Criar novas opções
             for option_data in question_data.options:
@@ -173,12 +211,11 @@ async def update_question(
                 )
                 db.add(db_option)
         
-        db.commit()
-        db.refresh(question)
-        return question
+        await questions_changed(db)
+        return await load_question(db, question.id)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao atualizar pergunta: {str(e)}"
@@ -187,11 +224,13 @@ async def update_question(
 @router.delete("/questions/{question_id}")
 async def delete_question(
     question_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Remove pergunta"""
-    question = db.query(Question).filter(Question.id == question_id).first()
+    # Respostas ainda no write-behind também contam como associadas
+    await response_writer.flush()
+    question = await db.get(Question, question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -200,23 +239,25 @@ async def delete_question(
     
     try:
         # Verificar se há respostas associadas
-        responses_count = db.query(QuestionnaireResponse).filter(
-            QuestionnaireResponse.question_id == question_id
-        ).count()
+        responses_count = await db.scalar(
+            select(func.count()).select_from(QuestionnaireResponse).where(
+                QuestionnaireResponse.question_id == question_id
+            )
+        )
         
         if responses_count > 0:
             # Não deletar, apenas desativar
             question.is_active = False
-            db.commit()
+            await questions_changed(db)
             return {"message": f"Pergunta desativada (havia {responses_count} respostas associadas)"}
         else:
             # Deletar pergunta e opções (cascade)
-            db.delete(question)
-            db.commit()
+            await db.delete(question)
+            await questions_changed(db)
             return {"message": "Pergunta removida com sucesso"}
             
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao remover pergunta: {str(e)}"
@@ -227,49 +268,80 @@ async def get_responses_analytics(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     course: Optional[str] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    page_size: int = 100,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
-    """Retorna analytics de respostas com filtros"""
-    
-    query = db.query(RecommendationResult)
+    """Retorna analytics de respostas com filtros; resultados paginados por cursor"""
     
     # Aplicar filtros
+    filters = []
     if start_date:
-        query = query.filter(RecommendationResult.created_at >= start_date)
+        filters.append(RecommendationResult.created_at >= start_date)
     if end_date:
-        query = query.filter(RecommendationResult.created_at <= end_date)
+        filters.append(RecommendationResult.created_at <= end_date)
     if course:
-        query = query.filter(RecommendationResult.recommended_course == course)
+        filters.append(RecommendationResult.recommended_course == course)
     
-    results = query.all()
+    # Estatísticas calculadas no banco
+    total_results, avg_confidence, avg_processing_time = (await db.execute(
+        select(
+            func.count(),
+            func.avg(RecommendationResult.confidence_score),
+            func.avg(RecommendationResult.processing_time_ms)
+        ).select_from(RecommendationResult).where(*filters)
+    )).one()
     
-    # Calcular estatísticas
-    total_results = len(results)
     if total_results == 0:
         return {
             "total_results": 0,
             "course_distribution": {},
             "average_confidence": 0,
-            "average_processing_time": 0
+            "average_processing_time": 0,
+            "results": [],
+            "next_cursor": None
         }
     
     # Distribuição por curso
-    course_distribution = {}
-    total_confidence = 0
-    total_processing_time = 0
+    course_distribution = dict((await db.execute(
+        select(RecommendationResult.recommended_course, func.count()).where(*filters).group_by(
+            RecommendationResult.recommended_course
+        )
+    )).all())
+    
+    # Página de resultados, do mais recente para o mais antigo, a partir do cursor
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    page_query = select(
+        RecommendationResult.id,
+        RecommendationResult.session_id,
+        RecommendationResult.recommended_course,
+        RecommendationResult.confidence_score,
+        RecommendationResult.created_at
+    ).where(*filters)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        # Comparações com a coluna aplicam o tipo dela ao parâmetro (formato do SQLite incluso)
+        page_query = page_query.where(or_(
+            RecommendationResult.created_at < cursor_created_at,
+            and_(RecommendationResult.created_at == cursor_created_at, RecommendationResult.id < cursor_id)
+        ))
+    page = (await db.execute(
+        page_query.order_by(
+            RecommendationResult.created_at.desc(), RecommendationResult.id.desc()
+        ).limit(page_size + 1)
+    )).all()
     
-    for result in results:
-        course = result.recommended_course
-        course_distribution[course] = course_distribution.get(course, 0) + 1
-        total_confidence += result.confidence_score
-        total_processing_time += result.processing_time_ms
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
     
     return {
         "total_results": total_results,
         "course_distribution": course_distribution,
-        "average_confidence": round(total_confidence / total_results, 2),
-        "average_processing_time": round(total_processing_time / total_results, 2),
+        "average_confidence": round(avg_confidence or 0.0, 2),
+        "average_processing_time": round(avg_processing_time or 0.0, 2),
         "results": [
             {
                 "id": r.id,
@@ -277,30 +349,137 @@ async def get_responses_analytics(
                 "recommended_course": r.recommended_course,
                 "confidence_score": r.confidence_score,
                 "created_at": r.created_at
-            } for r in results
-        ]
+            } for r in page
+        ],
+        "next_cursor": next_cursor
+    }
+
+def encode_cursor(created_at: datetime, result_id: int) -> str:
+    """Cursor opaco com a posição (created_at, id) do último item da página"""
+    payload = json.dumps([created_at.isoformat(), result_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, result_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(result_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+
+@router.get("/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    granularity: str = "day",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    course: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Série temporal de resultados por curso (hora, dia ou semana), a partir das rollups horárias"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Granularidade deve ser: hour, day ou week"
+        )
+    
+    # Buckets são guardados em UTC sem fuso
+    end_date = to_utc_naive(end_date) if end_date else datetime.utcnow()
+    start_date = to_utc_naive(start_date) if start_date else end_date - DEFAULT_RANGES[granularity]
+    if start_date >= end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date deve ser anterior a end_date"
+        )
+    
+    points = await read_timeseries(db, granularity, start_date, end_date, course)
+    
+    return TimeseriesResponse(
+        granularity=granularity,
+        start_date=start_date,
+        end_date=end_date,
+        points=points
+    )
+
+async def load_results_snapshot() -> ResultsColumns:
+    """Colunas do snapshot de analytics; 503 enquanto ainda não foi gerado"""
+    columns = results_snapshot.load()
+    if columns is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Snapshot de analytics ainda não disponível"
+        )
+    return columns
+
+def snapshot_info(columns: ResultsColumns) -> dict:
+    return {
+        "rows": len(columns),
+        "watermark": columns.watermark,
+        "pending_ids": columns.pending_ids,
+        "refreshed_at": columns.refreshed_at
     }
 
+@router.get("/analytics/scores")
+async def get_score_histograms(
+    bins: int = 20,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Distribuição das pontuações por curso (histogramas sobre o snapshot colunar)"""
+    columns = await load_results_snapshot()
+    bins = min(max(bins, 1), 200)
+    histograms = await asyncio.to_thread(
+        score_histograms, columns, columns.mask(start_date, end_date), bins
+    )
+    return {"snapshot": snapshot_info(columns), "histograms": histograms}
+
+@router.get("/analytics/confidence")
+async def get_confidence_percentiles(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Percentis da confiança, no total e por curso recomendado"""
+    columns = await load_results_snapshot()
+    percentiles = await asyncio.to_thread(
+        confidence_percentiles, columns, columns.mask(start_date, end_date), [10, 25, 50, 75, 90, 95, 99]
+    )
+    return {"snapshot": snapshot_info(columns), "confidence": percentiles}
+
+@router.get("/analytics/crosstab")
+async def get_course_crosstab(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Curso recomendado x curso com a segunda maior pontuação"""
+    columns = await load_results_snapshot()
+    crosstab = await asyncio.to_thread(course_crosstab, columns, columns.mask(start_date, end_date))
+    return {"snapshot": snapshot_info(columns), "crosstab": crosstab}
+
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Lista todos os usuários"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.put("/users/{user_id}/role")
 async def update_user_role(
     user_id: int,
     new_role: UserRole,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Atualiza role de um usuário"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -308,18 +487,18 @@ async def update_user_role(
         )
     
     user.role = new_role
-    db.commit()
+    await db.commit()
     
     return {"message": f"Role do usuário {user.email} atualizada para {new_role.value}"}
 
 @router.put("/users/{user_id}/status")
 async def toggle_user_status(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Ativa/desativa um usuário"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -327,7 +506,7 @@ async def toggle_user_status(
         )
     
     user.is_active = not user.is_active
-    db.commit()
+    await db.commit()
     
     status_text = "ativado" if user.is_active else "desativado"
     return {"message": f"Usuário {user.email} {status_text}"}
@@ -337,23 +516,137 @@ async def export_data(
     format: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     """Exporta dados em formato especificado (CSV, Excel, Word)"""
     
-    if format not in ["csv", "excel", "word"]:
+    if format not in EXPORT_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Formato deve ser: csv, excel ou word"
         )
     
-    # TODO: Implementar exportação real
-    # Por enquanto, retornar placeholder
+    # Períodos longos: job em segundo plano, acompanhado em /export/jobs/{job_id}
+    if background:
+        try:
+            job = await asyncio.to_thread(export_jobs.submit, format, start_date, end_date, current_user.id)
+        except ExportJobLimitError:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Limite de exportações simultâneas atingido. Tente novamente mais tarde."
+            )
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=export_jobs.describe(job))
+    
+    filename = export_filename(format)
+    _, media_type = EXPORT_FILE_TYPES[format]
+    
+    # CSV sai em pedaços direto do cursor do banco
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(start_date, end_date),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    # Excel e Word são montados em arquivo temporário, em uma thread de trabalho
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write_export, format, path, start_date, end_date)
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao exportar dados: {str(e)}"
+        )
+    
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        background=BackgroundTask(os.remove, path)
+    )
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    """Retorna estado, progresso e ETA de um job de exportação"""
+    job = export_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job de exportação não encontrado"
+        )
+    return export_jobs.describe(job)
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    """Baixa o arquivo de um job concluído (aceita requisições com Range)"""
+    job = export_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job de exportação não encontrado"
+        )
+    
+    path = export_jobs.artifact_path(job)
+    if job["status"] != "completed" or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Exportação ainda não disponível (status: {job['status']})"
+        )
+    
+    # FileResponse do Starlette responde a Range com 206 (downloads retomáveis)
+    _, media_type = EXPORT_FILE_TYPES[job["format"]]
+    created = datetime.utcfromtimestamp(job["created_at"]).strftime("%Y%m%d_%H%M%S")
+    extension = os.path.splitext(path)[1]
+    return FileResponse(path, media_type=media_type, filename=f"resultados_{created}{extension}")
+
+@router.get("/model/shadow")
+async def get_shadow_summary(current_user: User = Depends(get_admin_user)):
+    """Comparação entre a versão atual e a candidata em modo sombra (contadores deste worker)"""
+    if inference_executor.shadow is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Modo sombra desativado"
+        )
+    return {"pid": os.getpid(), **inference_executor.shadow.summary()}
+
+@router.post("/model/shadow/promote")
+async def promote_shadow_model(current_user: User = Depends(get_admin_user)):
+    """Promove a versão candidata; os demais workers trocam ao verificar o ponteiro"""
+    version = ml_service.promote_shadow()
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhuma versão candidata em modo sombra"
+        )
+    return {"message": "Versão candidata promovida", "version": version}
+
+@router.delete("/model/shadow")
+async def discard_shadow_model(current_user: User = Depends(get_admin_user)):
+    """Encerra o modo sombra sem promover a candidata"""
+    version = ml_service.discard_shadow()
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhuma versão candidata em modo sombra"
+        )
+    return {"message": "Versão candidata descartada", "version": version}
+
+@router.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_admin_user)):
+    """Retorna métricas internas da API (inferência, caches)"""
     return {
-        "message": f"Exportação em formato {format} será implementada",
-        "format": format,
-        "start_date": start_date,
-        "end_date": end_date
+        "inference": inference_executor.stats(),
+        "result_cache": result_cache.stats(),
+        "response_writer": response_writer.stats(),
+        "export_jobs": export_jobs.stats()
     }
-
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.schemas import UserCreate, UserResponse, TokenResponse
 from app.utils.auth import verify_password, get_password_hash, create_access_token, create_refresh_token, verify_token
 from app.models import User
+from app.services.aggregates import TOTAL_USERS, increment_counters
 from datetime import timedelta
 from app.core.config import settings
 
@@ -14,10 +16,10 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Registra um novo usuário"""
     # Verificar se email já existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -33,16 +35,17 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await increment_counters(db, {TOTAL_USERS: (1, 0.0)})
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=TokenResponse)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """Autentica usuário e retorna tokens JWT"""
     # Buscar usuário
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -71,7 +74,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     )
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
     """Renova access token usando refresh token"""
     payload = verify_token(refresh_token, "refresh")
     if not payload:
@@ -88,7 +91,7 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         )
     
     # Verificar se usuário existe e está ativo
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, int(user_id))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -115,7 +118,7 @@ async def logout():
     return {"message": "Logout realizado com sucesso"}
 
 # Dependency para obter usuário atual
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
     """Dependency para obter usuário atual a partir do token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -131,14 +134,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if not user_id:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, int(user_id))
     if not user:
         raise credentials_exception
     
     return user
 
 # Dependency para usuário opcional (para endpoints que funcionam com ou sem autenticação)
-async def get_current_user_optional(token: str = None, db: Session = Depends(get_db)) -> User:
+async def get_current_user_optional(token: str = None, db: AsyncSession = Depends(get_db)) -> User:
     """Dependency para obter usuário atual opcional"""
     if not token:
         return None
@@ -152,7 +155,7 @@ async def get_current_user_optional(token: str = None, db: Session = Depends(get
         if not user_id:
             return None
         
-        user = db.query(User).filter(User.id == int(user_id)).first()
+        user = await db.get(User, int(user_id))
         return user
     except Exception:
         return None
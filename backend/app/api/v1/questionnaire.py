@@ -1,109 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.cache import BodyCache, LRUCache, etag_matches
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.write_buffer import WriteBehindBuffer
 from app.schemas import (
     QuestionResponse, QuestionnaireSubmission, RecommendationResultResponse,
     EmailResultRequest
 )
 from app.models import Question, QuestionOption, QuestionnaireResponse, RecommendationResult, User, QuestionType
 from app.api.v1.auth import get_current_user_optional
+from app.ml.executor import InferenceExecutor
 from app.ml.service import MLService
+from app.ml.snapshot import QuestionnaireSnapshot, SnapshotValidationError, bump_revision, questionnaire_revision_async, questionnaire_snapshot
+from app.services.aggregates import increment_counters, response_increments, result_increments
+from app.services.rollups import record_responses, record_result
 from app.utils.auth import generate_session_id
+from datetime import datetime, timezone
+import hashlib
+import json
 import time
 
 router = APIRouter(prefix="/questionnaire", tags=["questionnaire"])
 
-# Instância do serviço ML
-ml_service = MLService()
+# Instância do serviço ML; os modelos são carregados em segundo plano na inicialização
+ml_service = MLService(
+    model_path=settings.model_path,
+    autoload=False,
+    shared_artifacts=settings.ml_shared_artifacts,
+    compiled_forest=settings.ml_compiled_forest,
+    versions_to_keep=settings.model_versions_to_keep,
+    lookup_max_combinations=settings.ml_lookup_max_combinations,
+    lookup_memo_size=settings.ml_lookup_memo_size
+)
+
+# Pool dedicado para a inferência, fora do event loop
+inference_executor = InferenceExecutor(
+    ml_service,
+    mode=settings.ml_executor,
+    max_workers=settings.ml_executor_workers,
+    max_concurrency=settings.ml_max_concurrency,
+    timeout_ms=settings.ml_inference_timeout_ms,
+    batch_max_size=settings.ml_batch_max_size,
+    batch_window_ms=settings.ml_batch_window_ms,
+    shadow_enabled=settings.ml_shadow_enabled,
+    shadow_budget_ms=settings.ml_shadow_budget_ms,
+    shadow_max_pending=settings.ml_shadow_max_pending
+)
+
+# Corpo pré-serializado de GET /questions, atrelado à revisão do questionário no banco
+questions_cache = BodyCache(ttl_seconds=settings.questions_cache_ttl_seconds)
+
+QUESTION_LIST_ADAPTER = TypeAdapter(List[QuestionResponse])
+
+# Resultados serializados por session_id (resultados não mudam depois de gravados)
+result_cache = LRUCache(
+    max_entries=settings.result_cache_max_entries,
+    max_bytes=settings.result_cache_max_bytes,
+    ttl_seconds=settings.result_cache_ttl_seconds
+)
+
+async def count_responses(db: AsyncSession, rows: List[dict]):
+    """Soma aos contadores e às rollups as respostas gravadas depois do resultado"""
+    await increment_counters(db, response_increments(rows))
+    await record_responses(db, rows)
+
+# Respostas individuais são dados de análise; podem ser gravadas depois do resultado
+response_writer = WriteBehindBuffer(
+    QuestionnaireResponse,
+    max_rows=settings.responses_buffer_max_rows,
+    flush_rows=settings.responses_flush_rows,
+    flush_interval_ms=settings.responses_flush_interval_ms,
+    durability=settings.responses_durability,
+    enqueue_timeout_ms=settings.responses_enqueue_timeout_ms,
+    on_flush=count_responses
+)
 
 @router.get("/questions", response_model=List[QuestionResponse])
-async def get_active_questions(db: Session = Depends(get_db)):
+async def get_active_questions(request: Request, db: AsyncSession = Depends(get_db)):
     """Retorna todas as perguntas ativas ordenadas"""
     try:
-        questions = db.query(Question).filter(
-            Question.is_active == True
-        ).order_by(Question.order).all()
-        
-        if not questions:
-            # Criar perguntas de exemplo se não existirem
-            try:
-                create_sample_questions(db)
-                questions = db.query(Question).filter(
+        # Mesma revisão que o snapshot confere: alterações feitas em outro worker valem aqui também
+        revision = await questionnaire_revision_async(db)
+        cached = questions_cache.get(revision)
+        if cached is None:
+            result = await db.execute(
+                select(Question).options(
+                    selectinload(Question.options)
+                ).where(
                     Question.is_active == True
-                ).order_by(Question.order).all()
-            except Exception as create_error:
-                print(f"Erro ao criar perguntas de exemplo: {create_error}")
-                return []
-        
-        return questions
+                ).order_by(Question.order)
+            )
+            questions = result.scalars().all()
     except Exception as e:
         print(f"Erro ao buscar perguntas: {e}")
         return []
+    
+    if cached is None:
+        # Serializar uma única vez; as próximas requisições reutilizam os bytes
+        body = QUESTION_LIST_ADAPTER.dump_json(
+            [QuestionResponse.model_validate(question) for question in questions]
+        )
+        cached = questions_cache.set(body, revision)
+    
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={settings.questions_cache_max_age}"
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 @router.post("/submit", response_model=RecommendationResultResponse)
 async def submit_questionnaire(
     submission: QuestionnaireSubmission,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Submete respostas do questionário e retorna recomendação"""
     start_time = time.time()
+    # Mesmo instante (UTC) em created_at, nos contadores e nas rollups
+    submitted_at = datetime.now(timezone.utc)
+    fingerprint = submission_fingerprint(submission)
+    
+    # Retries da mesma submissão devolvem o resultado já gravado, sem escrita nem modelo
+    existing = await find_submitted_result(db, submission.session_id, fingerprint)
+    if existing:
+        return result_response(existing)
     
     try:
-        # Salvar respostas no banco
-        for response_data in submission.responses:
-            # Verificar se pergunta e opção existem
-            question = db.query(Question).filter(Question.id == response_data.question_id).first()
-            if not question:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Pergunta {response_data.question_id} não encontrada"
-                )
-            
-            option = db.query(QuestionOption).filter(
-                QuestionOption.id == response_data.selected_option_id
-            ).first()
-            if not option:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Opção {response_data.selected_option_id} não encontrada"
-                )
-            
-            # Criar resposta
-            db_response = QuestionnaireResponse(
-                user_id=current_user.id if current_user else None,
-                session_id=submission.session_id,
-                question_id=response_data.question_id,
-                selected_option_id=response_data.selected_option_id,
-                response_time_ms=response_data.response_time_ms
-            )
-            db.add(db_response)
-        
-        db.commit()
-        
-        # Buscar respostas com pesos para classificação
-        responses_with_weights = []
-        for response_data in submission.responses:
-            option = db.query(QuestionOption).filter(
-                QuestionOption.id == response_data.selected_option_id
-            ).first()
-            
-            responses_with_weights.append({
-                "question_id": response_data.question_id,
-                "selected_option_id": response_data.selected_option_id,
-                "response_time_ms": response_data.response_time_ms,
-                "weights": {
-                    "ti": option.weight_ti,
-                    "enfermagem": option.weight_enfermagem,
-                    "logistica": option.weight_logistica,
-                    "administracao": option.weight_administracao,
-                    "estetica": option.weight_estetica
-                }
-            })
+        # Validar e pontuar contra o snapshot em memória, sem consultar o banco
+        snapshot = await questionnaire_snapshot.get_async(db)
+        responses_with_weights = build_responses_with_weights(snapshot, submission)
         
         # Classificar usando ML
-        classification_result = ml_service.classify_responses(responses_with_weights)
+        classification_result = await inference_executor.classify(responses_with_weights, snapshot)
         
         # Salvar resultado
         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -119,28 +157,148 @@ async def submit_questionnaire(
             recommended_course=classification_result["recommended_course"],
             confidence_score=classification_result["confidence_score"],
             model_version=classification_result["model_version"],
-            processing_time_ms=processing_time_ms
+            snapshot_version=snapshot.version,
+            submission_fingerprint=fingerprint,
+            processing_time_ms=processing_time_ms,
+            created_at=submitted_at
         )
         
         db.add(db_result)
-        db.commit()
-        db.refresh(db_result)
         
-        return db_result
+        response_rows = [
+            {
+                "user_id": current_user.id if current_user else None,
+                "session_id": submission.session_id,
+                "question_id": response_data.question_id,
+                "selected_option_id": response_data.selected_option_id,
+                "response_time_ms": response_data.response_time_ms,
+                "created_at": submitted_at
+            }
+            for response_data in submission.responses
+        ]
+        
+        # Sem write-behind, as respostas entram em lote na mesma transação do resultado
+        write_behind = settings.responses_write_behind and bool(response_rows)
+        if response_rows and not write_behind:
+            await db.execute(insert(QuestionnaireResponse), response_rows)
         
+        # Contadores do dashboard na mesma transação; um conflito de sessão desfaz tudo junto.
+        # Respostas em write-behind só são contadas na transação que as grava
+        response_count = 0 if write_behind else len(response_rows)
+        await increment_counters(db, result_increments(
+            classification_result["recommended_course"],
+            classification_result["confidence_score"],
+            response_count,
+            submitted_at
+        ))
+        await record_result(
+            db,
+            classification_result["recommended_course"],
+            classification_result["confidence_score"],
+            response_count,
+            submitted_at
+        )
+        
+        await db.commit()
+        await db.refresh(db_result)
+        
+        # Com write-behind, enfileira só depois do resultado gravado (evita respostas de submissões duplicadas)
+        if write_behind and not await response_writer.add(response_rows):
+            try:
+                await db.execute(insert(QuestionnaireResponse), response_rows)
+                await count_responses(db, response_rows)
+                await db.commit()
+            except Exception as e:
+                # O resultado já está gravado; a falha afeta apenas os dados de análise
+                await db.rollback()
+                print(f"Erro ao gravar respostas da sessão {submission.session_id}: {e}")
+        
+        # Já deixa o cache aquecido para a página de resultado
+        return result_response(db_result)
+        
+    except IntegrityError:
+        # Outra requisição da mesma sessão gravou primeiro
+        await db.rollback()
+        existing = await find_submitted_result(db, submission.session_id, fingerprint)
+        if existing:
+            return result_response(existing)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro ao processar questionário: conflito ao gravar resultado"
+        )
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao processar questionário: {str(e)}"
         )
 
+def result_response(result: RecommendationResult) -> Response:
+    """Serializa o resultado, guarda no cache e devolve a resposta JSON"""
+    body = RecommendationResultResponse.model_validate(result).model_dump_json().encode()
+    result_cache.set(result.session_id, body)
+    return Response(content=body, media_type="application/json")
+
+def submission_fingerprint(submission: QuestionnaireSubmission) -> str:
+    """Impressão digital da sessão e das respostas (independe da ordem e dos tempos)"""
+    answers = sorted(
+        (response_data.question_id, response_data.selected_option_id)
+        for response_data in submission.responses
+    )
+    payload = json.dumps([submission.session_id, answers], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def find_submitted_result(db: AsyncSession, session_id: str, fingerprint: str) -> Optional[RecommendationResult]:
+    """Retorna o resultado já gravado para a sessão; 409 se as respostas forem outras"""
+    existing = await db.scalar(
+        select(RecommendationResult).where(RecommendationResult.session_id == session_id)
+    )
+    if existing is None:
+        return None
+    
+    # Resultados anteriores à impressão digital são tratados como a mesma submissão
+    if existing.submission_fingerprint not in (None, fingerprint):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Sessão já submetida com respostas diferentes"
+        )
+    return existing
+
+def build_responses_with_weights(snapshot: QuestionnaireSnapshot, submission: QuestionnaireSubmission) -> List[dict]:
+    """Valida a submissão contra o snapshot e monta as respostas com seus pesos"""
+    try:
+        rows = snapshot.rows_for(submission.responses)
+    except SnapshotValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return [
+        {
+            "question_id": response_data.question_id,
+            "selected_option_id": response_data.selected_option_id,
+            "response_time_ms": response_data.response_time_ms,
+            "weights": snapshot.weights_for(row)
+        }
+        for response_data, row in zip(submission.responses, rows)
+    ]
+
 @router.get("/result/{session_id}", response_model=RecommendationResultResponse)
-async def get_result(session_id: str, db: Session = Depends(get_db)):
+async def get_result(session_id: str, db: AsyncSession = Depends(get_db)):
     """Retorna resultado de uma sessão específica"""
-    result = db.query(RecommendationResult).filter(
-        RecommendationResult.session_id == session_id
-    ).first()
+    cached = result_cache.get(session_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    result = await db.scalar(
+        select(RecommendationResult).where(
+            RecommendationResult.session_id == session_id
+        )
+    )
     
     if not result:
         raise HTTPException(
@@ -148,19 +306,25 @@ async def get_result(session_id: str, db: Session = Depends(get_db)):
             detail="Resultado não encontrado"
         )
     
-    return result
+    return result_response(result)
 
 @router.post("/result/{session_id}/email")
 async def email_result(
     session_id: str,
     email_data: EmailResultRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Envia resultado por email"""
-    # Buscar resultado
-    result = db.query(RecommendationResult).filter(
-        RecommendationResult.session_id == session_id
-    ).first()
+    # Buscar resultado (o cache basta para confirmar que existe)
+    result = result_cache.get(session_id)
+    if result is None:
+        result = await db.scalar(
+            select(RecommendationResult).where(
+                RecommendationResult.session_id == session_id
+            )
+        )
+        if result:
+            result_response(result)
     
     if not result:
         raise HTTPException(
@@ -183,6 +347,21 @@ async def email_result(
             detail=f"Erro ao enviar email: {str(e)}"
         )
 
+def seed_sample_questions():
+    """Cria perguntas de exemplo na inicialização se não houver perguntas ativas"""
+    db = SessionLocal()
+    try:
+        has_questions = db.query(Question.id).filter(Question.is_active == True).first()
+        if not has_questions:
+            create_sample_questions(db)
+            questionnaire_snapshot.invalidate()
+            questions_cache.invalidate()
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao criar perguntas de exemplo: {e}")
+    finally:
+        db.close()
+
 def create_sample_questions(db: Session):
     """Cria perguntas de exemplo para demonstração"""
     sample_questions = [
@@ -254,5 +433,7 @@ def create_sample_questions(db: Session):
             )
             db.add(option)
     
+    # Outros workers veem a revisão nova e recarregam o snapshot
+    bump_revision(db)
     db.commit()
 
@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+class CachedBody:
+    """Corpo JSON pré-serializado com ETag forte, opcionalmente atrelado a uma versão dos dados"""
+
+    def __init__(self, body: bytes, version: Optional[int] = None):
+        self.body = body
+        self.version = version
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"' if version is None else f'"{version}-{digest}"'
+        self.created_at = time.monotonic()
+
+class BodyCache:
+    """Guarda um único corpo serializado até ser invalidado, expirar ou mudar a versão dos dados"""
+
+    def __init__(self, ttl_seconds: int = 60):
+        self.ttl_seconds = ttl_seconds
+        self._entry: Optional[CachedBody] = None
+        self._lock = threading.Lock()
+
+    def get(self, version: Optional[int] = None) -> Optional[CachedBody]:
+        entry = self._entry
+        if entry is None or entry.version != version:
+            return None
+        if self.ttl_seconds > 0 and time.monotonic() - entry.created_at > self.ttl_seconds:
+            return None
+        return entry
+
+    def set(self, body: bytes, version: Optional[int] = None) -> CachedBody:
+        entry = CachedBody(body, version)
+        with self._lock:
+            self._entry = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara cabeçalho If-None-Match com o ETag (comparação fraca, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+class LRUCache:
+    """Cache LRU de corpos serializados com TTL e limite de entradas e de bytes"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            body, expires_at = entry
+            if time.monotonic() > expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key: str, body: bytes):
+        # Corpos maiores que o limite total não são guardados
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (body, time.monotonic() + self.ttl_seconds)
+            self._bytes += len(body)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -26,6 +26,61 @@ class Settings(BaseSettings):
     # Configurações de ML
     model_path: str = "./models/"
     retrain_interval_days: int = 7
+    retrain_scheduler_enabled: bool = False
+    retrain_mode: str = "full"  # full ou incremental (só sessões desde o último treino)
+    retrain_shadow: bool = False  # publica o retreino como candidata em vez de promovê-lo direto
+    retrain_check_interval_seconds: int = 3600
+    model_versions_to_keep: int = 3
+    model_reload_interval_seconds: int = 30  # frequência com que os workers conferem o ponteiro CURRENT
+    ml_shared_artifacts: bool = True  # artefatos mapeados em memória (compartilhados entre workers)
+    ml_compiled_forest: bool = True  # avaliar a floresta compilada em arrays NumPy
+    ml_time_buckets_ms: List[int] = [2000, 5000, 10000, 30000]  # faixas de tempo de resposta do ResponseEncoder
+    questionnaire_snapshot_ttl_seconds: int = 300
+    
+    # Execução da inferência fora do event loop
+    ml_executor: str = "thread"  # thread ou process
+    ml_executor_workers: int = 2
+    ml_max_concurrency: int = 4
+    ml_inference_timeout_ms: int = 500
+    ml_batch_max_size: int = 16  # 1 desativa o micro-batching
+    ml_batch_window_ms: float = 2.0
+    ml_lookup_max_combinations: int = 20000  # tabela completa de respostas até esse tamanho (0 desativa)
+    ml_lookup_memo_size: int = 10000  # resultados memorizados fora da tabela
+    ml_shadow_enabled: bool = False  # só atua quando há versão candidata (ponteiro SHADOW)
+    ml_shadow_budget_ms: float = 50.0  # espera na fila + inferência da candidata
+    ml_shadow_max_pending: int = 32  # acima disso as entradas não são pontuadas pela candidata
+    
+    # Cache de GET /questionnaire/questions
+    questions_cache_ttl_seconds: int = 300
+    questions_cache_max_age: int = 60
+    
+    # Cache de GET /questionnaire/result/{session_id}
+    result_cache_max_entries: int = 10000
+    result_cache_max_bytes: int = 16 * 1024 * 1024
+    result_cache_ttl_seconds: int = 3600
+    
+    # Gravação adiada (write-behind) das respostas individuais
+    responses_write_behind: bool = False
+    responses_buffer_max_rows: int = 10000
+    responses_flush_rows: int = 500
+    responses_flush_interval_ms: int = 200
+    responses_durability: str = "buffered"  # buffered ou flushed (aguarda o lote ser gravado)
+    responses_enqueue_timeout_ms: int = 100  # espera por espaço na fila antes de gravar direto
+    
+    # Exportação de resultados
+    export_chunk_size: int = 5000  # linhas buscadas por vez no cursor
+    export_docx_max_rows: int = 5000  # documentos Word ficam inteiros em memória
+    export_jobs_dir: str = "./exports/"
+    export_jobs_workers: int = 2
+    export_jobs_max_active: int = 2  # por processo; acima disso /admin/export responde 429
+    export_jobs_ttl_seconds: int = 86400
+    
+    # Snapshot colunar de resultados para analytics
+    results_snapshot_enabled: bool = True
+    results_snapshot_dir: str = "./analytics/"
+    results_snapshot_interval_seconds: int = 60
+    results_snapshot_lag_seconds: int = 5  # ignora resultados mais recentes (commits ainda em andamento)
+    results_snapshot_gap_retention_seconds: int = 3600  # por quanto tempo ids pulados ainda são procurados
     
     # Configurações CORS
     allowed_origins: List[str] = ["http://localhost:3000", "https://localhost:3000"]
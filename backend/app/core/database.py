@@ -1,9 +1,23 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-# Criar engine do SQLAlchemy
+def get_async_database_url(database_url: str) -> str:
+    """Converte a URL do banco para o driver assíncrono equivalente"""
+    async_drivers = {
+        "sqlite://": "sqlite+aiosqlite://",
+        "postgres://": "postgresql+asyncpg://",
+        "postgresql://": "postgresql+asyncpg://",
+        "postgresql+psycopg2://": "postgresql+asyncpg://",
+    }
+    for prefix, async_prefix in async_drivers.items():
+        if database_url.startswith(prefix):
+            return async_prefix + database_url[len(prefix):]
+    return database_url
+
+# Criar engine do SQLAlchemy (usada na inicialização e em scripts)
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
@@ -12,17 +26,44 @@ engine = create_engine(
 # Criar SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrona usada pelas rotas da API
+async_engine = create_async_engine(get_async_database_url(settings.database_url))
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base para modelos
 Base = declarative_base()
 
 # Metadata para migrations
 metadata = MetaData()
 
+def sync_schema(bind=engine):
+    """Cria tabelas e adiciona colunas e índices novos em bancos já existentes"""
+    Base.metadata.create_all(bind=bind)
+    
+    # create_all não altera tabelas existentes; colunas novas devem ser nullable
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except Exception as e:
+                # Ex.: índice único sobre dados antigos que já têm duplicatas
+                print(f"Erro ao criar índice {index.name}: {e}")
+
 # Dependency para obter sessão do banco
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
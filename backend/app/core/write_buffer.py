@@ -0,0 +1,158 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal
+
+# Modos de durabilidade: "buffered" responde antes da gravação; "flushed" aguarda o lote ser gravado
+DURABILITY_MODES = ("buffered", "flushed")
+
+class WriteBehindBuffer:
+    """Fila limitada de linhas gravadas em lote por uma tarefa em segundo plano
+
+    Quando a fila está cheia a inserção espera por espaço até enqueue_timeout_ms;
+    se não houver espaço (ou o buffer estiver parado) add retorna False e quem
+    chamou grava as linhas diretamente. on_flush roda na mesma transação do
+    INSERT de cada lote (por exemplo, para somar contadores), de modo que um
+    lote desfeito não deixa contadores à frente das linhas gravadas.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_rows: int = 10000,
+        flush_rows: int = 500,
+        flush_interval_ms: int = 200,
+        durability: str = "buffered",
+        enqueue_timeout_ms: int = 100,
+        on_flush: Optional[Callable[[AsyncSession, List[Dict]], Awaitable[None]]] = None
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError("Durabilidade deve ser: buffered ou flushed")
+
+        self.model = model
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.durability = durability
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.on_flush = on_flush
+
+        self._rows: List[Dict] = []
+        self._waiters: List[asyncio.Future] = []
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._running = False
+
+        self.enqueued_rows = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flushes = 0
+        self.backpressure_waits = 0
+        self.rejected = 0
+
+    def start(self):
+        """Inicia a tarefa de flush no event loop atual"""
+        if self._task is None:
+            self._running = True
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Para de aceitar linhas e grava o que ainda está na fila"""
+        self._running = False
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def add(self, rows: List[Dict]) -> bool:
+        """Enfileira as linhas; False indica que quem chamou deve gravá-las"""
+        if not self._running or len(rows) > self.max_rows:
+            self.rejected += 1
+            return False
+
+        # Backpressure: espera o flush liberar espaço, com tempo limite
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.enqueue_timeout
+        while len(self._rows) + len(rows) > self.max_rows:
+            self.backpressure_waits += 1
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            if not self._running:
+                self.rejected += 1
+                return False
+
+        self._rows.extend(rows)
+        self.enqueued_rows += len(rows)
+        if len(self._rows) >= self.flush_rows:
+            self._wakeup.set()
+
+        if self.durability == "flushed":
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            # Falha no flush: o lote foi desfeito, então quem chamou pode gravar sem duplicar
+            return await waiter
+        return True
+
+    async def flush(self):
+        """Grava já as linhas pendentes (para leituras que precisam vê-las no banco)"""
+        await self._flush()
+
+    async def _run(self):
+        while self._running or self._rows:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        """Grava todas as linhas pendentes em um único INSERT de várias linhas"""
+        # Um lote por vez: quem chama flush() espera também o lote que já está sendo gravado
+        async with self._flush_lock:
+            if not self._rows:
+                return
+
+            rows, self._rows = self._rows, []
+            waiters, self._waiters = self._waiters, []
+            written = False
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(self.model), rows)
+                    if self.on_flush is not None:
+                        await self.on_flush(db, rows)
+                    await db.commit()
+                written = True
+                self.flushed_rows += len(rows)
+                self.flushes += 1
+            except Exception as e:
+                self.failed_rows += len(rows)
+                print(f"Erro ao gravar lote de {len(rows)} linhas em {self.model.__tablename__}: {e}")
+            finally:
+                self._space.set()
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(written)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._running,
+            "durability": self.durability,
+            "pending_rows": len(self._rows),
+            "max_rows": self.max_rows,
+            "enqueued_rows": self.enqueued_rows,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "flushes": self.flushes,
+            "backpressure_waits": self.backpressure_waits,
+            "rejected": self.rejected
+        }
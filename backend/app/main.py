@@ -1,15 +1,22 @@
 from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import sync_schema
 from app.api.v1 import auth, questionnaire, admin
+from app.ml.scheduler import retrain_periodically, watch_model_versions
+from app.services.aggregates import aggregates_missing, backfill_aggregates
+from app.services.export_jobs import export_jobs
+from app.services.results_snapshot import keep_refreshed, results_snapshot
+from app.services.rollups import backfill_rollups, rollups_missing
 from app.schemas import HealthResponse
 from datetime import datetime
+import asyncio
 import uvicorn
 
 # Criar tabelas
-Base.metadata.create_all(bind=engine)
+sync_schema()
 
 # Configuração da aplicação
 app = FastAPI(
@@ -37,6 +44,95 @@ app.include_router(auth.router, prefix="/api/v1")
 app.include_router(questionnaire.router, prefix="/api/v1")
 app.include_router(admin.router, prefix="/api/v1")
 
+@app.on_event("startup")
+async def seed_questions():
+    """Cria perguntas de exemplo fora do caminho das requisições"""
+    questionnaire.seed_sample_questions()
+
+@app.on_event("startup")
+async def bootstrap_aggregates():
+    """Recalcula contadores do dashboard e rollups em segundo plano se o banco ainda não os tiver"""
+    # A decisão vem antes da primeira requisição: depois dela os incrementos já criam linhas.
+    # O recálculo trava as tabelas e relê as de origem, então submissões concorrentes não se perdem.
+    backfills = []
+    if aggregates_missing():
+        backfills.append(backfill_aggregates)
+    if rollups_missing():
+        backfills.append(backfill_rollups)
+    if backfills:
+        loop = asyncio.get_running_loop()
+        app.state.aggregates_loading = loop.run_in_executor(None, run_backfills, backfills)
+
+def run_backfills(backfills):
+    for backfill in backfills:
+        backfill()
+
+@app.on_event("startup")
+async def warm_up_models():
+    """Carrega os modelos em segundo plano; até lá as submissões usam apenas os pesos"""
+    loop = asyncio.get_running_loop()
+    app.state.model_loading = loop.run_in_executor(None, questionnaire.ml_service.load_models)
+
+@app.on_event("startup")
+async def start_model_tasks():
+    """Troca de versão dos modelos e retreino agendado (em processo separado)"""
+    app.state.model_tasks = [asyncio.create_task(
+        watch_model_versions(questionnaire.ml_service, settings.model_reload_interval_seconds)
+    )]
+    if settings.retrain_scheduler_enabled:
+        app.state.model_tasks.append(asyncio.create_task(retrain_periodically(
+            settings.model_path,
+            settings.retrain_interval_days,
+            settings.retrain_mode,
+            settings.retrain_check_interval_seconds,
+            settings.retrain_shadow
+        )))
+
+@app.on_event("shutdown")
+async def stop_model_tasks():
+    for task in getattr(app.state, "model_tasks", []):
+        task.cancel()
+
+@app.on_event("startup")
+async def start_response_writer():
+    """Inicia a gravação adiada das respostas, se habilitada"""
+    if settings.responses_write_behind:
+        questionnaire.response_writer.start()
+
+@app.on_event("shutdown")
+async def flush_response_writer():
+    """Grava as respostas que ainda estão na fila"""
+    await questionnaire.response_writer.stop()
+
+@app.on_event("startup")
+async def cleanup_exports():
+    """Remove exportações expiradas deixadas por execuções anteriores"""
+    export_jobs.cleanup_expired()
+
+@app.on_event("startup")
+async def start_results_snapshot():
+    """Mantém o snapshot colunar de resultados atualizado em segundo plano"""
+    if settings.results_snapshot_enabled:
+        app.state.results_snapshot_task = asyncio.create_task(
+            keep_refreshed(results_snapshot, settings.results_snapshot_interval_seconds)
+        )
+
+@app.on_event("shutdown")
+async def stop_results_snapshot():
+    task = getattr(app.state, "results_snapshot_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+async def shutdown_export_jobs():
+    """Encerra o pool de exportações"""
+    export_jobs.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_inference():
+    """Encerra o pool de inferência"""
+    questionnaire.inference_executor.shutdown()
+
 # Endpoints básicos
 @app.get("/", tags=["root"])
 async def root():
@@ -57,6 +153,26 @@ async def health_check():
         version=settings.app_version
     )
 
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """Indica se os modelos de ML e os agregados estão prontos (503 enquanto carregam)"""
+    ml_service = questionnaire.ml_service
+    aggregates_loading = getattr(app.state, "aggregates_loading", None)
+    aggregates_ready = aggregates_loading is None or aggregates_loading.done()
+    is_ready = ml_service.is_ready and aggregates_ready
+    body = {
+        "status": "ready" if is_ready else "not_ready",
+        "models": {
+            "status": ml_service.status,
+            "detail": ml_service.status_detail,
+            "inference": "ml" if ml_service.has_model else "weighted_only"
+        },
+        "aggregates": "ready" if aggregates_ready else "building",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    status_code = status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content=body)
+
 # Middleware para logging (opcional)
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -0,0 +1,242 @@
+import asyncio
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.ml.lookup import entry_result, result_entry
+from app.ml.service import COURSE_KEYS, InferenceBatcher, MLService
+from app.ml.shadow import ShadowScorer
+
+# Serviço ML próprio de cada processo do pool (modo "process")
+_process_ml_service: Optional[MLService] = None
+
+def _init_process_worker(model_path: str, shared_artifacts: bool, compiled_forest: bool):
+    """Carrega os modelos uma vez em cada processo do pool"""
+    global _process_ml_service
+    _process_ml_service = MLService(
+        model_path=model_path,
+        shared_artifacts=shared_artifacts,
+        compiled_forest=compiled_forest
+    )
+
+def _predict_courses_in_process(features: np.ndarray) -> np.ndarray:
+    # Cada processo do pool confere o ponteiro CURRENT por conta própria
+    _process_ml_service.reload_if_changed(settings.model_reload_interval_seconds, include_shadow=False)
+    return _process_ml_service.predict_courses(features)
+
+class InferenceMetrics:
+    """Contadores de fila e latência da inferência"""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.waiting = 0
+        self.in_flight = 0
+        # Chamadas que estouraram o timeout mas ainda ocupam o pool
+        self.abandoned = 0
+        self.abandoned_in_flight = 0
+        self.max_queue_depth = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def enter_queue(self):
+        self.waiting += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.waiting + self.in_flight)
+
+    def record_latency(self, latency_ms: float):
+        self.calls += 1
+        self.latencies_ms.append(latency_ms)
+
+    def snapshot(self) -> Dict:
+        latencies = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "queue_depth": self.waiting + self.in_flight,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "abandoned": self.abandoned,
+            "abandoned_in_flight": self.abandoned_in_flight,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 3),
+                "p95": round(float(np.percentile(latencies, 95)), 3),
+                "p99": round(float(np.percentile(latencies, 99)), 3),
+                "max": round(float(latencies.max()), 3)
+            }
+        }
+
+class InferenceExecutor:
+    """Executa a inferência fora do event loop, com limite de concorrência e timeout"""
+
+    def __init__(
+        self,
+        ml_service: MLService,
+        mode: str = "thread",
+        max_workers: int = 2,
+        max_concurrency: int = 4,
+        timeout_ms: int = 500,
+        batch_max_size: int = 1,
+        batch_window_ms: float = 2.0,
+        shadow_enabled: bool = True,
+        shadow_budget_ms: float = 50.0,
+        shadow_max_pending: int = 32
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError("Modo do executor deve ser: thread ou process")
+
+        self.ml_service = ml_service
+        self.mode = mode
+        self.timeout = timeout_ms / 1000 if timeout_ms > 0 else None
+        self.metrics = InferenceMetrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        if mode == "process":
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_process_worker,
+                initargs=(ml_service.model_path, ml_service.shared_artifacts, ml_service.compiled_forest)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ml-inference")
+
+        # Micro-batching: requisições concorrentes compartilham uma chamada ao modelo
+        self.batcher = None
+        if batch_max_size > 1:
+            self.batcher = InferenceBatcher(self._run_model, batch_max_size, batch_window_ms)
+
+        # Modo sombra: a versão candidata (se houver) pontua as mesmas entradas em segundo plano
+        self.shadow = ShadowScorer(ml_service, shadow_budget_ms, shadow_max_pending) if shadow_enabled else None
+
+    async def _run_model(self, features: np.ndarray) -> np.ndarray:
+        """Executa o modelo no pool respeitando o limite de concorrência
+
+        A vaga só volta quando o pool termina: depois de um timeout a chamada segue
+        ocupando o pool e é contada como abandonada até acabar.
+        """
+        loop = asyncio.get_running_loop()
+        function = _predict_courses_in_process if self.mode == "process" else self.ml_service.predict_courses
+
+        self.metrics.enter_queue()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.metrics.waiting -= 1
+        self.metrics.in_flight += 1
+        start_time = time.perf_counter()
+        abandoned = False
+
+        def release():
+            self.metrics.in_flight -= 1
+            if abandoned:
+                self.metrics.abandoned_in_flight -= 1
+            self.metrics.record_latency((time.perf_counter() - start_time) * 1000)
+            self._semaphore.release()
+
+        def finished(_):
+            # Chamado na thread do pool; a vaga é devolvida no event loop
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:  # loop já encerrado
+                pass
+
+        try:
+            future = self._pool.submit(function, features)
+        except Exception:
+            release()
+            raise
+        future.add_done_callback(finished)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Ainda na fila do pool: cancela; já rodando: não há como interromper
+            if not future.cancel() and not future.done():
+                abandoned = True
+                self.metrics.abandoned += 1
+                self.metrics.abandoned_in_flight += 1
+            raise
+
+    async def classify(self, responses: List[Dict], snapshot=None) -> Dict:
+        """Classifica respostas no pool; em caso de timeout ou erro usa apenas os pesos
+
+        Com o snapshot, respostas já vistas (ou todas, se o espaço for pequeno) saem da
+        tabela de resultados sem passar pelo modelo.
+        """
+        start_time = datetime.now()
+
+        lookup = key = None
+        if snapshot is not None:
+            lookup_started = time.perf_counter()
+            lookup = self.ml_service.answer_lookup.get(snapshot)
+            key = lookup.key(responses)
+            entry = lookup.get(key) if key is not None else None
+            if entry is not None:
+                processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
+                result = entry_result(entry, COURSE_KEYS, lookup.model_version, processing_time)
+                # O modo sombra compara com o curso do modelo guardado na entrada; a latência é a da consulta
+                self._observe_shadow(responses, result, entry[3], (time.perf_counter() - lookup_started) * 1000)
+                return result
+
+        try:
+            scores = self.ml_service.weighted_score_matrix(responses)
+            if not self.ml_service.has_model:
+                result = self.ml_service.finalize_classification(scores, None, start_time)
+                self._remember(lookup, key, result, model_used=False)
+                self._observe_shadow(responses, result)
+                return result
+
+            features = self.ml_service.preprocess_responses(responses)
+        except Exception as e:
+            print(f"Erro na classificação: {e}")
+            return self.ml_service._default_result()
+
+        ml_courses = None
+        model_started = time.perf_counter()
+        try:
+            if self.batcher is not None:
+                ml_courses = await asyncio.wait_for(self.batcher.predict(features), self.timeout)
+            else:
+                ml_courses = await asyncio.wait_for(self._run_model(features), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            print("Inferência excedeu o tempo limite; usando pontuação ponderada")
+        except Exception as e:
+            self.metrics.errors += 1
+            print(f"Erro na inferência: {e}")
+
+        model_latency_ms = (time.perf_counter() - model_started) * 1000
+
+        result = self.ml_service.finalize_classification(scores, ml_courses, start_time)
+        if ml_courses is not None:
+            self._remember(lookup, key, result, model_used=True, model_course=int(ml_courses[0]))
+            self._observe_shadow(responses, result, int(ml_courses[0]), model_latency_ms)
+        else:
+            self._observe_shadow(responses, result)
+        return result
+
+    def _observe_shadow(self, responses: List[Dict], result: Dict, primary_course: Optional[int] = None, latency_ms: Optional[float] = None):
+        if self.shadow is not None:
+            self.shadow.observe(responses, result["recommended_course"], primary_course, latency_ms)
+
+    def _remember(self, lookup, key, result: Dict, model_used: bool, model_course: Optional[int] = None):
+        # Processos do pool podem estar em outra versão do modelo; só a tabela vale nesse modo
+        if key is None or lookup.use_model != model_used or (model_used and self.mode == "process"):
+            return
+        lookup.remember(key, result_entry(result, COURSE_KEYS, model_course))
+
+    def stats(self) -> Dict:
+        stats = self.metrics.snapshot()
+        stats["answer_lookup"] = self.ml_service.answer_lookup.stats()
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.shadow is not None:
+            self.shadow.shutdown()
@@ -0,0 +1,173 @@
+import json
+import os
+import numpy as np
+from scipy import sparse
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Cada resposta ocupa três posições seguidas: pergunta, opção escolhida e tempo de resposta
+RESPONSE_FEATURES = ("question", "option", "time")
+
+# Largura padrão do vetor de features (modelos sem feature_names salvos)
+DEFAULT_FEATURE_COUNT = 20
+
+# Disposição das features por posição, gravada nos metadados do modelo ("feature_layout")
+# 1: respostas na ordem de envio (modelos sem a chave nos metadados)
+# 2: respostas ordenadas por pergunta
+LEGACY_FEATURE_LAYOUT = 1
+FEATURE_LAYOUT = 2
+
+def response_feature_names(width: int = DEFAULT_FEATURE_COUNT) -> List[str]:
+    """Nomes das colunas na ordem do vetor de features"""
+    return [
+        f"r{position // len(RESPONSE_FEATURES)}_{RESPONSE_FEATURES[position % len(RESPONSE_FEATURES)]}"
+        for position in range(width)
+    ]
+
+def response_features(
+    responses: List[Dict],
+    width: int = DEFAULT_FEATURE_COUNT,
+    layout: int = FEATURE_LAYOUT
+) -> np.ndarray:
+    """Vetor de features de uma sessão (1 x width) na disposição com que o modelo foi treinado
+
+    Na disposição atual as respostas são ordenadas por pergunta, como o pipeline de
+    treino (app/ml/training.py) monta as linhas; modelos antigos seguem a ordem de envio.
+    """
+    ordered = responses
+    if layout >= FEATURE_LAYOUT:
+        ordered = sorted(responses, key=lambda response: response.get("question_id", 0))
+    values = [
+        value
+        for response in ordered
+        for value in (
+            response.get("question_id", 0),
+            response.get("selected_option_id", 0),
+            response.get("response_time_ms", 0)
+        )
+    ][:width]
+
+    row = np.zeros((1, width))
+    row[0, :len(values)] = values
+    return row
+
+# Codificação esparsa: uma coluna por opção e uma faixa de tempo de resposta por pergunta
+ENCODER_FILE = "encoder.json"
+
+# Limites (ms) das faixas de tempo de resposta
+DEFAULT_TIME_EDGES_MS = (2000, 5000, 10000, 30000)
+
+class ResponseEncoder:
+    """Codificação estável das respostas em matriz CSR, ajustada sobre o snapshot do questionário
+
+    As colunas dependem só de quais opções e perguntas existiam no ajuste, não da ordem
+    de envio; opções e perguntas desconhecidas (criadas depois) são ignoradas.
+    """
+
+    def __init__(
+        self,
+        option_ids: List[int],
+        question_ids: List[int],
+        time_edges_ms: Sequence[float] = DEFAULT_TIME_EDGES_MS,
+        snapshot_version: Optional[str] = None
+    ):
+        self.option_ids = [int(option_id) for option_id in option_ids]
+        self.question_ids = [int(question_id) for question_id in question_ids]
+        self.time_edges_ms = [float(edge) for edge in time_edges_ms]
+        self.snapshot_version = snapshot_version
+        self.n_buckets = len(self.time_edges_ms) + 1
+        self.n_features = len(self.option_ids) + len(self.question_ids) * self.n_buckets
+
+        # Tabelas ordenadas para busca vetorizada (searchsorted) de id -> coluna
+        option_order = np.argsort(self.option_ids)
+        self._option_keys = np.array(self.option_ids, dtype=np.int64)[option_order]
+        self._option_columns = option_order.astype(np.int64)
+        question_order = np.argsort(self.question_ids)
+        self._question_keys = np.array(self.question_ids, dtype=np.int64)[question_order]
+        self._question_columns = len(self.option_ids) + question_order.astype(np.int64) * self.n_buckets
+        self._edges = np.array(self.time_edges_ms, dtype=np.float64)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, time_edges_ms: Sequence[float] = DEFAULT_TIME_EDGES_MS) -> "ResponseEncoder":
+        """Ajusta a codificação às perguntas e opções ativas de um QuestionnaireSnapshot"""
+        option_ids = sorted(snapshot.option_index, key=snapshot.option_index.get)
+        question_ids = [question_id for question_id, _ in snapshot.questions]
+        return cls(option_ids, question_ids, time_edges_ms, snapshot.version)
+
+    @property
+    def feature_names(self) -> List[str]:
+        bounds = [None] + [int(edge) for edge in self.time_edges_ms] + [None]
+        buckets = [
+            f"{low or 0}_{high}ms" if high is not None else f"{low}ms_plus"
+            for low, high in zip(bounds[:-1], bounds[1:])
+        ]
+        return [f"option_{option_id}" for option_id in self.option_ids] + [
+            f"q{question_id}_time_{bucket}" for question_id in self.question_ids for bucket in buckets
+        ]
+
+    def encode(self, question_ids, option_ids, times_ms) -> Tuple[np.ndarray, np.ndarray]:
+        """(posição da resposta, coluna) de cada entrada não nula, para arrays de respostas"""
+        option_hits, option_columns = _lookup(self._option_keys, self._option_columns, option_ids)
+        question_hits, question_columns = _lookup(self._question_keys, self._question_columns, question_ids)
+
+        # Tempo ausente conta como a faixa mais rápida
+        times = np.nan_to_num(np.asarray(times_ms, dtype=np.float64))
+        buckets = np.searchsorted(self._edges, times[question_hits], side="right")
+
+        positions = np.arange(len(option_hits))
+        rows = np.concatenate([positions[option_hits], positions[question_hits]])
+        columns = np.concatenate([option_columns, question_columns + buckets])
+        return rows, columns
+
+    def to_csr(self, rows: np.ndarray, columns: np.ndarray, n_rows: int) -> sparse.csr_matrix:
+        # Respostas repetidas para a mesma opção são somadas
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)), shape=(n_rows, self.n_features)
+        )
+
+    def transform(self, responses: List[Dict]) -> sparse.csr_matrix:
+        """Features de uma sessão (1 x n_features)"""
+        return self.transform_batch([responses])
+
+    def transform_batch(self, sessions: List[List[Dict]]) -> sparse.csr_matrix:
+        """Features de várias sessões (sessões x n_features)"""
+        responses = [response for session in sessions for response in session]
+        sessions_of = np.repeat(np.arange(len(sessions)), [len(session) for session in sessions])
+        positions, columns = self.encode(
+            [response.get("question_id", 0) for response in responses],
+            [response.get("selected_option_id", 0) for response in responses],
+            [response.get("response_time_ms") or 0 for response in responses]
+        )
+        return self.to_csr(sessions_of[positions], columns, len(sessions))
+
+    def save(self, directory: str):
+        with open(os.path.join(directory, ENCODER_FILE), "w") as encoder_file:
+            json.dump({
+                "option_ids": self.option_ids,
+                "question_ids": self.question_ids,
+                "time_edges_ms": self.time_edges_ms,
+                "snapshot_version": self.snapshot_version
+            }, encoder_file)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["ResponseEncoder"]:
+        """Codificação salva com os artefatos (None para modelos com features por posição)"""
+        path = os.path.join(directory, ENCODER_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as encoder_file:
+            return cls(**json.load(encoder_file))
+
+def _lookup(keys: np.ndarray, values: np.ndarray, ids) -> Tuple[np.ndarray, np.ndarray]:
+    """Máscara dos ids encontrados em keys (ordenado) e o valor de cada um"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(keys):
+        return np.zeros(len(ids), dtype=bool), np.empty(0, dtype=np.int64)
+    index = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+    hits = keys[index] == ids
+    return hits, values[index[hits]]
+
+def stack_features(rows: List) -> Union[np.ndarray, sparse.csr_matrix]:
+    """Empilha linhas de features densas ou esparsas"""
+    if any(sparse.issparse(row) for row in rows):
+        return sparse.vstack(rows, format="csr")
+    return np.vstack(rows)
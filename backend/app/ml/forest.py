@@ -0,0 +1,133 @@
+import os
+import numpy as np
+import sklearn
+from packaging.version import Version
+from typing import Dict, Optional
+
+# Arrays que descrevem a floresta empacotada (um arquivo .npy por array)
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "depths", "classes")
+
+# Marcador de folha usado pelo sklearn em children_left/children_right
+TREE_LEAF = -1
+
+# Até o sklearn 1.3, tree_.value guarda contagens e predict_proba as normaliza; a partir
+# do 1.4 guarda as frações e predict_proba as devolve sem dividir de novo
+TREE_VALUE_IS_COUNTS = Version(sklearn.__version__).release < (1, 4)
+
+def pack_forest(rf_model) -> Dict[str, np.ndarray]:
+    """Converte as árvores de um RandomForestClassifier treinado em arrays planos"""
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+    roots, depths = [], []
+    offset = 0
+
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count, dtype=np.int64)
+        is_leaf = tree.children_left == TREE_LEAF
+
+        # Folhas apontam para si mesmas, então a descida pode ter profundidade fixa
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+        # Mesmos valores que DecisionTreeClassifier.predict_proba devolve para cada folha
+        value = np.array(tree.value[:, 0, :], dtype=np.float64)
+        if TREE_VALUE_IS_COUNTS:
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        thresholds.append(np.asarray(tree.threshold, dtype=np.float64))
+        lefts.append(left.astype(np.int64))
+        rights.append(right.astype(np.int64))
+        values.append(value)
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += tree.node_count
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.int64),
+        "depths": np.array(depths, dtype=np.int64),
+        "classes": np.asarray(rf_model.classes_)
+    }
+
+def compile_forest(rf_model, n_check_rows: int = 256, random_state: int = 0) -> Optional["PackedForest"]:
+    """Compila a floresta e confirma que as probabilidades são idênticas às do sklearn"""
+    forest = PackedForest(pack_forest(rf_model))
+
+    # Linhas de verificação cobrindo os dois lados dos limiares usados pelas árvores
+    rng = np.random.RandomState(random_state)
+    n_features = rf_model.n_features_in_
+    X_check = rng.randn(n_check_rows, n_features)
+    used = forest.threshold[forest.left != np.arange(len(forest.left))]
+    if len(used):
+        X_check[: n_check_rows // 2] = rng.choice(used, size=(n_check_rows // 2, n_features))
+
+    if not verify_forest(rf_model, forest, X_check):
+        print("Floresta compilada diverge do sklearn; mantendo avaliação do sklearn")
+        return None
+    return forest
+
+def verify_forest(rf_model, forest: "PackedForest", X: np.ndarray) -> bool:
+    """Compara bit a bit as probabilidades da floresta compilada com as do sklearn"""
+    return (
+        np.array_equal(forest.classes_, rf_model.classes_)
+        and np.array_equal(forest.predict_proba(X), rf_model.predict_proba(X))
+    )
+
+def save_packed_forest(arrays: Dict[str, np.ndarray], directory: str):
+    """Salva a floresta empacotada como arquivos .npy (mapeáveis em memória)"""
+    os.makedirs(directory, exist_ok=True)
+    for name in FOREST_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), arrays[name])
+
+def load_packed_forest(directory: str, mmap_mode: Optional[str] = "r") -> Optional["PackedForest"]:
+    """Carrega a floresta empacotada; com mmap_mode os workers compartilham as páginas"""
+    paths = {name: os.path.join(directory, f"{name}.npy") for name in FOREST_ARRAYS}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return PackedForest({name: np.load(path, mmap_mode=mmap_mode) for name, path in paths.items()})
+
+class PackedForest:
+    """Avaliador da floresta sobre arrays planos, percorrendo todas as árvores juntas
+
+    Evita a validação de entrada e o despacho por árvore do sklearn, que dominam
+    o custo de predict_proba para uma única linha.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = arrays["classes"]
+        self.n_estimators = len(self.roots)
+        self.max_depth = int(arrays["depths"].max()) if len(arrays["depths"]) else 0
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Índice da folha alcançada em cada árvore (linhas x árvores)"""
+        # O sklearn compara features float32 com limiares float64
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidades por classe, acumulando as árvores na ordem do sklearn"""
+        leaf_values = self.value[self.apply(X)]
+        proba = np.add.reduce(leaf_values, axis=1)
+        proba /= self.n_estimators
+        return proba
@@ -0,0 +1,264 @@
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.ml.features import FEATURE_LAYOUT
+
+# Entrada guardada por vetor de respostas: (pontuações na ordem de COURSE_KEYS, curso, confiança,
+# curso previsto pelo modelo como índice em COURSE_KEYS, ou None sem modelo)
+Entry = Tuple[Tuple[float, ...], str, float, Optional[int]]
+
+# Sessões classificadas por chamada ao montar a tabela
+TABLE_CHUNK_SIZE = 256
+
+# Após cada lote a montagem dorme proporcionalmente ao tempo gasto nele, liberando o GIL
+# para o event loop e o pool de inferência (1.0: metade do tempo parada)
+TABLE_YIELD_RATIO = 1.0
+
+# Motivo exposto em stats() quando a tabela completa não se aplica ao modelo
+LEGACY_TABLE_NOTE = "modelo sem ResponseEncoder: o tempo em ms entra nas features, então só o memo atende"
+
+class AnswerLookup:
+    """Resultados pré-calculados por vetor de respostas, válidos para um par (snapshot, versão do modelo)
+
+    A tabela cobre todas as combinações quando o espaço é pequeno; o resto cai em um
+    memo LRU limitado, preenchido pelas classificações feitas no caminho da submissão.
+    Modelos sem encoder (features por posição) não têm tabela: a chave leva o tempo
+    bruto e, na disposição antiga, a ordem de envio, e só o memo é usado.
+    """
+
+    def __init__(
+        self,
+        snapshot_version: str,
+        model_version: str,
+        encoder=None,
+        use_model: bool = True,
+        memo_size: int = 10000,
+        feature_layout: int = FEATURE_LAYOUT
+    ):
+        self.snapshot_version = snapshot_version
+        self.model_version = model_version
+        self.encoder = encoder
+        self.use_model = use_model
+        self.memo_size = memo_size
+        self.feature_layout = feature_layout
+        self.table: Dict[Tuple, Entry] = {}
+        self.table_scheduled = False
+        self._memo: "OrderedDict[Tuple, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def matches(self, snapshot_version: str, model_version: str, use_model: bool) -> bool:
+        return (
+            self.snapshot_version == snapshot_version
+            and self.model_version == model_version
+            and self.use_model == use_model
+        )
+
+    @property
+    def table_supported(self) -> bool:
+        """A tabela completa só existe quando o tempo entra no modelo em faixas (ou não entra)"""
+        return not self.use_model or self.encoder is not None
+
+    def key(self, responses: List[Dict]) -> Tuple:
+        """Vetor de respostas com tudo o que muda o resultado (pergunta, opção e faixa de tempo)"""
+        if not self.table_supported:
+            # Mesmas entradas de response_features: tempo em ms e ordem de envio na disposição antiga
+            values = [
+                (response.get("question_id", 0), response.get("selected_option_id", 0), response.get("response_time_ms", 0))
+                for response in responses
+            ]
+            return tuple(values if self.feature_layout < FEATURE_LAYOUT else sorted(values))
+        if self.use_model:
+            buckets = np.searchsorted(
+                self.encoder.time_edges_ms,
+                [response.get("response_time_ms") or 0 for response in responses],
+                side="right"
+            )
+        else:
+            buckets = [0] * len(responses)
+        return tuple(sorted(
+            (response["question_id"], response["selected_option_id"], int(bucket))
+            for response, bucket in zip(responses, buckets)
+        ))
+
+    def get(self, key: Tuple) -> Optional[Entry]:
+        entry = self.table.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def remember(self, key: Tuple, entry: Entry):
+        if self.memo_size <= 0 or key in self.table:
+            return
+        with self._lock:
+            self._memo[key] = entry
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "snapshot_version": self.snapshot_version,
+            "model_version": self.model_version,
+            "table_supported": self.table_supported,
+            "table_note": None if self.table_supported else LEGACY_TABLE_NOTE,
+            "table_entries": len(self.table),
+            "memo_entries": len(self._memo),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None
+        }
+
+def result_entry(result: Dict, course_keys: List[str], model_course: Optional[int] = None) -> Entry:
+    return (
+        tuple(result["scores"][course] for course in course_keys),
+        result["recommended_course"],
+        result["confidence_score"],
+        model_course
+    )
+
+def entry_result(entry: Entry, course_keys: List[str], model_version: str, processing_time_ms: int) -> Dict:
+    scores, recommended_course, confidence, _ = entry
+    return {
+        "scores": dict(zip(course_keys, scores)),
+        "recommended_course": recommended_course,
+        "confidence_score": confidence,
+        "processing_time_ms": processing_time_ms,
+        "model_version": model_version
+    }
+
+class AnswerLookupStore:
+    """Mantém o AnswerLookup do par atual e remonta a tabela em segundo plano quando ele muda"""
+
+    def __init__(self, ml_service, max_combinations: int = 20000, memo_size: int = 10000):
+        self.ml_service = ml_service
+        self.max_combinations = max_combinations
+        self.memo_size = memo_size
+        self._lookup: Optional[AnswerLookup] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.last_build_ms: Optional[float] = None
+
+    def get(self, snapshot) -> AnswerLookup:
+        """Lookup do snapshot e da versão de modelo atuais; a tabela chega depois, sem bloquear"""
+        models = self.ml_service.models
+        use_model = self.ml_service.has_model
+        lookup = self._lookup
+        if lookup is not None and lookup.matches(snapshot.version, models.version, use_model):
+            return lookup
+
+        with self._lock:
+            lookup = self._lookup
+            if lookup is None or not lookup.matches(snapshot.version, models.version, use_model):
+                # Memo vazio até a tabela ficar pronta; resultados antigos não valem mais
+                lookup = AnswerLookup(
+                    snapshot.version, models.version, models.encoder, use_model, self.memo_size, models.feature_layout
+                )
+                self._lookup = lookup
+            # Uma montagem por lookup; se falhar, o memo continua atendendo
+            if not lookup.table_scheduled and self.combinations(snapshot, lookup) is not None:
+                lookup.table_scheduled = True
+                threading.Thread(
+                    target=self._build, args=(snapshot, lookup), name="answer-lookup", daemon=True
+                ).start()
+        return lookup
+
+    def combinations(self, snapshot, lookup: AnswerLookup) -> Optional[int]:
+        """Tamanho do espaço de respostas completas (None se não couber na tabela)"""
+        if self.max_combinations <= 0 or not snapshot.questions or not lookup.table_supported:
+            return None
+
+        options_per_question = self._options_per_question(snapshot)
+        buckets = lookup.encoder.n_buckets if lookup.use_model else 1
+        size = math.prod(len(options_per_question.get(question_id, [])) * buckets for question_id, _ in snapshot.questions)
+        return size if 0 < size <= self.max_combinations else None
+
+    def _options_per_question(self, snapshot) -> Dict[int, List[int]]:
+        options: Dict[int, List[int]] = {}
+        for option_id in sorted(snapshot.option_index, key=snapshot.option_index.get):
+            options.setdefault(snapshot.option_questions[option_id], []).append(option_id)
+        return options
+
+    def _build(self, snapshot, lookup: AnswerLookup):
+        """Classifica todas as combinações de opções (e faixas de tempo) em lotes
+
+        Roda em um thread de fundo e pausa entre os lotes, para não disputar o GIL com
+        o event loop durante toda a montagem; demora mais, mas as submissões não param.
+        """
+        from app.ml.service import COURSE_KEYS, COURSE_NAMES
+
+        started = time.perf_counter()
+        try:
+            options_per_question = self._options_per_question(snapshot)
+            # Um tempo representativo por faixa: o limite inferior de cada uma
+            times = [0.0] + list(lookup.encoder.time_edges_ms) if lookup.use_model else [0.0]
+            # Cada escolha já leva sua parte da chave, sem recalcular a faixa por sessão
+            choices = [
+                [
+                    (
+                        {
+                            "question_id": question_id,
+                            "selected_option_id": option_id,
+                            "response_time_ms": response_time,
+                            "weights": snapshot.weights_for(snapshot.option_index[option_id])
+                        },
+                        (question_id, option_id, bucket if lookup.use_model else 0)
+                    )
+                    for option_id in options_per_question[question_id]
+                    for bucket, response_time in enumerate(times)
+                ]
+                for question_id, _ in snapshot.questions
+            ]
+
+            table: Dict[Tuple, Entry] = {}
+            combinations = itertools.product(*choices)
+            while True:
+                chunk_started = time.perf_counter()
+                chunk = list(itertools.islice(combinations, TABLE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                sessions = [[response for response, _ in combination] for combination in chunk]
+                scores, ml_courses = self.ml_service.score_sessions(sessions)
+                scores, recommended, confidence = self.ml_service._rank_scores(scores, ml_courses)
+                for i, combination in enumerate(chunk):
+                    table[tuple(sorted(part for _, part in combination))] = (
+                        tuple(float(score) for score in scores[i]),
+                        COURSE_NAMES[COURSE_KEYS[recommended[i]]],
+                        float(confidence[i]),
+                        int(ml_courses[i]) if ml_courses is not None else None
+                    )
+                time.sleep((time.perf_counter() - chunk_started) * TABLE_YIELD_RATIO)
+
+            # Modelo trocado durante a montagem: a tabela já nasceu velha
+            if not lookup.matches(lookup.snapshot_version, self.ml_service.model_version, self.ml_service.has_model):
+                return
+            lookup.table = table
+            self.builds += 1
+            self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+            print(f"Tabela de respostas: {len(table)} combinações em {self.last_build_ms} ms")
+        except Exception as e:
+            print(f"Erro ao montar tabela de respostas: {e}")
+
+    def stats(self) -> Dict:
+        lookup = self._lookup
+        return {
+            "builds": self.builds,
+            "last_build_ms": self.last_build_ms,
+            "max_combinations": self.max_combinations,
+            "current": lookup.stats() if lookup is not None else None
+        }
@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# Layout: <model_path>/versions/<versão>/ com os artefatos e <model_path>/CURRENT com a versão publicada
+VERSIONS_DIR = "versions"
+CURRENT_POINTER = "CURRENT"
+# Versão candidata, avaliada em modo sombra antes de ser promovida
+SHADOW_POINTER = "SHADOW"
+METADATA_FILE = "metadata.json"
+
+# Versão dos artefatos antigos, gravados direto em model_path
+LEGACY_VERSION = "1.0.0"
+
+def new_version() -> str:
+    """Nome único e ordenável para um conjunto de modelos"""
+    return f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+def version_dir(model_path: str, version: str) -> str:
+    return os.path.join(model_path, VERSIONS_DIR, version)
+
+def staging_dir(model_path: str, version: str) -> str:
+    """Onde a versão é gravada antes de aparecer com o nome final"""
+    return os.path.join(model_path, VERSIONS_DIR, f".{version}.staging")
+
+def current_version(model_path: str, pointer_name: str = CURRENT_POINTER) -> Optional[str]:
+    """Versão apontada por CURRENT (ou outro ponteiro); None se ainda não houver"""
+    try:
+        with open(os.path.join(model_path, pointer_name)) as pointer:
+            version = pointer.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+def resolve_artifacts(model_path: str) -> Tuple[str, str]:
+    """Diretório e versão dos artefatos em uso (layout antigo quando não há CURRENT)"""
+    version = current_version(model_path)
+    if version is not None and os.path.isdir(version_dir(model_path, version)):
+        return version_dir(model_path, version), version
+    return model_path, LEGACY_VERSION
+
+def publish_version(model_path: str, version: str, pointer_name: str = CURRENT_POINTER):
+    """Aponta CURRENT (ou outro ponteiro) para a versão com uma renomeação atômica"""
+    pointer_path = os.path.join(model_path, pointer_name)
+    temp_path = f"{pointer_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w") as pointer:
+        pointer.write(version)
+        pointer.flush()
+        os.fsync(pointer.fileno())
+    os.replace(temp_path, pointer_path)
+
+def clear_pointer(model_path: str, pointer_name: str):
+    try:
+        os.remove(os.path.join(model_path, pointer_name))
+    except FileNotFoundError:
+        pass
+
+def prune_versions(model_path: str, keep: int):
+    """Remove as versões mais antigas, preservando a atual, a candidata e as keep mais recentes"""
+    root = os.path.join(model_path, VERSIONS_DIR)
+    if keep <= 0 or not os.path.isdir(root):
+        return
+
+    protected = {current_version(model_path), current_version(model_path, SHADOW_POINTER)}
+    # Diretórios iniciados por "." são versões ainda sendo gravadas
+    versions = sorted(name for name in os.listdir(root) if not name.startswith("."))
+    # Workers que ainda mapeiam arquivos removidos continuam lendo (Linux mantém o inode)
+    for version in versions[:-keep]:
+        if version not in protected:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+def read_metadata(directory: str) -> Dict:
+    try:
+        with open(os.path.join(directory, METADATA_FILE)) as metadata_file:
+            return json.load(metadata_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def write_metadata(directory: str, metadata: Dict):
+    with open(os.path.join(directory, METADATA_FILE), "w") as metadata_file:
+        json.dump(metadata, metadata_file, default=str)
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from app.ml.registry import read_metadata, resolve_artifacts
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+RETRAIN_LOCK = "retrain.lock"
+
+def last_trained_at(model_path: str) -> Optional[datetime]:
+    """Data do treino da versão publicada (None para artefatos antigos ou padrão)"""
+    directory, _ = resolve_artifacts(model_path)
+    metadata = read_metadata(directory)
+    if metadata.get("mode") == "default" or not metadata.get("trained_at"):
+        return None
+    return datetime.fromisoformat(metadata["trained_at"])
+
+def retrain_due(model_path: str, interval_days: int) -> bool:
+    """Retreino vence quando a versão atual e a última tentativa são mais antigas que o intervalo"""
+    interval = timedelta(days=interval_days)
+    trained_at = last_trained_at(model_path)
+    if trained_at is not None and datetime.utcnow() - trained_at < interval:
+        return False
+
+    # A data da trava marca a última tentativa, mesmo sem dados suficientes para publicar
+    try:
+        attempted_at = os.path.getmtime(os.path.join(model_path, RETRAIN_LOCK))
+    except FileNotFoundError:
+        return True
+    return time.time() - attempted_at >= interval.total_seconds()
+
+def retrain_command(model_path: str, mode: str, shadow: bool = False) -> List[str]:
+    command = [sys.executable, "-m", "app.ml.training"]
+    trained_at = last_trained_at(model_path)
+    if mode == "incremental" and trained_at is not None:
+        # Instante completo: só a data retreinaria de novo as sessões do próprio dia do treino
+        command += ["--incremental", "--since", trained_at.isoformat()]
+    if shadow:
+        command.append("--shadow")
+    return command
+
+async def run_retrain(model_path: str, mode: str, shadow: bool = False) -> Optional[int]:
+    """Retreina em um processo separado; None se outro worker já estiver retreinando"""
+    os.makedirs(model_path, exist_ok=True)
+    with open(os.path.join(model_path, RETRAIN_LOCK), "a") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        os.utime(lock_file.name)
+
+        # O processo de treino publica a versão nova; os workers a carregam sozinhos
+        process = await asyncio.create_subprocess_exec(*retrain_command(model_path, mode, shadow))
+        return await process.wait()
+
+async def retrain_periodically(
+    model_path: str,
+    interval_days: int,
+    mode: str,
+    check_interval_seconds: int,
+    shadow: bool = False
+):
+    """Tarefa de fundo: confere periodicamente se o retreino venceu e o dispara"""
+    while True:
+        try:
+            if retrain_due(model_path, interval_days):
+                print(f"Retreino agendado iniciado (modo {mode})")
+                returncode = await run_retrain(model_path, mode, shadow)
+                if returncode is not None:
+                    print(f"Retreino agendado terminou com código {returncode}")
+        except Exception as e:
+            print(f"Erro no retreino agendado: {e}")
+        await asyncio.sleep(check_interval_seconds)
+
+async def watch_model_versions(ml_service, interval_seconds: int):
+    """Tarefa de fundo: troca para a versão publicada sem parar as requisições"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(ml_service.reload_if_changed)
+        except Exception as e:
+            print(f"Erro ao verificar versão dos modelos: {e}")
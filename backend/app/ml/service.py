@@ -1,22 +1,101 @@
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score
 import joblib
+import asyncio
+import copy
 import os
-from typing import Dict, List, Tuple
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+from app.ml.features import (
+    DEFAULT_FEATURE_COUNT, FEATURE_LAYOUT, LEGACY_FEATURE_LAYOUT, ResponseEncoder, response_features, stack_features
+)
+from app.ml.lookup import AnswerLookupStore
+from app.ml.forest import compile_forest, load_packed_forest, save_packed_forest
+from app.ml.registry import (
+    CURRENT_POINTER, LEGACY_VERSION, SHADOW_POINTER, clear_pointer, current_version, new_version, prune_versions,
+    publish_version, read_metadata, resolve_artifacts, staging_dir, version_dir, write_metadata
+)
+
+# Subdiretório de model_path com a floresta empacotada em arrays .npy
+FOREST_DIR = "forest"
+
+# Ordem fixa dos cursos nas matrizes de pontuação
+COURSE_KEYS = ("ti", "enfermagem", "logistica", "administracao", "estetica")
+
+COURSE_NAMES = {
+    "ti": "Tecnologia da Informação",
+    "enfermagem": "Enfermagem",
+    "logistica": "Logística",
+    "administracao": "Administração",
+    "estetica": "Estética"
+}
+
+# Nome do curso -> coluna da matriz de pontuação
+COURSE_INDEX = {COURSE_NAMES[course]: i for i, course in enumerate(COURSE_KEYS)}
+
+# Pesos usados quando a resposta não traz os pesos da opção
+DEFAULT_WEIGHTS = {course: 5.0 for course in COURSE_KEYS}
+
+class ModelSet:
+    """Conjunto de modelos de uma versão; trocado por inteiro, nunca alterado depois de publicado"""
+    
+    def __init__(
+        self,
+        scaler=None,
+        kmeans_model=None,
+        rf_model=None,
+        feature_names=None,
+        forest=None,
+        version=LEGACY_VERSION,
+        metadata=None,
+        encoder: Optional[ResponseEncoder] = None
+    ):
+        self.scaler = scaler
+        self.kmeans_model = kmeans_model
+        self.rf_model = rf_model
+        self.feature_names = feature_names or []
+        self.forest = forest
+        self.version = version
+        self.metadata = metadata or {}
+        # Sem encoder, as features seguem a codificação antiga por posição
+        self.encoder = encoder
+    
+    @property
+    def feature_layout(self) -> int:
+        """Disposição das features por posição; versões sem a chave nos metadados são antigas"""
+        return self.metadata.get("feature_layout", LEGACY_FEATURE_LAYOUT)
 
 class MLService:
-    def __init__(self, model_path: str = "./models/"):
+    def __init__(
+        self,
+        model_path: str = "./models/",
+        autoload: bool = True,
+        shared_artifacts: bool = True,
+        compiled_forest: bool = True,
+        versions_to_keep: int = 3,
+        lookup_max_combinations: int = 20000,
+        lookup_memo_size: int = 10000
+    ):
         self.model_path = model_path
-        self.scaler = None
-        self.kmeans_model = None
-        self.rf_model = None
-        self.feature_names = []
+        # Artefatos mapeados em memória são compartilhados entre os workers do uvicorn
+        self.shared_artifacts = shared_artifacts
+        # Avaliar a floresta compilada em arrays em vez do predict_proba do sklearn
+        self.compiled_forest = compiled_forest
+        self.versions_to_keep = versions_to_keep
+        # Uma única referência: leitores nunca misturam modelos de versões diferentes
+        self.models = ModelSet()
+        # Versão candidata avaliada em modo sombra (None sem candidata)
+        self.shadow_models: Optional[ModelSet] = None
+        self._last_version_check = 0.0
+        # Resultados por vetor de respostas do snapshot e da versão atuais
+        self.answer_lookup = AnswerLookupStore(self, lookup_max_combinations, lookup_memo_size)
         self.course_mapping = {
             0: "Tecnologia da Informação",
             1: "Enfermagem", 
@@ -24,26 +103,158 @@ class MLService:
             3: "Administração",
             4: "Estética"
         }
-        self.load_models()
+        # not_loaded -> loading -> ready | failed
+        self.status = "not_loaded"
+        self.status_detail = None
+        if autoload:
+            self.load_models()
+    
+    @property
+    def scaler(self):
+        return self.models.scaler
+    
+    @property
+    def kmeans_model(self):
+        return self.models.kmeans_model
+    
+    @property
+    def rf_model(self):
+        return self.models.rf_model
+    
+    @property
+    def forest(self):
+        return self.models.forest
+    
+    @property
+    def feature_names(self) -> List[str]:
+        return self.models.feature_names
+    
+    @property
+    def model_version(self) -> str:
+        return self.models.version
+    
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
     
     def load_models(self):
         """Carrega modelos treinados"""
+        self.status = "loading"
         try:
-            if os.path.exists(os.path.join(self.model_path, "scaler.joblib")):
-                self.scaler = joblib.load(os.path.join(self.model_path, "scaler.joblib"))
-            
-            if os.path.exists(os.path.join(self.model_path, "kmeans_model.joblib")):
-                self.kmeans_model = joblib.load(os.path.join(self.model_path, "kmeans_model.joblib"))
-            
-            if os.path.exists(os.path.join(self.model_path, "rf_model.joblib")):
-                self.rf_model = joblib.load(os.path.join(self.model_path, "rf_model.joblib"))
-            
-            if os.path.exists(os.path.join(self.model_path, "feature_names.joblib")):
-                self.feature_names = joblib.load(os.path.join(self.model_path, "feature_names.joblib"))
+            directory, version = resolve_artifacts(self.model_path)
+            self._install(self._load_model_set(directory, version))
+            self._reload_shadow()
                 
         except Exception as e:
             print(f"Erro ao carregar modelos: {e}")
-            self._initialize_default_models()
+            try:
+                self._initialize_default_models()
+            except Exception as init_error:
+                self.status = "failed"
+                self.status_detail = str(init_error)
+                print(f"Erro ao inicializar modelos padrão: {init_error}")
+    
+    def _install(self, models: ModelSet):
+        """Passa a usar o conjunto de modelos; o detalhe do /ready acompanha a versão instalada"""
+        self.models = models
+        self.status = "ready"
+        if models.metadata.get("mode") == "default":
+            self.status_detail = "Modelos padrão inicializados"
+        elif not self.has_model:
+            self.status_detail = "Modelos não encontrados; usando apenas pesos"
+        else:
+            self.status_detail = None
+    
+    def _load_model_set(self, directory: str, version: str) -> ModelSet:
+        """Carrega os artefatos de um diretório de versão"""
+        scaler = kmeans_model = rf_model = forest = None
+        feature_names = []
+        mmap_mode = "r" if self.shared_artifacts else None
+        
+        if os.path.exists(os.path.join(directory, "scaler.joblib")):
+            scaler = joblib.load(os.path.join(directory, "scaler.joblib"), mmap_mode=mmap_mode)
+        
+        if os.path.exists(os.path.join(directory, "kmeans_model.joblib")):
+            kmeans_model = joblib.load(os.path.join(directory, "kmeans_model.joblib"), mmap_mode=mmap_mode)
+        
+        # As árvores do sklearn copiam seus nós ao serem desserializadas; a versão
+        # empacotada em .npy é mapeada direto do page cache, sem cópia por worker
+        if self.compiled_forest:
+            forest = load_packed_forest(os.path.join(directory, FOREST_DIR), mmap_mode=mmap_mode)
+        
+        if forest is None and os.path.exists(os.path.join(directory, "rf_model.joblib")):
+            rf_model = joblib.load(os.path.join(directory, "rf_model.joblib"))
+            if self.compiled_forest:
+                forest = compile_forest(rf_model)
+        
+        if os.path.exists(os.path.join(directory, "feature_names.joblib")):
+            feature_names = joblib.load(os.path.join(directory, "feature_names.joblib"))
+        
+        return ModelSet(
+            scaler, kmeans_model, rf_model, feature_names, forest, version,
+            read_metadata(directory), ResponseEncoder.load(directory)
+        )
+    
+    def reload_if_changed(self, min_interval_seconds: float = 0.0, include_shadow: bool = True) -> bool:
+        """Troca para a versão apontada por CURRENT, se for outra; carrega antes de trocar"""
+        now = time.monotonic()
+        if now - self._last_version_check < min_interval_seconds:
+            return False
+        self._last_version_check = now
+        
+        if include_shadow:
+            self._reload_shadow()
+        
+        version = current_version(self.model_path)
+        if version is None or version == self.models.version:
+            return False
+        
+        try:
+            models = self._load_model_set(version_dir(self.model_path, version), version)
+        except Exception as e:
+            print(f"Erro ao carregar modelos da versão {version}: {e}")
+            return False
+        
+        # Requisições em andamento terminam com o conjunto que já tinham em mãos
+        self._install(models)
+        print(f"Modelos trocados para a versão {version}")
+        return True
+    
+    def _reload_shadow(self):
+        """Acompanha o ponteiro SHADOW: carrega, troca ou descarta a versão candidata"""
+        version = current_version(self.model_path, SHADOW_POINTER)
+        shadow = self.shadow_models
+        if version == (shadow.version if shadow is not None else None):
+            return
+        
+        if version is None or version == self.models.version:
+            self.shadow_models = None
+            return
+        
+        try:
+            self.shadow_models = self._load_model_set(version_dir(self.model_path, version), version)
+            print(f"Versão candidata {version} em modo sombra")
+        except Exception as e:
+            print(f"Erro ao carregar versão candidata {version}: {e}")
+    
+    def promote_shadow(self) -> Optional[str]:
+        """Publica a versão candidata como atual (None se não houver candidata)"""
+        shadow = self.shadow_models
+        if shadow is None:
+            return None
+        publish_version(self.model_path, shadow.version)
+        clear_pointer(self.model_path, SHADOW_POINTER)
+        self._install(shadow)
+        self.shadow_models = None
+        print(f"Versão candidata {shadow.version} promovida")
+        return shadow.version
+    
+    def discard_shadow(self) -> Optional[str]:
+        """Encerra o modo sombra sem promover a candidata"""
+        shadow = self.shadow_models
+        clear_pointer(self.model_path, SHADOW_POINTER)
+        self.shadow_models = None
+        return shadow.version if shadow is not None else None
     
     def _initialize_default_models(self):
         """Inicializa modelos padrão se não existirem"""
@@ -57,213 +268,364 @@ class MLService:
         y = np.random.randint(0, 5, n_samples)
         
         # Treinar modelos básicos
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
-        self.kmeans_model = KMeans(n_clusters=5, random_state=42)
-        self.kmeans_model.fit(X_scaled)
+        kmeans_model = KMeans(n_clusters=5, random_state=42)
+        kmeans_model.fit(X_scaled)
         
-        self.rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.rf_model.fit(X_scaled, y)
+        rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
+        rf_model.fit(X_scaled, y)
         
-        self.feature_names = [f"feature_{i}" for i in range(n_features)]
-        
-        # Salvar modelos
-        self.save_models()
+        # Salvar e publicar modelos
+        self._publish(ModelSet(
+            scaler, kmeans_model, rf_model,
+            [f"feature_{i}" for i in range(n_features)]
+        ), {"mode": "default", "samples": n_samples, "feature_layout": FEATURE_LAYOUT})
+    
+    def save_models(self, metadata: Optional[Dict] = None) -> str:
+        """Salva os modelos atuais como uma nova versão e a publica"""
+        models = self.models
+        return self._publish(
+            ModelSet(
+                models.scaler, models.kmeans_model, models.rf_model, models.feature_names, models.forest,
+                encoder=models.encoder
+            ),
+            {"feature_layout": models.feature_layout, **(metadata or {})}
+        )
     
-    def save_models(self):
-        """Salva modelos treinados"""
-        os.makedirs(self.model_path, exist_ok=True)
+    def _publish(self, models: ModelSet, metadata: Optional[Dict] = None, shadow: bool = False) -> str:
+        """Grava os artefatos em um diretório de versão novo, troca o ponteiro CURRENT e passa a usá-los
+
+        Com shadow=True a versão vira candidata (ponteiro SHADOW) e só é avaliada em modo sombra.
+        """
+        version = new_version()
+        staging = staging_dir(self.model_path, version)
+        os.makedirs(staging, exist_ok=True)
+        
+        if models.scaler:
+            joblib.dump(models.scaler, os.path.join(staging, "scaler.joblib"))
+        
+        if models.kmeans_model:
+            joblib.dump(models.kmeans_model, os.path.join(staging, "kmeans_model.joblib"))
+        
+        if models.rf_model:
+            joblib.dump(models.rf_model, os.path.join(staging, "rf_model.joblib"))
+            # Só publica a versão empacotada se ela reproduz exatamente o sklearn; a mesma
+            # floresta compilada vai para o artefato e para o ModelSet em memória
+            forest = models.forest if models.forest is not None else compile_forest(models.rf_model)
+            if forest is not None:
+                save_packed_forest(forest.arrays, os.path.join(staging, FOREST_DIR))
+            models.forest = forest if self.compiled_forest else None
+        
+        if models.feature_names:
+            joblib.dump(models.feature_names, os.path.join(staging, "feature_names.joblib"))
         
-        if self.scaler:
-            joblib.dump(self.scaler, os.path.join(self.model_path, "scaler.joblib"))
+        # Treino e inferência usam a mesma codificação salva com a versão
+        if models.encoder is not None:
+            models.encoder.save(staging)
         
-        if self.kmeans_model:
-            joblib.dump(self.kmeans_model, os.path.join(self.model_path, "kmeans_model.joblib"))
+        metadata = dict(metadata or {})
+        metadata.update({
+            "version": version,
+            "trained_at": datetime.utcnow().isoformat(),
+            "features": len(models.feature_names),
+            "encoder_snapshot": models.encoder.snapshot_version if models.encoder is not None else None
+        })
+        write_metadata(staging, metadata)
         
-        if self.rf_model:
-            joblib.dump(self.rf_model, os.path.join(self.model_path, "rf_model.joblib"))
+        # Diretório completo antes do nome final; o ponteiro só muda depois
+        os.rename(staging, version_dir(self.model_path, version))
+        publish_version(self.model_path, version, SHADOW_POINTER if shadow else CURRENT_POINTER)
+        prune_versions(self.model_path, self.versions_to_keep)
         
-        if self.feature_names:
-            joblib.dump(self.feature_names, os.path.join(self.model_path, "feature_names.joblib"))
+        models.version = version
+        models.metadata = metadata
+        if shadow:
+            self.shadow_models = models
+        else:
+            self._install(models)
+        return version
     
-    def preprocess_responses(self, responses: List[Dict]) -> np.ndarray:
-        """Preprocessa respostas do questionário para o modelo"""
-        # Converter respostas em features numéricas
-        features = []
+    def preprocess_responses(self, responses: List[Dict], models: Optional[ModelSet] = None):
+        """Preprocessa respostas do questionário para o modelo (CSR com encoder, densa sem)"""
+        # Mesma codificação usada para montar a matriz de treino
+        models = models or self.models
+        if models.encoder is not None:
+            return models.encoder.transform(responses)
+        target_length = len(models.feature_names) if models.feature_names else DEFAULT_FEATURE_COUNT
+        return response_features(responses, target_length, models.feature_layout)
+    
+    def preprocess_batch(self, sessions: List[List[Dict]]):
+        """Features de várias sessões, uma linha por sessão"""
+        models = self.models
+        if models.encoder is not None:
+            return models.encoder.transform_batch(sessions)
+        return np.vstack([self.preprocess_responses(responses, models) for responses in sessions])
+    
+    def _weight_matrix(self, responses: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Converte pesos das respostas em matriz (respostas x cursos) e total por resposta"""
+        weights = np.empty((len(responses), len(COURSE_KEYS)))
+        totals = np.empty(len(responses))
         
-        for response in responses:
-            # Extrair features das respostas
-            # Isso seria customizado baseado na estrutura real das perguntas
-            question_id = response.get("question_id", 0)
-            option_id = response.get("selected_option_id", 0)
-            response_time = response.get("response_time_ms", 0)
-            
-            # Criar features básicas
-            features.extend([question_id, option_id, response_time])
+        for i, response in enumerate(responses):
+            # Usar pesos reais se disponíveis
+            option_weights = response.get("weights", DEFAULT_WEIGHTS)
+            weights[i] = [
+                option_weights.get(f"weight_{course}", option_weights.get(course, 5.0))
+                for course in COURSE_KEYS
+            ]
+            totals[i] = sum(option_weights.values()) if isinstance(option_weights, dict) else 25.0
         
-        # Preencher ou truncar para ter o número correto de features
-        target_length = len(self.feature_names) if self.feature_names else 20
+        return weights, totals
+    
+    def _sum_sessions(self, weights: np.ndarray, totals: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Soma as linhas de pesos de cada sessão (offsets marcam o início de cada uma)"""
+        counts = np.diff(np.append(offsets, len(weights)))
         
-        if len(features) < target_length:
-            features.extend([0] * (target_length - len(features)))
-        elif len(features) > target_length:
-            features = features[:target_length]
+        # Linha extra de zeros permite offsets iguais ao tamanho (sessões vazias no fim)
+        padded_weights = np.vstack([weights, np.zeros((1, len(COURSE_KEYS)))])
+        padded_totals = np.append(totals, 0.0)
         
-        return np.array(features).reshape(1, -1)
+        raw_scores = np.add.reduceat(padded_weights, offsets, axis=0)
+        session_totals = np.add.reduceat(padded_totals, offsets)
+        raw_scores[counts == 0] = 0.0
+        session_totals[counts == 0] = 0.0
+        
+        return raw_scores, session_totals
     
-    def calculate_weighted_scores(self, responses: List[Dict]) -> Dict[str, float]:
-        """Calcula pontuações baseadas nos pesos das opções"""
-        scores = {
-            "ti": 0.0,
-            "enfermagem": 0.0,
-            "logistica": 0.0,
-            "administracao": 0.0,
-            "estetica": 0.0
-        }
+    def _normalize_scores(self, raw_scores: np.ndarray, totals: np.ndarray) -> np.ndarray:
+        """Normaliza pontuações para 0-100 (sessões sem peso ficam como estão)"""
+        safe_totals = np.where(totals > 0, totals, 1.0)[:, None]
+        return np.where(totals[:, None] > 0, (raw_scores / safe_totals) * 100, raw_scores)
+    
+    def predict_courses(self, features: np.ndarray, models: Optional[ModelSet] = None) -> np.ndarray:
+        """Índice (em COURSE_KEYS) do curso previsto pelo modelo para cada linha de features
+
+        models permite avaliar outro conjunto (ex.: a versão candidata em modo sombra).
+        """
+        # Uma única leitura: uma troca de versão no meio não mistura modelos
+        models = models or self.models
+        if models.encoder is not None and features.shape[1] != models.encoder.n_features:
+            raise ValueError("Features codificadas para outra versão do modelo")
+        if models.forest is not None:
+            # A floresta compilada indexa colunas diretamente; poucas colunas, densificar é barato
+            if sparse.issparse(features):
+                features = features.toarray()
+            features_scaled = self._fast_scale(features, models.scaler)
+            model = models.forest
+        else:
+            features_scaled = models.scaler.transform(features)
+            model = models.rf_model
+        ml_probabilities = model.predict_proba(features_scaled)
         
-        total_weight = 0
+        # Mesmo resultado de rf_model.predict, sem percorrer as árvores duas vezes
+        ml_predictions = model.classes_[np.argmax(ml_probabilities, axis=1)]
+        return np.array([
+            COURSE_INDEX[self.course_mapping.get(prediction, "Tecnologia da Informação")]
+            for prediction in ml_predictions
+        ], dtype=np.intp)
+    
+    def _fast_scale(self, features: np.ndarray, scaler) -> np.ndarray:
+        """Mesmas operações de StandardScaler.transform, sem a validação de entrada"""
+        scaled = np.array(features, dtype=np.float64)
+        if scaler.with_mean:
+            scaled -= scaler.mean_
+        if scaler.with_std:
+            scaled /= scaler.scale_
+        return scaled
+    
+    def _rank_scores(self, scores: np.ndarray, ml_courses: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Aplica ajuste do ML, escolhe curso (argmax) e calcula confiança (margem top-2)"""
+        scores = scores.copy()
+        if ml_courses is not None:
+            rows = np.arange(len(scores))
+            scores[rows, ml_courses] *= 1.2
         
-        for response in responses:
-            # Usar pesos reais se disponíveis
-            weights = response.get("weights", {
-                "ti": 5.0,
-                "enfermagem": 5.0,
-                "logistica": 5.0,
-                "administracao": 5.0,
-                "estetica": 5.0
-            })
-            
-            for course in scores:
-                weight_key = f"weight_{course}" if course != "ti" else "weight_ti"
-                scores[course] += weights.get(weight_key, weights.get(course, 5.0))
-            
-            total_weight += sum(weights.values()) if isinstance(weights, dict) else 25.0
+        recommended = np.argmax(scores, axis=1)
         
-        # Normalizar pontuações para 0-100
-        if total_weight > 0:
-            for course in scores:
-                scores[course] = (scores[course] / total_weight) * 100
+        # Confiança baseada na diferença entre o maior e segundo maior score
+        ordered = np.sort(scores, axis=1)
+        confidence = np.clip((ordered[:, -1] - ordered[:, -2]) / 100, 0.1, 1.0)
         
-        return scores
+        return scores, recommended, confidence
+    
+    def _build_result(self, scores: np.ndarray, recommended: int, confidence: float, processing_time: int) -> Dict:
+        return {
+            "scores": {course: float(score) for course, score in zip(COURSE_KEYS, scores)},
+            "recommended_course": COURSE_NAMES[COURSE_KEYS[recommended]],
+            "confidence_score": float(confidence),
+            "processing_time_ms": processing_time,
+            "model_version": self.model_version
+        }
+    
+    def _default_result(self) -> Dict:
+        """Resultado padrão em caso de erro"""
+        return {
+            "scores": {
+                "ti": 20.0,
+                "enfermagem": 20.0,
+                "logistica": 20.0,
+                "administracao": 20.0,
+                "estetica": 20.0
+            },
+            "recommended_course": "Tecnologia da Informação",
+            "confidence_score": 0.5,
+            "processing_time_ms": 100,
+            "model_version": self.model_version
+        }
+    
+    def calculate_weighted_scores(self, responses: List[Dict]) -> Dict[str, float]:
+        """Calcula pontuações baseadas nos pesos das opções"""
+        scores = self.weighted_score_matrix(responses)[0]
+        return {course: float(score) for course, score in zip(COURSE_KEYS, scores)}
+    
+    def weighted_score_matrix(self, responses: List[Dict]) -> np.ndarray:
+        """Pontuações ponderadas normalizadas de uma sessão, como matriz 1 x cursos"""
+        weights, totals = self._weight_matrix(responses)
+        raw_scores, session_totals = self._sum_sessions(weights, totals, np.array([0]))
+        return self._normalize_scores(raw_scores, session_totals)
+    
+    @property
+    def has_model(self) -> bool:
+        models = self.models
+        return models.scaler is not None and (models.rf_model is not None or models.forest is not None)
     
-    def classify_responses(self, responses: List[Dict]) -> Dict:
-        """Classifica respostas e retorna recomendação"""
+    def finalize_classification(self, scores: np.ndarray, ml_courses: Optional[np.ndarray], start_time: datetime) -> Dict:
+        """Combina pontuações ponderadas com a predição do modelo (se houver)"""
+        scores, recommended, confidence = self._rank_scores(scores, ml_courses)
+        processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        return self._build_result(scores[0], recommended[0], confidence[0], processing_time)
+    
+    def classify_responses(self, responses: List[Dict], use_model: bool = True) -> Dict:
+        """Classifica respostas e retorna recomendação (use_model=False usa apenas os pesos)"""
         start_time = datetime.now()
         
         try:
             # Calcular pontuações baseadas em pesos
-            weighted_scores = self.calculate_weighted_scores(responses)
+            scores = self.weighted_score_matrix(responses)
             
             # Se modelos ML estão disponíveis, usar também
-            if self.scaler and self.rf_model:
-                features = self.preprocess_responses(responses)
-                features_scaled = self.scaler.transform(features)
-                
-                # Predição do modelo
-                ml_prediction = self.rf_model.predict(features_scaled)[0]
-                ml_probabilities = self.rf_model.predict_proba(features_scaled)[0]
-                
-                # Combinar pontuações ponderadas com ML
-                ml_course = self.course_mapping.get(ml_prediction, "Tecnologia da Informação")
-                ml_confidence = max(ml_probabilities)
-                
-                # Ajustar pontuações baseadas na predição ML
-                if ml_course == "Tecnologia da Informação":
-                    weighted_scores["ti"] *= 1.2
-                elif ml_course == "Enfermagem":
-                    weighted_scores["enfermagem"] *= 1.2
-                elif ml_course == "Logística":
-                    weighted_scores["logistica"] *= 1.2
-                elif ml_course == "Administração":
-                    weighted_scores["administracao"] *= 1.2
-                elif ml_course == "Estética":
-                    weighted_scores["estetica"] *= 1.2
-            
-            # Determinar curso recomendado
-            recommended_course_key = max(weighted_scores, key=weighted_scores.get)
-            course_names = {
-                "ti": "Tecnologia da Informação",
-                "enfermagem": "Enfermagem",
-                "logistica": "Logística", 
-                "administracao": "Administração",
-                "estetica": "Estética"
-            }
-            
-            recommended_course = course_names[recommended_course_key]
+            ml_courses = None
+            if use_model and self.has_model:
+                ml_courses = self.predict_courses(self.preprocess_responses(responses))
             
-            # Calcular confiança baseada na diferença entre o maior e segundo maior score
-            sorted_scores = sorted(weighted_scores.values(), reverse=True)
-            confidence = (sorted_scores[0] - sorted_scores[1]) / 100 if len(sorted_scores) > 1 else 0.8
-            confidence = min(max(confidence, 0.1), 1.0)  # Limitar entre 0.1 e 1.0
+            return self.finalize_classification(scores, ml_courses, start_time)
             
+        except Exception as e:
+            print(f"Erro na classificação: {e}")
+            # Retornar resultado padrão em caso de erro
+            return self._default_result()
+    
+    def rank_sessions(self, sessions: List[List[Dict]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pontuações, curso (índice) e confiança de várias sessões; erros são propagados"""
+        return self._rank_scores(*self.score_sessions(sessions))
+    
+    def score_sessions(self, sessions: List[List[Dict]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Pontuações ponderadas e curso previsto pelo modelo (None sem modelo) de várias sessões"""
+        # Empilhar as respostas de todas as sessões em uma única matriz
+        offsets = np.cumsum([0] + [len(responses) for responses in sessions[:-1]])
+        flat_responses = [response for responses in sessions for response in responses]
+        weights, totals = self._weight_matrix(flat_responses)
+        raw_scores, session_totals = self._sum_sessions(weights, totals, offsets)
+        scores = self._normalize_scores(raw_scores, session_totals)
+        
+        # Uma única chamada ao modelo para todas as sessões
+        ml_courses = None
+        if self.has_model:
+            features = self.preprocess_batch(sessions)
+            ml_courses = self.predict_courses(features)
+        
+        return scores, ml_courses
+    
+    def classify_batch(self, sessions: List[List[Dict]]) -> List[Dict]:
+        """Classifica várias sessões de uma vez (ex.: reprocessamento de dados históricos)"""
+        start_time = datetime.now()
+        
+        if not sessions:
+            return []
+        
+        try:
+            scores, recommended, confidence = self.rank_sessions(sessions)
             processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
             
-            return {
-                "scores": {
-                    "ti": weighted_scores["ti"],
-                    "enfermagem": weighted_scores["enfermagem"],
-                    "logistica": weighted_scores["logistica"],
-                    "administracao": weighted_scores["administracao"],
-                    "estetica": weighted_scores["estetica"]
-                },
-                "recommended_course": recommended_course,
-                "confidence_score": confidence,
-                "processing_time_ms": processing_time,
-                "model_version": "1.0.0"
-            }
+            return [
+                self._build_result(scores[i], recommended[i], confidence[i], processing_time)
+                for i in range(len(sessions))
+            ]
             
         except Exception as e:
-            print(f"Erro na classificação: {e}")
-            # Retornar resultado padrão em caso de erro
-            return {
-                "scores": {
-                    "ti": 20.0,
-                    "enfermagem": 20.0,
-                    "logistica": 20.0,
-                    "administracao": 20.0,
-                    "estetica": 20.0
-                },
-                "recommended_course": "Tecnologia da Informação",
-                "confidence_score": 0.5,
-                "processing_time_ms": 100,
-                "model_version": "1.0.0"
-            }
+            print(f"Erro na classificação em lote: {e}")
+            return [self._default_result() for _ in sessions]
     
-    def retrain_model(self, training_data: pd.DataFrame):
-        """Retreina modelo com novos dados"""
+    def retrain_model(
+        self,
+        training_data: pd.DataFrame,
+        shadow: bool = False,
+        feature_layout: int = LEGACY_FEATURE_LAYOUT
+    ):
+        """Retreina modelo com novos dados (shadow=True publica como candidata)
+
+        As colunas do DataFrame seguem a ordem de envio das respostas, salvo feature_layout dizer outra.
+        """
         try:
-            # Preparar dados
             X = training_data.drop(['target'], axis=1)
             y = training_data['target']
-            
+        except KeyError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Erro ao retreinar modelo"
+            }
+        return self.train(X.to_numpy(), y.to_numpy(), list(X.columns), shadow=shadow, feature_layout=feature_layout)
+    
+    def train(
+        self,
+        X,
+        y: np.ndarray,
+        feature_names: List[str],
+        encoder: Optional[ResponseEncoder] = None,
+        shadow: bool = False,
+        feature_layout: int = FEATURE_LAYOUT
+    ):
+        """Treina e publica os modelos a partir da matriz de features (densa ou CSR) e dos alvos
+
+        Com encoder, ele é salvo junto da versão e passa a codificar as respostas na inferência.
+        Com shadow, a versão nova é só candidata até ser promovida. feature_layout registra a
+        disposição das linhas de X, que a inferência repete para modelos sem encoder.
+        """
+        try:
             # Dividir dados
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
             
-            # Treinar scaler
-            self.scaler = StandardScaler()
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Treinar scaler (sem centralizar matrizes esparsas, o que as tornaria densas)
+            scaler = StandardScaler(with_mean=not sparse.issparse(X))
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
             # Treinar modelos
-            self.kmeans_model = KMeans(n_clusters=5, random_state=42)
-            self.kmeans_model.fit(X_train_scaled)
+            kmeans_model = KMeans(n_clusters=5, random_state=42)
+            kmeans_model.fit(X_train_scaled)
             
-            self.rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.rf_model.fit(X_train_scaled, y_train)
+            rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
+            rf_model.fit(X_train_scaled, y_train)
             
             # Avaliar modelo
-            y_pred = self.rf_model.predict(X_test_scaled)
+            y_pred = rf_model.predict(X_test_scaled)
             accuracy = accuracy_score(y_test, y_pred)
             
-            # Salvar modelos
-            self.save_models()
+            # Salvar e publicar como nova versão
+            version = self._publish(ModelSet(
+                scaler, kmeans_model, rf_model, list(feature_names),
+                encoder=encoder
+            ), {"mode": "full", "samples": len(y), "accuracy": accuracy, "feature_layout": feature_layout}, shadow)
             
             return {
                 "success": True,
                 "accuracy": accuracy,
+                "version": version,
                 "message": "Modelo retreinado com sucesso"
             }
             
@@ -274,14 +636,171 @@ class MLService:
                 "message": "Erro ao retreinar modelo"
             }
     
+    def update_incremental(
+        self,
+        X,
+        y: np.ndarray,
+        feature_names: List[str],
+        new_trees: int = 20,
+        max_trees: int = 100,
+        shadow: bool = False,
+        feature_layout: int = FEATURE_LAYOUT
+    ):
+        """Atualiza os modelos só com sessões novas: partial_fit no agrupamento e árvores novas na floresta
+
+        O scaler fica fixo, pois as árvores existentes dependem da escala em que foram
+        treinadas; o retreino completo (train) é que o recalcula.
+        """
+        try:
+            models = self.models
+            scaler = models.scaler
+            rf_model = self._sklearn_forest(models)
+            if scaler is None or rf_model is None:
+                return self.train(X, y, feature_names, models.encoder, shadow, feature_layout)
+            
+            if models.feature_names and list(feature_names) != list(models.feature_names):
+                raise ValueError("Features diferentes das do modelo atual; use o retreino completo")
+            if models.encoder is None and feature_layout != models.feature_layout:
+                raise ValueError("Disposição das features diferente da do modelo atual; use o retreino completo")
+            
+            # Árvores novas precisam ver as mesmas classes das antigas
+            if not np.array_equal(np.unique(y), rf_model.classes_):
+                raise ValueError("Dados novos não cobrem todas as classes do modelo; use o retreino completo")
+            
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42
+            )
+            X_train_scaled = scaler.transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+            
+            # Agrupamento: continua dos centros atuais
+            kmeans_model = models.kmeans_model
+            if not isinstance(kmeans_model, MiniBatchKMeans):
+                init = kmeans_model.cluster_centers_ if kmeans_model is not None else "k-means++"
+                kmeans_model = MiniBatchKMeans(n_clusters=5, init=init, n_init=1, random_state=42)
+            else:
+                kmeans_model = copy.deepcopy(kmeans_model)
+            kmeans_model.partial_fit(X_train_scaled)
+            
+            # Floresta: acrescenta árvores treinadas nos dados novos e aposenta as mais antigas
+            rf_model = copy.deepcopy(rf_model)
+            rf_model.set_params(warm_start=True, n_estimators=len(rf_model.estimators_) + new_trees)
+            rf_model.fit(X_train_scaled, y_train)
+            if len(rf_model.estimators_) > max_trees:
+                rf_model.estimators_ = rf_model.estimators_[-max_trees:]
+                rf_model.n_estimators = len(rf_model.estimators_)
+            
+            accuracy = accuracy_score(y_test, rf_model.predict(X_test_scaled))
+            
+            version = self._publish(ModelSet(
+                scaler, kmeans_model, rf_model, list(feature_names),
+                encoder=models.encoder
+            ), {"mode": "incremental", "samples": len(y), "accuracy": accuracy, "base_version": models.version,
+                "feature_layout": feature_layout}, shadow)
+            
+            return {
+                "success": True,
+                "accuracy": accuracy,
+                "version": version,
+                "n_estimators": rf_model.n_estimators,
+                "message": "Modelo atualizado incrementalmente"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Erro ao atualizar modelo"
+            }
+    
+    def _sklearn_forest(self, models: ModelSet):
+        """Floresta do sklearn (com a floresta empacotada carregada, ela fica só em disco)"""
+        if models.rf_model is not None:
+            return models.rf_model
+        directory = version_dir(self.model_path, models.version)
+        if models.version == LEGACY_VERSION:
+            directory = self.model_path
+        path = os.path.join(directory, "rf_model.joblib")
+        return joblib.load(path) if os.path.exists(path) else None
+    
     def get_model_info(self) -> Dict:
         """Retorna informações sobre o modelo atual"""
+        models = self.models
+        trained_at = models.metadata.get("trained_at")
         return {
-            "version": "1.0.0",
-            "last_trained": datetime.now(),
-            "accuracy": 0.85,  # Placeholder
-            "total_samples": 1000,  # Placeholder
-            "features_count": len(self.feature_names) if self.feature_names else 0,
+            "status": self.status,
+            "version": models.version,
+            "last_trained": datetime.fromisoformat(trained_at) if trained_at else None,
+            "accuracy": models.metadata.get("accuracy"),
+            "total_samples": models.metadata.get("samples"),
+            "features_count": len(models.feature_names),
             "model_type": "Random Forest + K-Means"
         }
 
+class InferenceBatcher:
+    """Agrupa linhas de requisições concorrentes em uma única chamada ao modelo"""
+    
+    def __init__(
+        self,
+        run_model: Callable[[np.ndarray], Awaitable[np.ndarray]],
+        max_batch_size: int = 16,
+        window_ms: float = 2.0
+    ):
+        # run_model recebe a matriz empilhada e retorna um curso previsto por linha
+        self.run_model = run_model
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.rows = 0
+        self.max_observed_batch = 0
+    
+    async def predict(self, features: np.ndarray) -> np.ndarray:
+        """Enfileira uma linha de features e aguarda o curso previsto para ela"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+    
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        
+        try:
+            features = stack_features([row for row, _ in batch])
+            ml_courses = await self.run_model(features)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # Chamadores que desistiram (timeout) já têm o future cancelado
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(ml_courses[i:i + 1])
+    
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "average_batch_size": round(self.rows / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_observed_batch
+        }
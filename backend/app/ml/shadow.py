@@ -0,0 +1,159 @@
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.ml.service import COURSE_INDEX, COURSE_KEYS, COURSE_NAMES, MLService
+
+def latency_summary(latencies) -> Optional[Dict]:
+    if not latencies:
+        return None
+    values = np.array(latencies)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3)
+    }
+
+class ShadowScorer:
+    """Pontua as entradas reais com a versão candidata, fora do caminho da requisição
+
+    Um único thread de fundo com fila limitada: acima de max_pending as entradas são
+    descartadas, e pontuações que estouram budget_ms (espera na fila + inferência) são
+    contadas mas não entram na comparação. A candidata nunca atrasa a resposta ao aluno.
+    """
+
+    def __init__(self, ml_service: MLService, budget_ms: float = 50.0, max_pending: int = 32, window: int = 1000):
+        self.ml_service = ml_service
+        self.budget_ms = budget_ms
+        self.max_pending = max_pending
+        self.window = window
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, version: Optional[str]):
+        self.version = version
+        self.started_at = datetime.utcnow()
+        self.observed = 0
+        self.scored = 0
+        self.dropped = 0
+        self.over_budget = 0
+        self.errors = 0
+        self.model_compared = 0
+        self.model_agreements = 0
+        self.recommendation_agreements = 0
+        # Recomendação da versão atual (linhas) x da candidata (colunas), na ordem de COURSE_KEYS
+        self.recommendations = np.zeros((len(COURSE_KEYS), len(COURSE_KEYS)), dtype=np.int64)
+        self.primary_latencies_ms = deque(maxlen=self.window)
+        self.shadow_latencies_ms = deque(maxlen=self.window)
+
+    def observe(
+        self,
+        responses: List[Dict],
+        recommended_course: str,
+        primary_course: Optional[int] = None,
+        primary_latency_ms: Optional[float] = None
+    ):
+        """Enfileira a mesma entrada para a candidata; não bloqueia e descarta se a fila estiver cheia"""
+        shadow = self.ml_service.shadow_models
+        if shadow is None:
+            return
+
+        with self._lock:
+            if shadow.version != self.version:
+                self._reset(shadow.version)
+            self.observed += 1
+            if primary_latency_ms is not None:
+                self.primary_latencies_ms.append(primary_latency_ms)
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-shadow")
+
+        self._pool.submit(
+            self._score, shadow, responses, recommended_course, primary_course, time.perf_counter()
+        )
+
+    def _score(self, shadow, responses: List[Dict], recommended_course: str, primary_course: Optional[int], queued_at: float):
+        try:
+            # Fila atrasada: descarta em vez de acumular trabalho vencido
+            if (time.perf_counter() - queued_at) * 1000 > self.budget_ms:
+                with self._lock:
+                    self.over_budget += 1
+                return
+
+            started = time.perf_counter()
+            scores = self.ml_service.weighted_score_matrix(responses)
+            shadow_courses = None
+            if shadow.scaler is not None and (shadow.forest is not None or shadow.rf_model is not None):
+                features = self.ml_service.preprocess_responses(responses, shadow)
+                shadow_courses = self.ml_service.predict_courses(features, shadow)
+            _, recommended, _ = self.ml_service._rank_scores(scores, shadow_courses)
+            latency_ms = (time.perf_counter() - started) * 1000
+            total_ms = (time.perf_counter() - queued_at) * 1000
+
+            with self._lock:
+                # Candidata trocada durante a pontuação: o resultado é de outra comparação
+                if shadow.version != self.version:
+                    return
+                if total_ms > self.budget_ms:
+                    self.over_budget += 1
+                    return
+
+                self.scored += 1
+                self.shadow_latencies_ms.append(latency_ms)
+                primary = COURSE_INDEX[recommended_course]
+                self.recommendations[primary, recommended[0]] += 1
+                self.recommendation_agreements += int(primary == recommended[0])
+                if primary_course is not None and shadow_courses is not None:
+                    self.model_compared += 1
+                    self.model_agreements += int(primary_course == shadow_courses[0])
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Erro na pontuação em modo sombra: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def summary(self) -> Dict:
+        """Comparação entre a versão atual e a candidata desde que a candidata entrou"""
+        with self._lock:
+            shadow = self.ml_service.shadow_models
+            return {
+                "active": shadow is not None and shadow.version == self.version,
+                "primary_version": self.ml_service.model_version,
+                "candidate_version": self.version,
+                "since": self.started_at.isoformat(),
+                "budget_ms": self.budget_ms,
+                "observed": self.observed,
+                "scored": self.scored,
+                "dropped": self.dropped,
+                "over_budget": self.over_budget,
+                "errors": self.errors,
+                "pending": self._pending,
+                "model_agreement_rate": round(self.model_agreements / self.model_compared, 4) if self.model_compared else None,
+                "recommendation_agreement_rate": round(self.recommendation_agreements / self.scored, 4) if self.scored else None,
+                "latency_ms": {
+                    "primary": latency_summary(self.primary_latencies_ms),
+                    "candidate": latency_summary(self.shadow_latencies_ms)
+                },
+                "recommendations": {
+                    COURSE_NAMES[primary]: {
+                        COURSE_NAMES[candidate]: int(self.recommendations[i, j])
+                        for j, candidate in enumerate(COURSE_KEYS)
+                    }
+                    for i, primary in enumerate(COURSE_KEYS)
+                }
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
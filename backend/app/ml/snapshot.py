@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import Question, QuestionOption, QuestionnaireRevision
+from app.ml.service import COURSE_KEYS
+
+# Linha única da tabela questionnaire_revision
+REVISION_ROW_ID = 1
+
+class SnapshotValidationError(ValueError):
+    """Erro de validação de uma submissão contra o snapshot"""
+    pass
+
+def revision_query():
+    return select(QuestionnaireRevision.revision).where(QuestionnaireRevision.id == REVISION_ROW_ID)
+
+def questionnaire_revision(db: Session) -> int:
+    """Revisão do questionário gravada no banco (0 antes da primeira alteração)"""
+    return db.scalar(revision_query()) or 0
+
+async def questionnaire_revision_async(db: AsyncSession) -> int:
+    return await db.scalar(revision_query()) or 0
+
+def bump_revision(db: Session):
+    """Incrementa a revisão na transação corrente; o commit fica com quem alterou as perguntas"""
+    updated = db.execute(
+        update(QuestionnaireRevision).where(
+            QuestionnaireRevision.id == REVISION_ROW_ID
+        ).values(revision=QuestionnaireRevision.revision + 1)
+    ).rowcount
+    if not updated:
+        db.execute(insert(QuestionnaireRevision).values(id=REVISION_ROW_ID, revision=1))
+
+class QuestionnaireSnapshot:
+    """Retrato imutável das perguntas ativas e da matriz de pesos opção x curso"""
+
+    def __init__(self, questions: List[Tuple[int, int]], options: List[Tuple], revision: int = 0):
+        # questions: [(question_id, order)]; options: [(option_id, question_id, w_ti, ..., w_estetica)]
+        # revision: revisão do banco lida antes das perguntas
+        self.revision = revision
+        self.questions = tuple(questions)
+        self.question_ids = frozenset(question_id for question_id, _ in questions)
+        self.option_questions: Dict[int, int] = {option[0]: option[1] for option in options}
+        self.option_index: Dict[int, int] = {option[0]: row for row, option in enumerate(options)}
+
+        weights = np.array(
+            [option[2:] for option in options], dtype=np.float32
+        ).reshape(len(options), len(COURSE_KEYS))
+        weights.flags.writeable = False
+        self.weights = weights
+
+        self.version = self._compute_version()
+        self.built_at = time.monotonic()
+
+    def _compute_version(self) -> str:
+        """Versão derivada do conteúdo, igual em todos os workers"""
+        digest = hashlib.sha1()
+        digest.update(repr(self.questions).encode())
+        digest.update(repr(sorted(self.option_index.items())).encode())
+        digest.update(repr(sorted(self.option_questions.items())).encode())
+        digest.update(self.weights.tobytes())
+        return digest.hexdigest()[:12]
+
+    @classmethod
+    def from_db(cls, db: Session, revision: Optional[int] = None) -> "QuestionnaireSnapshot":
+        """Constrói snapshot a partir das perguntas ativas"""
+        # Revisão antes das perguntas: uma alteração concorrente no máximo força outra reconstrução
+        if revision is None:
+            revision = questionnaire_revision(db)
+        questions = db.execute(
+            select(Question.id, Question.order).where(
+                Question.is_active == True
+            ).order_by(Question.order, Question.id)
+        ).all()
+
+        options = db.execute(
+            select(
+                QuestionOption.id,
+                QuestionOption.question_id,
+                QuestionOption.weight_ti,
+                QuestionOption.weight_enfermagem,
+                QuestionOption.weight_logistica,
+                QuestionOption.weight_administracao,
+                QuestionOption.weight_estetica
+            ).join(Question, Question.id == QuestionOption.question_id).where(
+                Question.is_active == True
+            ).order_by(Question.order, Question.id, QuestionOption.order, QuestionOption.id)
+        ).all()
+
+        return cls(
+            [(row[0], row[1]) for row in questions],
+            [(row[0], row[1]) + tuple(float(w or 0.0) for w in row[2:]) for row in options],
+            revision
+        )
+
+    def rows_for(self, responses: List) -> np.ndarray:
+        """Valida respostas e retorna as linhas da matriz de pesos selecionadas"""
+        rows = np.empty(len(responses), dtype=np.intp)
+
+        for i, response_data in enumerate(responses):
+            question_id = self.option_questions.get(response_data.selected_option_id)
+            if question_id is None:
+                if response_data.question_id not in self.question_ids:
+                    raise SnapshotValidationError(f"Pergunta {response_data.question_id} não encontrada")
+                raise SnapshotValidationError(f"Opção {response_data.selected_option_id} não encontrada")
+            if question_id != response_data.question_id:
+                raise SnapshotValidationError(
+                    f"Opção {response_data.selected_option_id} não pertence à pergunta {response_data.question_id}"
+                )
+            rows[i] = self.option_index[response_data.selected_option_id]
+
+        return rows
+
+    def weights_for(self, row: int) -> Dict[str, float]:
+        """Pesos de uma linha da matriz no formato esperado pelo MLService"""
+        return {course: float(weight) for course, weight in zip(COURSE_KEYS, self.weights[row])}
+
+class SnapshotStore:
+    """Mantém o snapshot atual e o substitui atomicamente quando reconstruído
+
+    Cada leitura confere a revisão gravada no banco, então alterações feitas por outro
+    worker valem já na requisição seguinte; o TTL fica só como limite adicional.
+    """
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[QuestionnaireSnapshot] = None
+        # Uma reconstrução por vez; quem esperava reaproveita o snapshot recém-publicado
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+
+    def get(self, db: Session) -> QuestionnaireSnapshot:
+        """Retorna snapshot atual, reconstruindo se ausente, expirado ou de outra revisão"""
+        revision = questionnaire_revision(db)
+        snapshot = self._snapshot
+        if self._is_current(snapshot, revision):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_current(snapshot, revision):
+                return snapshot
+            return self.refresh(db, revision)
+
+    async def get_async(self, db: AsyncSession) -> QuestionnaireSnapshot:
+        """Versão assíncrona de get; só lê as perguntas quando precisa reconstruir"""
+        revision = await questionnaire_revision_async(db)
+        snapshot = self._snapshot
+        if self._is_current(snapshot, revision):
+            return snapshot
+
+        # Lock do event loop: a reconstrução libera o loop enquanto espera o banco
+        async with self._async_lock:
+            snapshot = self._snapshot
+            if self._is_current(snapshot, revision):
+                return snapshot
+            return await db.run_sync(self.refresh, revision)
+
+    def refresh(self, db: Session, revision: Optional[int] = None) -> QuestionnaireSnapshot:
+        """Reconstrói o snapshot e o publica"""
+        # Construído por completo antes da troca; leitores veem o antigo ou o novo
+        snapshot = QuestionnaireSnapshot.from_db(db, revision)
+        self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """Descarta o snapshot atual"""
+        self._snapshot = None
+
+    def _is_current(self, snapshot: Optional[QuestionnaireSnapshot], revision: int) -> bool:
+        return snapshot is not None and snapshot.revision == revision and not self._is_stale(snapshot)
+
+    def _is_stale(self, snapshot: QuestionnaireSnapshot) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - snapshot.built_at > self.ttl_seconds
+
+# Instância global do snapshot
+questionnaire_snapshot = SnapshotStore(ttl_seconds=settings.questionnaire_snapshot_ttl_seconds)
@@ -0,0 +1,292 @@
+import argparse
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select
+from app.core.database import SessionLocal, engine
+from app.ml.features import DEFAULT_FEATURE_COUNT, RESPONSE_FEATURES, ResponseEncoder, response_feature_names
+from app.ml.service import COURSE_INDEX
+from app.models import QuestionnaireResponse, RecommendationResult
+
+# Respostas de todas as sessões com o curso recomendado, na ordem da codificação de features
+TRAINING_ROWS_QUERY = select(
+    QuestionnaireResponse.session_id,
+    QuestionnaireResponse.question_id,
+    QuestionnaireResponse.selected_option_id,
+    QuestionnaireResponse.response_time_ms,
+    RecommendationResult.recommended_course
+).join(
+    RecommendationResult, RecommendationResult.session_id == QuestionnaireResponse.session_id
+).order_by(
+    QuestionnaireResponse.session_id, QuestionnaireResponse.question_id, QuestionnaireResponse.id
+)
+
+def parse_since(value: str) -> datetime:
+    """Data ou data e hora ISO (como o trained_at dos metadados); sem fuso, é UTC"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+class TrainingMatrixBuilder:
+    """Preenche uma matriz pré-alocada (sessões x features) a partir de pedaços de respostas"""
+
+    def __init__(self, n_sessions: int, width: int = DEFAULT_FEATURE_COUNT):
+        self.width = width
+        self.X = np.zeros((n_sessions, width))
+        self.y = np.full(n_sessions, -1, dtype=np.int64)
+        self.filled = 0
+        self.skipped = 0
+        # Respostas da última sessão do pedaço, que pode continuar no próximo
+        self._carry: Optional[pd.DataFrame] = None
+
+    def add_chunk(self, chunk: pd.DataFrame):
+        if self._carry is not None:
+            chunk = pd.concat([self._carry, chunk], ignore_index=True)
+        last_session = chunk["session_id"].iat[-1]
+        complete = chunk["session_id"].to_numpy() != last_session
+        self._carry = chunk[~complete]
+        self._write(chunk[complete])
+
+    def finish(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Última sessão pendente; retorna visões (sem cópia) das linhas preenchidas"""
+        if self._carry is not None and len(self._carry):
+            self._write(self._carry)
+            self._carry = None
+        return self.X[:self.filled], self.y[:self.filled]
+
+    def _write(self, rows: pd.DataFrame):
+        if not len(rows):
+            return
+
+        session_ids = rows["session_id"].to_numpy()
+        new_session = np.empty(len(rows), dtype=bool)
+        new_session[0] = True
+        new_session[1:] = session_ids[1:] != session_ids[:-1]
+
+        n_new = int(new_session.sum())
+        if self.filled + n_new > len(self.y):
+            # Sessões gravadas depois da contagem inicial ficam para o próximo treino
+            self.skipped += self.filled + n_new - len(self.y)
+            n_new = len(self.y) - self.filled
+            if n_new <= 0:
+                return
+
+        # Linha da matriz e posição da resposta dentro da sessão
+        session_number = np.cumsum(new_session) - 1
+        session_starts = np.flatnonzero(new_session)
+        position = np.arange(len(rows)) - session_starts[session_number]
+        keep = session_number < n_new
+        self._store(rows, self.filled + session_number, position, keep)
+
+        courses = rows["recommended_course"].to_numpy()[session_starts[:n_new]]
+        self.y[self.filled:self.filled + n_new] = [COURSE_INDEX.get(course, -1) for course in courses]
+        self.filled += n_new
+
+    def _store(self, rows: pd.DataFrame, matrix_rows: np.ndarray, position: np.ndarray, keep: np.ndarray):
+        values = (
+            rows["question_id"].to_numpy(),
+            rows["selected_option_id"].to_numpy(),
+            rows["response_time_ms"].to_numpy()
+        )
+        for offset, column_values in enumerate(values):
+            columns = position * len(RESPONSE_FEATURES) + offset
+            inside = keep & (columns < self.width)
+            self.X[matrix_rows[inside], columns[inside]] = column_values[inside]
+
+class SparseTrainingMatrixBuilder(TrainingMatrixBuilder):
+    """Mesma leitura em pedaços, acumulando as entradas do ResponseEncoder para uma matriz CSR"""
+
+    def __init__(self, n_sessions: int, encoder: ResponseEncoder):
+        self.encoder = encoder
+        self.y = np.full(n_sessions, -1, dtype=np.int64)
+        self.filled = 0
+        self.skipped = 0
+        self._carry: Optional[pd.DataFrame] = None
+        self._rows: List[np.ndarray] = []
+        self._columns: List[np.ndarray] = []
+
+    def finish(self) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        if self._carry is not None and len(self._carry):
+            self._write(self._carry)
+            self._carry = None
+        rows = np.concatenate(self._rows) if self._rows else np.empty(0, dtype=np.int64)
+        columns = np.concatenate(self._columns) if self._columns else np.empty(0, dtype=np.int64)
+        return self.encoder.to_csr(rows, columns, self.filled), self.y[:self.filled]
+
+    def _store(self, rows: pd.DataFrame, matrix_rows: np.ndarray, position: np.ndarray, keep: np.ndarray):
+        kept = rows[keep]
+        positions, columns = self.encoder.encode(
+            kept["question_id"].to_numpy(),
+            kept["selected_option_id"].to_numpy(),
+            kept["response_time_ms"].to_numpy()
+        )
+        self._rows.append(matrix_rows[keep][positions])
+        self._columns.append(columns)
+
+def fit_encoder(bind=engine) -> ResponseEncoder:
+    """ResponseEncoder ajustado às perguntas e opções ativas no banco"""
+    from app.core.config import settings
+    from app.ml.snapshot import QuestionnaireSnapshot
+
+    db = SessionLocal(bind=bind)
+    try:
+        snapshot = QuestionnaireSnapshot.from_db(db)
+    finally:
+        db.close()
+    return ResponseEncoder.from_snapshot(snapshot, settings.ml_time_buckets_ms)
+
+def matrix_megabytes(X) -> float:
+    if sparse.issparse(X):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 1024 ** 2
+    return X.nbytes / 1024 ** 2
+
+def build_training_matrix(
+    chunksize: int = 50000,
+    width: int = DEFAULT_FEATURE_COUNT,
+    since: Optional[datetime] = None,
+    bind=engine,
+    encoder: Optional[ResponseEncoder] = None
+) -> Tuple[np.ndarray, np.ndarray, List[str], dict]:
+    """Lê as respostas em pedaços e monta (X, y, feature_names, tempos em segundos)
+
+    Com since, só entram as sessões com resultado a partir dessa data (atualização incremental).
+    Com encoder, X é uma matriz CSR na codificação dele; sem, a matriz densa por posição.
+    """
+    timings = {}
+    count_query = select(func.count()).select_from(RecommendationResult)
+    rows_query = TRAINING_ROWS_QUERY
+    if since is not None:
+        count_query = count_query.where(RecommendationResult.created_at >= since)
+        rows_query = rows_query.where(RecommendationResult.created_at >= since)
+
+    started = time.perf_counter()
+    with bind.connect() as conn:
+        n_sessions = conn.scalar(count_query) or 0
+    timings["count"] = time.perf_counter() - started
+
+    if encoder is not None:
+        builder = SparseTrainingMatrixBuilder(n_sessions, encoder)
+    else:
+        builder = TrainingMatrixBuilder(n_sessions, width)
+
+    started = time.perf_counter()
+    with bind.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(rows_query, conn, chunksize=chunksize):
+            builder.add_chunk(chunk)
+    X, y = builder.finish()
+    timings["build"] = time.perf_counter() - started
+
+    # Cursos desconhecidos (nomes antigos) não servem como alvo
+    known = y >= 0
+    if not known.all():
+        X, y = X[known], y[known]
+
+    if builder.skipped:
+        print(f"{builder.skipped} sessões gravadas durante a leitura ficaram de fora")
+
+    feature_names = encoder.feature_names if encoder is not None else response_feature_names(width)
+    return X, y, feature_names, timings
+
+def compare_training_modes(
+    X,
+    y: np.ndarray,
+    feature_names: List[str],
+    seed: int = 42,
+    encoder: Optional[ResponseEncoder] = None
+) -> dict:
+    """Compara retreino completo e atualização incremental (tempo e acurácia) com divisão fixa
+
+    As sessões são embaralhadas com a semente: 70% formam o modelo existente, 20% são
+    as sessões "novas" e 10% ficam para avaliar as duas abordagens.
+    """
+    from sklearn.metrics import accuracy_score
+    from app.ml.service import MLService
+
+    order = np.random.RandomState(seed).permutation(len(y))
+    base, recent, holdout = np.split(order, [int(len(y) * 0.7), int(len(y) * 0.9)])
+    seen = np.concatenate([base, recent])
+
+    def holdout_accuracy(service: MLService) -> float:
+        return float(accuracy_score(y[holdout], service.rf_model.predict(service.scaler.transform(X[holdout]))))
+
+    def check(result: dict):
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+
+    report = {}
+    with tempfile.TemporaryDirectory() as full_dir, tempfile.TemporaryDirectory() as incremental_dir:
+        full = MLService(model_path=full_dir, autoload=False, compiled_forest=False)
+        started = time.perf_counter()
+        check(full.train(X[seen], y[seen], feature_names, encoder))
+        report["full"] = {"seconds": time.perf_counter() - started, "accuracy": holdout_accuracy(full)}
+
+        incremental = MLService(model_path=incremental_dir, autoload=False, compiled_forest=False)
+        check(incremental.train(X[base], y[base], feature_names, encoder))
+        started = time.perf_counter()
+        check(incremental.update_incremental(X[recent], y[recent], feature_names))
+        report["incremental"] = {"seconds": time.perf_counter() - started, "accuracy": holdout_accuracy(incremental)}
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Monta a matriz de treino a partir do banco e retreina os modelos")
+    parser.add_argument("--chunksize", type=int, default=50000, help="linhas de respostas por pedaço")
+    parser.add_argument("--positional", action="store_true", help="codificação antiga por posição em vez do ResponseEncoder")
+    parser.add_argument("--width", type=int, default=DEFAULT_FEATURE_COUNT, help="número de features por sessão (--positional)")
+    parser.add_argument("--since", type=parse_since, help="só sessões a partir deste instante (AAAA-MM-DD[THH:MM:SS], UTC)")
+    parser.add_argument("--incremental", action="store_true", help="atualiza os modelos atuais em vez de retreinar")
+    parser.add_argument("--compare", action="store_true", help="compara retreino completo e incremental, sem publicar")
+    parser.add_argument("--shadow", action="store_true", help="publica como versão candidata (modo sombra) sem promover")
+    parser.add_argument("--dry-run", action="store_true", help="apenas monta a matriz, sem treinar")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.ml.registry import resolve_artifacts
+
+    # A atualização incremental precisa das mesmas colunas do modelo publicado
+    encoder = None
+    if args.incremental:
+        encoder = ResponseEncoder.load(resolve_artifacts(settings.model_path)[0])
+    elif not args.positional:
+        encoder = fit_encoder()
+
+    X, y, feature_names, timings = build_training_matrix(args.chunksize, args.width, args.since, encoder=encoder)
+    print(f"Matriz de treino: {X.shape[0]} sessões x {X.shape[1]} features ({matrix_megabytes(X):.1f} MB)")
+    print(f"Contagem: {timings['count']:.2f}s | leitura e montagem: {timings['build']:.2f}s")
+
+    if args.dry_run:
+        return
+    if len(y) < 10 or len(np.unique(y)) < 2:
+        print("Dados insuficientes para treinar")
+        return
+
+    if args.compare:
+        report = compare_training_modes(X, y, feature_names, encoder=encoder)
+        for mode, numbers in report.items():
+            print(f"{mode}: {numbers['seconds']:.2f}s | acurácia {numbers['accuracy']:.4f}")
+        return
+
+    from app.ml.service import MLService
+
+    service = MLService(
+        model_path=settings.model_path,
+        autoload=args.incremental,
+        versions_to_keep=settings.model_versions_to_keep
+    )
+    started = time.perf_counter()
+    if args.incremental:
+        result = service.update_incremental(X, y, feature_names, shadow=args.shadow)
+    else:
+        result = service.train(X, y, feature_names, encoder, shadow=args.shadow)
+    print(f"Treino: {time.perf_counter() - started:.2f}s | {result}")
+    if not result["success"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    # Uso: python -m app.ml.training [--since AAAA-MM-DD[THH:MM:SS]] [--incremental | --compare] [--positional] [--shadow] [--dry-run] (a partir de backend/)
+    main()
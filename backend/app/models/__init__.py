@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, Boolean, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 import enum
 
+# No SQLite, parâmetros no mesmo formato de CURRENT_TIMESTAMP: comparações de texto
+# com os valores gravados pelo server_default ficam consistentes (ex.: paginação por cursor)
+SQLITE_TIMESTAMP = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
 class UserRole(enum.Enum):
     USER = "user"
     ADMIN = "admin"
@@ -82,6 +89,13 @@ class QuestionnaireResponse(Base):
 
 class RecommendationResult(Base):
     __tablename__ = "recommendation_results"
+    __table_args__ = (
+        # Impede resultados duplicados para a mesma sessão (retries concorrentes)
+        Index("uq_recommendation_results_session_id", "session_id", unique=True),
+        # Paginação por (created_at, id) e filtros de data com ou sem curso
+        Index("ix_recommendation_results_created_at_id", "created_at", "id"),
+        Index("ix_recommendation_results_course_created_at_id", "recommended_course", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -100,9 +114,36 @@ class RecommendationResult(Base):
     
     # Metadados
     model_version = Column(String(50), nullable=False)
+    snapshot_version = Column(String(50), nullable=True)
+    submission_fingerprint = Column(String(64), nullable=True)
     processing_time_ms = Column(Integer, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, "sqlite"), server_default=func.now())
     
     # Relacionamentos
     user = relationship("User", back_populates="results")
 
+class AggregateCounter(Base):
+    __tablename__ = "aggregate_counters"
+    
+    # Contadores do dashboard, atualizados na mesma transação das escritas
+    key = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)  # soma acumulada (ex.: confiança)
+
+class ResultRollupHourly(Base):
+    __tablename__ = "result_rollups_hourly"
+    
+    # Resultados agregados por hora (UTC) e curso, para séries temporais
+    bucket_start = Column(DateTime, primary_key=True)
+    course = Column(String(100), primary_key=True)
+    results = Column(BigInteger, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    responses = Column(BigInteger, nullable=False, default=0)
+
+class QuestionnaireRevision(Base):
+    __tablename__ = "questionnaire_revision"
+    
+    # Linha única, incrementada na mesma transação de cada alteração nas perguntas;
+    # os workers comparam com a revisão do snapshot e do cache que têm em memória
+    id = Column(Integer, primary_key=True)
+    revision = Column(BigInteger, nullable=False, default=0)
@@ -102,6 +102,7 @@ class RecommendationResultResponse(BaseModel):
     recommended_course: str
     confidence_score: float
     model_version: str
+    snapshot_version: Optional[str] = None
     processing_time_ms: int
     created_at: datetime
     
@@ -121,6 +122,19 @@ class DashboardStats(BaseModel):
     most_recommended_course: str
     average_confidence: float
 
+class TimeseriesPoint(BaseModel):
+    bucket: datetime
+    course: str
+    results: int
+    responses: int
+    average_confidence: float
+
+class TimeseriesResponse(BaseModel):
+    granularity: str
+    start_date: datetime
+    end_date: datetime
+    points: List[TimeseriesPoint]
+
 # Health Check Schema
 class HealthResponse(BaseModel):
     status: str
@@ -136,9 +150,9 @@ class ClassificationResult(BaseModel):
 
 class ModelInfo(BaseModel):
     version: str
-    last_trained: datetime
-    accuracy: float
-    total_samples: int
+    last_trained: Optional[datetime] = None
+    accuracy: Optional[float] = None
+    total_samples: Optional[int] = None
 
 class ModelMetrics(BaseModel):
     accuracy: float
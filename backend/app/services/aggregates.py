@@ -0,0 +1,176 @@
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models import AggregateCounter, QuestionnaireResponse, RecommendationResult, User
+
+# Chaves dos contadores
+TOTAL_RESPONSES = "responses"
+TOTAL_USERS = "users"
+TOTAL_RESULTS = "results"  # total = soma de confidence_score
+RESPONSES_DAY_PREFIX = "responses_day:"
+RESULTS_COURSE_PREFIX = "results_course:"
+
+Increments = Dict[str, Tuple[int, float]]
+
+def responses_day_key(day: date) -> str:
+    return f"{RESPONSES_DAY_PREFIX}{day.isoformat()}"
+
+def results_course_key(course: str) -> str:
+    return f"{RESULTS_COURSE_PREFIX}{course}"
+
+def result_increments(recommended_course: str, confidence_score: float, response_count: int, submitted_at: datetime) -> Increments:
+    """Incrementos produzidos por uma submissão do questionário"""
+    increments = {
+        TOTAL_RESULTS: (1, float(confidence_score)),
+        results_course_key(recommended_course): (1, 0.0)
+    }
+    if response_count:
+        increments[TOTAL_RESPONSES] = (response_count, 0.0)
+        increments[responses_day_key(submitted_at.date())] = (response_count, 0.0)
+    return increments
+
+def response_increments(rows: List[Dict]) -> Increments:
+    """Incrementos de respostas gravadas fora da transação do resultado (write-behind)"""
+    counts: Dict[str, int] = {}
+    for row in rows:
+        for key in (TOTAL_RESPONSES, responses_day_key(row["created_at"].date())):
+            counts[key] = counts.get(key, 0) + 1
+    return {key: (count, 0.0) for key, count in counts.items()}
+
+def upsert_sum_statement(dialect_name: str, model, rows: List[Dict], key_columns: List[str], sum_columns: List[str]):
+    """INSERT ... ON CONFLICT DO UPDATE que soma as colunas (None se o dialeto não suportar)"""
+    if dialect_name == "postgresql":
+        statement = postgresql.insert(model)
+    elif dialect_name == "sqlite":
+        statement = sqlite.insert(model)
+    else:
+        return None
+    
+    # Linhas em ordem fixa para transações concorrentes travarem as chaves na mesma ordem
+    statement = statement.values(sorted(rows, key=lambda row: tuple(row[column] for column in key_columns)))
+    return statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            column: getattr(model, column) + statement.excluded[column]
+            for column in sum_columns
+        }
+    )
+
+async def upsert_sums(db: AsyncSession, model, rows: List[Dict], key_columns: List[str], sum_columns: List[str]):
+    """Soma as linhas na tabela de agregados, na transação corrente e sem leitura prévia"""
+    statement = upsert_sum_statement(db.bind.dialect.name, model, rows, key_columns, sum_columns)
+    if statement is None:
+        await db.run_sync(_upsert_sums_fallback, model, rows, key_columns, sum_columns)
+    else:
+        await db.execute(statement)
+
+def _upsert_sums_fallback(db: Session, model, rows: List[Dict], key_columns: List[str], sum_columns: List[str]):
+    # Dialetos sem upsert: atualiza e cria a linha quando ainda não existe
+    for row in sorted(rows, key=lambda row: tuple(row[column] for column in key_columns)):
+        updated = db.execute(
+            update(model).where(
+                *(getattr(model, column) == row[column] for column in key_columns)
+            ).values({
+                column: getattr(model, column) + row[column]
+                for column in sum_columns
+            })
+        ).rowcount
+        if not updated:
+            db.execute(insert(model).values(row))
+
+async def increment_counters(db: AsyncSession, increments: Increments):
+    """Soma os incrementos aos contadores do dashboard"""
+    await upsert_sums(
+        db,
+        AggregateCounter,
+        [{"key": key, "count": count, "total": total} for key, (count, total) in increments.items()],
+        ["key"],
+        ["count", "total"]
+    )
+
+async def read_dashboard_counters(db: AsyncSession, today: date) -> Dict[str, Tuple[int, float]]:
+    """Lê os contadores usados pelo dashboard (número de linhas limitado pelos cursos)"""
+    rows = await db.execute(
+        select(AggregateCounter.key, AggregateCounter.count, AggregateCounter.total).where(
+            AggregateCounter.key.in_([TOTAL_RESPONSES, TOTAL_USERS, TOTAL_RESULTS, responses_day_key(today)])
+            | AggregateCounter.key.startswith(RESULTS_COURSE_PREFIX)
+        )
+    )
+    return {key: (count, total) for key, count, total in rows}
+
+def compute_aggregates(db: Session) -> Increments:
+    """Recalcula todos os contadores a partir das tabelas de origem"""
+    counters: Increments = {
+        TOTAL_USERS: (db.scalar(select(func.count()).select_from(User)) or 0, 0.0),
+        TOTAL_RESPONSES: (db.scalar(select(func.count()).select_from(QuestionnaireResponse)) or 0, 0.0)
+    }
+    
+    response_day = func.date(QuestionnaireResponse.created_at)
+    for day, count in db.execute(select(response_day, func.count()).group_by(response_day)):
+        if day is not None:
+            # SQLite devolve a data como texto; PostgreSQL como date
+            day_text = day if isinstance(day, str) else day.isoformat()
+            counters[f"{RESPONSES_DAY_PREFIX}{day_text}"] = (count, 0.0)
+    
+    results_count, confidence_sum = db.execute(
+        select(func.count(), func.sum(RecommendationResult.confidence_score))
+    ).one()
+    counters[TOTAL_RESULTS] = (results_count or 0, float(confidence_sum or 0.0))
+    
+    for course, count in db.execute(
+        select(RecommendationResult.recommended_course, func.count()).group_by(
+            RecommendationResult.recommended_course
+        )
+    ):
+        counters[results_course_key(course)] = (count, 0.0)
+    
+    return counters
+
+def rebuild_aggregates(db: Session) -> Increments:
+    """Substitui os contadores pelos valores recalculados, em uma única transação"""
+    # Bloqueia escritas concorrentes nos contadores enquanto recalcula (SQLite já trava no DELETE)
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {AggregateCounter.__tablename__} IN EXCLUSIVE MODE"))
+    db.execute(delete(AggregateCounter))
+    
+    counters = compute_aggregates(db)
+    db.execute(insert(AggregateCounter), [
+        {"key": key, "count": count, "total": total}
+        for key, (count, total) in sorted(counters.items())
+    ])
+    db.commit()
+    return counters
+
+def aggregates_missing() -> bool:
+    """Banco ainda sem contadores (consulta barata, feita antes de atender requisições)"""
+    db = SessionLocal()
+    try:
+        return db.scalar(select(AggregateCounter.key).limit(1)) is None
+    finally:
+        db.close()
+
+def backfill_aggregates():
+    """Recalcula os contadores na primeira inicialização de um banco já existente"""
+    db = SessionLocal()
+    try:
+        counters = rebuild_aggregates(db)
+        print(f"Contadores do dashboard recalculados ({len(counters)} chaves)")
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao recalcular contadores do dashboard: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.aggregates (a partir de backend/)
+    session = SessionLocal()
+    try:
+        counters = rebuild_aggregates(session)
+        for key, (count, total) in sorted(counters.items()):
+            print(f"{key}: count={count} total={total:.4f}")
+    finally:
+        session.close()
@@ -0,0 +1,184 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, List, Optional
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models import RecommendationResult
+
+EXPORT_FORMATS = ("csv", "excel", "word")
+
+# Extensão e media type por formato
+EXPORT_FILE_TYPES = {
+    "csv": ("csv", "text/csv"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "word": ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+}
+
+# Colunas exportadas (cabeçalho, coluna)
+EXPORT_COLUMNS = [
+    ("id", RecommendationResult.id),
+    ("session_id", RecommendationResult.session_id),
+    ("user_id", RecommendationResult.user_id),
+    ("recommended_course", RecommendationResult.recommended_course),
+    ("confidence_score", RecommendationResult.confidence_score),
+    ("score_ti", RecommendationResult.score_ti),
+    ("score_enfermagem", RecommendationResult.score_enfermagem),
+    ("score_logistica", RecommendationResult.score_logistica),
+    ("score_administracao", RecommendationResult.score_administracao),
+    ("score_estetica", RecommendationResult.score_estetica),
+    ("model_version", RecommendationResult.model_version),
+    ("processing_time_ms", RecommendationResult.processing_time_ms),
+    ("created_at", RecommendationResult.created_at)
+]
+
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+
+# Colunas mostradas no documento Word (tabelas grandes ficam ilegíveis)
+WORD_COLUMNS = ["session_id", "recommended_course", "confidence_score", "created_at"]
+
+ProgressCallback = Callable[[int], None]
+
+def export_filename(format: str) -> str:
+    extension, _ = EXPORT_FILE_TYPES[format]
+    return f"resultados_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+def export_query(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """Consulta dos resultados exportados, na ordem do índice (created_at, id)"""
+    query = select(*(column for _, column in EXPORT_COLUMNS))
+    if start_date:
+        query = query.where(RecommendationResult.created_at >= start_date)
+    if end_date:
+        query = query.where(RecommendationResult.created_at <= end_date)
+    return query.order_by(RecommendationResult.created_at, RecommendationResult.id).execution_options(
+        yield_per=settings.export_chunk_size
+    )
+
+def _plain_row(row) -> list:
+    # openpyxl não aceita datas com fuso; tudo sai em UTC sem fuso
+    return [
+        value.astimezone(timezone.utc).replace(tzinfo=None)
+        if isinstance(value, datetime) and value.tzinfo is not None else value
+        for value in row
+    ]
+
+def _csv_chunk(rows: List) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(_plain_row(row) for row in rows)
+    return buffer.getvalue()
+
+async def stream_csv(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> AsyncIterator[bytes]:
+    """Gera o CSV em pedaços a partir de um cursor no servidor (memória constante)"""
+    # Sessão própria: a sessão da requisição é fechada antes do corpo ser enviado
+    async with AsyncSessionLocal() as db:
+        yield _csv_chunk([EXPORT_HEADERS]).encode()
+        result = await db.stream(export_query(start_date, end_date))
+        async for rows in result.partitions():
+            yield _csv_chunk(rows).encode()
+
+def write_export(
+    format: str,
+    output,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    progress: Optional[ProgressCallback] = None
+) -> int:
+    """Escreve a exportação em output (caminho ou arquivo binário); retorna linhas escritas
+
+    Síncrono: deve rodar em uma thread de trabalho, nunca no event loop.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError("Formato deve ser: csv, excel ou word")
+
+    db = SessionLocal()
+    try:
+        result = db.execute(export_query(start_date, end_date))
+        chunks = result.partitions()
+        if format == "csv":
+            return _write_csv(chunks, output, progress)
+        if format == "excel":
+            return _write_excel(chunks, output, progress)
+        return _write_word(chunks, output, progress, start_date, end_date)
+    finally:
+        db.close()
+
+def _open_binary(output):
+    if isinstance(output, str):
+        return open(output, "wb"), True
+    return output, False
+
+def _write_csv(chunks, output, progress: Optional[ProgressCallback]) -> int:
+    stream, owned = _open_binary(output)
+    written = 0
+    try:
+        stream.write(_csv_chunk([EXPORT_HEADERS]).encode())
+        for rows in chunks:
+            stream.write(_csv_chunk(rows).encode())
+            written += len(rows)
+            if progress:
+                progress(written)
+    finally:
+        if owned:
+            stream.close()
+    return written
+
+def _write_excel(chunks, output, progress: Optional[ProgressCallback]) -> int:
+    from openpyxl import Workbook
+
+    # Modo write-only: as linhas vão para disco em vez de ficarem na memória
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Resultados")
+    sheet.append(EXPORT_HEADERS)
+
+    written = 0
+    for rows in chunks:
+        for row in rows:
+            sheet.append(_plain_row(row))
+        written += len(rows)
+        if progress:
+            progress(written)
+
+    workbook.save(output)
+    return written
+
+def _write_word(chunks, output, progress: Optional[ProgressCallback], start_date, end_date) -> int:
+    from docx import Document
+
+    # python-docx mantém o documento inteiro em memória; por isso o limite de linhas
+    max_rows = settings.export_docx_max_rows
+    indexes = [EXPORT_HEADERS.index(header) for header in WORD_COLUMNS]
+
+    document = Document()
+    document.add_heading("Resultados do questionário", level=1)
+    period = f"{start_date.date() if start_date else 'início'} a {end_date.date() if end_date else 'hoje'}"
+    document.add_paragraph(f"Período: {period}")
+
+    table = document.add_table(rows=1, cols=len(WORD_COLUMNS))
+    for cell, header in zip(table.rows[0].cells, WORD_COLUMNS):
+        cell.text = header
+
+    written = 0
+    truncated = False
+    for rows in chunks:
+        for row in rows:
+            if written >= max_rows:
+                truncated = True
+                break
+            for cell, index in zip(table.add_row().cells, indexes):
+                value = row[index]
+                cell.text = f"{value:.2f}" if isinstance(value, float) else str(value)
+            written += 1
+        if progress:
+            progress(written)
+        if truncated:
+            break
+
+    if truncated:
+        document.add_paragraph(
+            f"Exportação limitada a {max_rows} linhas; use CSV ou Excel para o período completo."
+        )
+
+    document.save(output)
+    return written
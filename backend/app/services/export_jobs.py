@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import RecommendationResult
+from app.services.export import EXPORT_FILE_TYPES, write_export
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+FINISHED_STATUSES = ("completed", "failed")
+
+class ExportJobLimitError(RuntimeError):
+    """Limite de exportações simultâneas atingido"""
+    pass
+
+class ExportJobManager:
+    """Executa exportações em segundo plano com estado e arquivo gravados em disco
+
+    O estado de cada job fica em <id>.json (visível a todos os workers) e o arquivo
+    é escrito em <id>.<ext>.part e renomeado atomicamente ao terminar.
+    """
+
+    def __init__(self, directory: str, max_workers: int = 2, max_active: int = 2, ttl_seconds: int = 86400):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_active = max_active
+        self.ttl_seconds = ttl_seconds
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def submit(self, format: str, start_date: Optional[datetime], end_date: Optional[datetime], requested_by: int) -> Dict:
+        """Cria um job e o coloca no pool; ExportJobLimitError se houver jobs demais"""
+        self.cleanup_expired()
+
+        with self._lock:
+            if len(self._active) >= self.max_active:
+                raise ExportJobLimitError("Limite de exportações simultâneas atingido")
+            job_id = uuid.uuid4().hex
+            self._active.add(job_id)
+            if self._pool is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="export-job")
+
+        now = time.time()
+        job = {
+            "id": job_id,
+            "format": format,
+            "status": "queued",
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "requested_by": requested_by,
+            "rows_processed": 0,
+            "total_rows": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": now
+        }
+        self._save(job)
+        self._pool.submit(self._run, job, start_date, end_date)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Lê o estado do job (None se não existir)"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as status_file:
+                return json.load(status_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def artifact_path(self, job: Dict) -> str:
+        extension, _ = EXPORT_FILE_TYPES[job["format"]]
+        return os.path.join(self.directory, f"{job['id']}.{extension}")
+
+    def describe(self, job: Dict) -> Dict:
+        """Estado do job para a API, com progresso e ETA"""
+        rows = job["rows_processed"]
+        total = job["total_rows"]
+        progress = None
+        eta_seconds = None
+        if total:
+            progress = round(min(rows / total, 1.0), 4)
+            if job["status"] == "running" and rows and job["started_at"]:
+                elapsed = job["updated_at"] - job["started_at"]
+                eta_seconds = round(elapsed / rows * max(total - rows, 0), 1)
+        elif job["status"] == "completed":
+            progress = 1.0
+
+        def timestamp(value):
+            return datetime.utcfromtimestamp(value).isoformat() if value else None
+
+        return {
+            "id": job["id"],
+            "format": job["format"],
+            "status": job["status"],
+            "start_date": job["start_date"],
+            "end_date": job["end_date"],
+            "rows_processed": rows,
+            "total_rows": total,
+            "progress": progress,
+            "eta_seconds": eta_seconds,
+            "error": job["error"],
+            "created_at": timestamp(job["created_at"]),
+            "started_at": timestamp(job["started_at"]),
+            "finished_at": timestamp(job["finished_at"]),
+            "expires_at": timestamp(job["finished_at"] + self.ttl_seconds) if job["finished_at"] else None,
+            "download_url": f"/api/v1/admin/export/jobs/{job['id']}/download" if job["status"] == "completed" else None
+        }
+
+    def _run(self, job: Dict, start_date: Optional[datetime], end_date: Optional[datetime]):
+        final_path = self.artifact_path(job)
+        part_path = f"{final_path}.part"
+
+        try:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            job["total_rows"] = self._count_rows(job["format"], start_date, end_date)
+            self._save(job)
+
+            def progress(rows: int):
+                job["rows_processed"] = rows
+                self._save(job)
+
+            rows = write_export(job["format"], part_path, start_date, end_date, progress)
+
+            # Só aparece com o nome final depois de completo
+            os.replace(part_path, final_path)
+            job["rows_processed"] = rows
+            job["status"] = "completed"
+        except Exception as e:
+            print(f"Erro no job de exportação {job['id']}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        finally:
+            job["finished_at"] = time.time()
+            self._save(job)
+            with self._lock:
+                self._active.discard(job["id"])
+
+    def _count_rows(self, format: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> int:
+        """Total de linhas para o cálculo do progresso (usa o índice de created_at)"""
+        query = select(func.count()).select_from(RecommendationResult)
+        if start_date:
+            query = query.where(RecommendationResult.created_at >= start_date)
+        if end_date:
+            query = query.where(RecommendationResult.created_at <= end_date)
+
+        db = SessionLocal()
+        try:
+            total = db.scalar(query) or 0
+        finally:
+            db.close()
+
+        if format == "word":
+            total = min(total, settings.export_docx_max_rows)
+        return total
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: Dict):
+        """Grava o estado atomicamente (leitores nunca veem JSON pela metade)"""
+        job["updated_at"] = time.time()
+        path = self._status_path(job["id"])
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as status_file:
+            json.dump(job, status_file)
+        os.replace(temp_path, path)
+
+    def cleanup_expired(self):
+        """Remove jobs terminados há mais de ttl_seconds e restos de jobs interrompidos"""
+        if not os.path.isdir(self.directory):
+            return
+
+        now = time.time()
+        with self._lock:
+            active = set(self._active)
+
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            job_id = name.split(".", 1)[0]
+            if job_id in active:
+                continue
+
+            try:
+                if name.endswith(".json"):
+                    job = self.get(job_id)
+                    if job is None:
+                        continue
+                    reference = job["finished_at"] if job["status"] in FINISHED_STATUSES else job["updated_at"]
+                    # Jobs não terminados sem atualização há mais que o TTL vêm de um processo que caiu
+                    if now - reference > self.ttl_seconds:
+                        artifact = self.artifact_path(job)
+                        for stale in (artifact, f"{artifact}.part", path):
+                            if os.path.exists(stale):
+                                os.remove(stale)
+                elif name.endswith((".part", ".tmp")) and now - os.path.getmtime(path) > self.ttl_seconds:
+                    os.remove(path)
+            except OSError as e:
+                print(f"Erro ao remover exportação expirada {name}: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"active_jobs": len(self._active), "max_active": self.max_active}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+# Instância global dos jobs de exportação
+export_jobs = ExportJobManager(
+    settings.export_jobs_dir,
+    max_workers=settings.export_jobs_workers,
+    max_active=settings.export_jobs_max_active,
+    ttl_seconds=settings.export_jobs_ttl_seconds
+)
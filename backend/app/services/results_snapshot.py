@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.ml.service import COURSE_KEYS
+from app.models import RecommendationResult
+from app.services.rollups import to_utc_naive
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+EPOCH = datetime(1970, 1, 1)
+
+# Colunas do snapshot: nome -> (dtype, formato de cada linha)
+SNAPSHOT_COLUMNS = {
+    "id": (np.int64, ()),
+    "created_at": (np.int64, ()),  # segundos desde a época, UTC
+    "course": (np.int16, ()),  # índice em meta["courses"]
+    "confidence": (np.float32, ()),
+    "scores": (np.float32, (len(COURSE_KEYS),))  # na ordem de COURSE_KEYS
+}
+
+SCORE_COLUMNS = [
+    RecommendationResult.score_ti,
+    RecommendationResult.score_enfermagem,
+    RecommendationResult.score_logistica,
+    RecommendationResult.score_administracao,
+    RecommendationResult.score_estetica
+]
+
+INITIAL_CAPACITY = 4096
+
+# Limite de ids pulados acompanhados (os mais antigos saem primeiro)
+MAX_TRACKED_GAPS = 10000
+
+# Ids pulados consultados por comando
+GAP_QUERY_SIZE = 1000
+
+class ResultsColumns:
+    """Visões somente leitura das colunas do snapshot (mapeadas em memória)"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        rows = meta["rows"]
+        self.id = arrays["id"][:rows]
+        self.created_at = arrays["created_at"][:rows]
+        self.course = arrays["course"][:rows]
+        self.confidence = arrays["confidence"][:rows]
+        self.scores = arrays["scores"][:rows]
+        self.courses: List[str] = meta["courses"]
+        self.watermark: int = meta["watermark"]
+        # Ids abaixo da marca d'água ainda sem linha (commit atrasado ou transação desfeita)
+        self.pending_ids: int = len(meta.get("gaps", []))
+        self.refreshed_at: Optional[str] = meta.get("refreshed_at")
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def mask(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Optional[np.ndarray]:
+        """Filtro por período sobre created_at (None quando não há filtro)"""
+        if start_date is None and end_date is None:
+            return None
+        selected = np.ones(len(self), dtype=bool)
+        if start_date is not None:
+            selected &= self.created_at >= epoch_seconds(start_date)
+        if end_date is not None:
+            selected &= self.created_at <= epoch_seconds(end_date)
+        return selected
+
+def epoch_seconds(moment: datetime) -> int:
+    return int((to_utc_naive(moment) - EPOCH).total_seconds())
+
+class ResultsSnapshot:
+    """Cópia colunar de recommendation_results em arquivos .npy, atualizada por marca d'água de id
+
+    As linhas novas são escritas além de meta["rows"] e só depois o meta.json é
+    trocado atomicamente; leitores nunca veem linhas pela metade. Ids pulados ao
+    avançar a marca d'água ficam em meta["gaps"] e são procurados de novo a cada
+    atualização, até aparecerem ou passarem de gap_retention_seconds: o id vem da
+    sequência no INSERT, mas a linha só fica visível no commit.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 5000, lag_seconds: int = 5, gap_retention_seconds: int = 3600):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.lag_seconds = lag_seconds
+        self.gap_retention_seconds = gap_retention_seconds
+        self._cached_meta_mtime = None
+        self._cached_columns: Optional[ResultsColumns] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[ResultsColumns]:
+        """Colunas atuais; reabre os arquivos só quando o meta.json muda"""
+        try:
+            meta_mtime = os.stat(self._meta_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            if meta_mtime != self._cached_meta_mtime:
+                meta = self._read_meta()
+                arrays = {
+                    name: np.load(self._column_path(name), mmap_mode="r")
+                    for name in SNAPSHOT_COLUMNS
+                }
+                self._cached_columns = ResultsColumns(arrays, meta)
+                self._cached_meta_mtime = meta_mtime
+            return self._cached_columns
+
+    def refresh(self) -> int:
+        """Acrescenta os resultados com id acima da marca d'água; retorna linhas novas"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "snapshot.lock"), "w") as lock_file:
+            # Um único escritor entre workers
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return self._append_new_rows()
+
+    def _append_new_rows(self) -> int:
+        meta = self._read_meta() if os.path.exists(self._meta_path()) else self._create()
+        course_codes = {course: code for code, course in enumerate(meta["courses"])}
+
+        # Ids pulados antes, enquanto ainda podem aparecer: {id: quando foi pulado}
+        now = epoch_seconds(datetime.utcnow())
+        stored_gaps = meta.get("gaps", [])
+        gaps = {
+            gap_id: skipped_at for gap_id, skipped_at in stored_gaps
+            if now - skipped_at <= self.gap_retention_seconds
+        }
+
+        columns = select(
+            RecommendationResult.id,
+            RecommendationResult.created_at,
+            RecommendationResult.recommended_course,
+            RecommendationResult.confidence_score,
+            *SCORE_COLUMNS
+        )
+
+        # Atraso reduz os ids pulados de transações que ainda não fizeram commit
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lag_seconds)
+        query = columns.where(
+            RecommendationResult.id > meta["watermark"],
+            RecommendationResult.created_at <= cutoff
+        ).order_by(RecommendationResult.id).execution_options(yield_per=self.chunk_size)
+
+        appended = 0
+        db = SessionLocal()
+        try:
+            # Commits atrasados: linhas que surgiram abaixo da marca d'água
+            pending = sorted(gaps)
+            for start in range(0, len(pending), GAP_QUERY_SIZE):
+                rows = db.execute(
+                    columns.where(RecommendationResult.id.in_(pending[start:start + GAP_QUERY_SIZE]))
+                    .order_by(RecommendationResult.id)
+                ).all()
+                if rows:
+                    for row in rows:
+                        del gaps[row[0]]
+                    meta["gaps"] = self._tracked_gaps(gaps)
+                    self._write_chunk(meta, self._chunk(meta, course_codes, rows))
+                    appended += len(rows)
+
+            previous = meta["watermark"]
+            for rows in db.execute(query).partitions():
+                for row in rows:
+                    # Ids entre a última linha vista e esta ainda não estão visíveis
+                    for gap_id in range(max(previous + 1, row[0] - MAX_TRACKED_GAPS), row[0]):
+                        gaps[gap_id] = now
+                    previous = row[0]
+                meta["gaps"] = self._tracked_gaps(gaps)
+                self._write_chunk(meta, self._chunk(meta, course_codes, rows))
+                appended += len(rows)
+        finally:
+            db.close()
+
+        # Ids que expiraram sem aparecer (transações desfeitas) saem da lista
+        meta["gaps"] = self._tracked_gaps(gaps)
+        if meta["gaps"] != stored_gaps:
+            self._write_meta(meta)
+
+        return appended
+
+    def _chunk(self, meta: Dict, course_codes: Dict[str, int], rows: List) -> Dict[str, np.ndarray]:
+        """Colunas de um lote de linhas; cursos novos entram no fim de meta["courses"]"""
+        for row in rows:
+            if row[2] not in course_codes:
+                course_codes[row[2]] = len(meta["courses"])
+                meta["courses"].append(row[2])
+
+        return {
+            "id": np.array([row[0] for row in rows], dtype=np.int64),
+            "created_at": np.array(
+                [epoch_seconds(row[1]) if row[1] else 0 for row in rows], dtype=np.int64
+            ),
+            "course": np.array([course_codes[row[2]] for row in rows], dtype=np.int16),
+            "confidence": np.array([row[3] for row in rows], dtype=np.float32),
+            "scores": np.array([row[4:] for row in rows], dtype=np.float32).reshape(len(rows), len(COURSE_KEYS))
+        }
+
+    def _tracked_gaps(self, gaps: Dict[int, int]) -> List[List[int]]:
+        """Ids pulados no formato do meta.json, limitados aos MAX_TRACKED_GAPS mais recentes"""
+        tracked = sorted(gaps.items(), key=lambda gap: (gap[1], gap[0]))[-MAX_TRACKED_GAPS:]
+        return [[gap_id, skipped_at] for gap_id, skipped_at in sorted(tracked)]
+
+    def _write_chunk(self, meta: Dict, chunk: Dict[str, np.ndarray]):
+        start = meta["rows"]
+        end = start + len(chunk["id"])
+        if end > meta["capacity"]:
+            self._grow(meta, max(meta["capacity"] * 2, end))
+
+        for name, values in chunk.items():
+            column = np.load(self._column_path(name), mmap_mode="r+")
+            column[start:end] = values
+            column.flush()
+            del column
+
+        meta["rows"] = end
+        # Linhas de commits atrasados ficam abaixo da marca d'água
+        meta["watermark"] = max(meta["watermark"], int(chunk["id"].max()))
+        meta["refreshed_at"] = datetime.utcnow().isoformat()
+        self._write_meta(meta)
+
+    def _create(self) -> Dict:
+        meta = {"rows": 0, "capacity": INITIAL_CAPACITY, "watermark": 0, "courses": [], "gaps": [], "refreshed_at": None}
+        for name, (dtype, shape) in SNAPSHOT_COLUMNS.items():
+            column = np.lib.format.open_memmap(
+                self._column_path(name), mode="w+", dtype=dtype, shape=(INITIAL_CAPACITY,) + shape
+            )
+            column.flush()
+            del column
+        self._write_meta(meta)
+        return meta
+
+    def _grow(self, meta: Dict, capacity: int):
+        """Realoca as colunas com mais capacidade; leitores mantêm o mapeamento antigo"""
+        for name, (dtype, shape) in SNAPSHOT_COLUMNS.items():
+            path = self._column_path(name)
+            old = np.load(path, mmap_mode="r")
+            grown = np.lib.format.open_memmap(f"{path}.grow", mode="w+", dtype=dtype, shape=(capacity,) + shape)
+            grown[:meta["rows"]] = old[:meta["rows"]]
+            grown.flush()
+            del grown, old
+            os.replace(f"{path}.grow", path)
+        meta["capacity"] = capacity
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def _read_meta(self) -> Dict:
+        with open(self._meta_path()) as meta_file:
+            return json.load(meta_file)
+
+    def _write_meta(self, meta: Dict):
+        temp_path = f"{self._meta_path()}.tmp"
+        with open(temp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(temp_path, self._meta_path())
+
+async def keep_refreshed(snapshot: ResultsSnapshot, interval_seconds: int):
+    """Tarefa de fundo: atualiza o snapshot periodicamente fora do event loop"""
+    while True:
+        try:
+            appended = await asyncio.to_thread(snapshot.refresh)
+            if appended:
+                print(f"Snapshot de analytics: {appended} resultados novos")
+        except Exception as e:
+            print(f"Erro ao atualizar snapshot de analytics: {e}")
+        await asyncio.sleep(interval_seconds)
+
+def score_histograms(columns: ResultsColumns, selected: Optional[np.ndarray], bins: int) -> Dict:
+    """Histograma de cada pontuação por curso"""
+    scores = columns.scores if selected is None else columns.scores[selected]
+    histograms = {}
+    for index, course in enumerate(COURSE_KEYS):
+        counts, edges = np.histogram(scores[:, index], bins=bins)
+        histograms[course] = {"counts": counts.tolist(), "edges": np.round(edges, 4).tolist()}
+    return histograms
+
+def confidence_percentiles(columns: ResultsColumns, selected: Optional[np.ndarray], percentiles: List[float]) -> Dict:
+    """Percentis da confiança, no total e por curso recomendado"""
+    confidence = columns.confidence if selected is None else columns.confidence[selected]
+    course = columns.course if selected is None else columns.course[selected]
+
+    def summarize(values: np.ndarray) -> Dict:
+        if not len(values):
+            return {"count": 0, "percentiles": {}}
+        points = np.percentile(values, percentiles)
+        return {
+            "count": int(len(values)),
+            "percentiles": {f"p{p:g}": round(float(v), 4) for p, v in zip(percentiles, points)}
+        }
+
+    return {
+        "overall": summarize(confidence),
+        "by_course": {
+            name: summarize(confidence[course == code])
+            for code, name in enumerate(columns.courses)
+        }
+    }
+
+def course_crosstab(columns: ResultsColumns, selected: Optional[np.ndarray]) -> Dict:
+    """Curso recomendado x segunda maior pontuação (contagens)"""
+    scores = columns.scores if selected is None else columns.scores[selected]
+    course = columns.course if selected is None else columns.course[selected]
+
+    runner_up = np.argsort(scores, axis=1)[:, -2]
+    table = np.zeros((len(columns.courses), len(COURSE_KEYS)), dtype=np.int64)
+    np.add.at(table, (course.astype(np.intp), runner_up), 1)
+
+    return {
+        name: {second: int(table[code, index]) for index, second in enumerate(COURSE_KEYS)}
+        for code, name in enumerate(columns.courses)
+    }
+
+# Instância global do snapshot colunar
+results_snapshot = ResultsSnapshot(
+    settings.results_snapshot_dir,
+    chunk_size=settings.export_chunk_size,
+    lag_seconds=settings.results_snapshot_lag_seconds,
+    gap_retention_seconds=settings.results_snapshot_gap_retention_seconds
+)
@@ -0,0 +1,210 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models import QuestionnaireResponse, RecommendationResult, ResultRollupHourly
+from app.services.aggregates import upsert_sums
+
+GRANULARITIES = ("hour", "day", "week")
+
+# Intervalo padrão de /admin/timeseries quando start_date não é informado
+DEFAULT_RANGES = {
+    "hour": timedelta(days=2),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=26)
+}
+
+ROLLUP_KEY = ["bucket_start", "course"]
+ROLLUP_SUMS = ["results", "confidence_sum", "responses"]
+
+def to_utc_naive(moment: datetime) -> datetime:
+    """Converte para UTC sem fuso, o formato das chaves das rollups"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def hour_bucket(moment: datetime) -> datetime:
+    """Início da hora (UTC) que contém o instante"""
+    return to_utc_naive(moment).replace(minute=0, second=0, microsecond=0)
+
+def truncate_bucket(bucket_start: datetime, granularity: str) -> datetime:
+    """Agrupa um bucket horário no bucket da granularidade pedida (semanas começam na segunda)"""
+    if granularity == "hour":
+        return bucket_start
+    day = bucket_start.replace(hour=0)
+    if granularity == "week":
+        day -= timedelta(days=day.weekday())
+    return day
+
+async def record_result(db: AsyncSession, course: str, confidence_score: float, response_count: int, submitted_at: datetime):
+    """Soma uma submissão à rollup da sua hora, na transação corrente"""
+    await upsert_sums(db, ResultRollupHourly, [{
+        "bucket_start": hour_bucket(submitted_at),
+        "course": course,
+        "results": 1,
+        "confidence_sum": float(confidence_score),
+        "responses": response_count
+    }], ROLLUP_KEY, ROLLUP_SUMS)
+
+async def record_responses(db: AsyncSession, rows: List[Dict]):
+    """Soma respostas gravadas depois do resultado às rollups das suas sessões, na transação corrente"""
+    courses = dict((await db.execute(
+        select(RecommendationResult.session_id, RecommendationResult.recommended_course).where(
+            RecommendationResult.session_id.in_({row["session_id"] for row in rows})
+        )
+    )).all())
+    
+    counts: Dict[Tuple[datetime, str], int] = {}
+    for row in rows:
+        course = courses.get(row["session_id"])
+        if course is not None:
+            key = (hour_bucket(row["created_at"]), course)
+            counts[key] = counts.get(key, 0) + 1
+    
+    if counts:
+        await upsert_sums(db, ResultRollupHourly, [
+            {"bucket_start": bucket_start, "course": course, "results": 0, "confidence_sum": 0.0, "responses": count}
+            for (bucket_start, course), count in counts.items()
+        ], ROLLUP_KEY, ROLLUP_SUMS)
+
+async def read_timeseries(db: AsyncSession, granularity: str, start: datetime, end: datetime, course: Optional[str] = None) -> List[Dict]:
+    """Série temporal a partir das rollups; custo proporcional ao número de buckets"""
+    query = select(
+        ResultRollupHourly.bucket_start,
+        ResultRollupHourly.course,
+        ResultRollupHourly.results,
+        ResultRollupHourly.confidence_sum,
+        ResultRollupHourly.responses
+    ).where(
+        ResultRollupHourly.bucket_start >= hour_bucket(start),
+        ResultRollupHourly.bucket_start < to_utc_naive(end)
+    )
+    if course:
+        query = query.where(ResultRollupHourly.course == course)
+    
+    points: Dict[Tuple[datetime, str], List] = {}
+    for bucket_start, row_course, results, confidence_sum, responses in await db.execute(query):
+        point = points.setdefault((truncate_bucket(bucket_start, granularity), row_course), [0, 0.0, 0])
+        point[0] += results
+        point[1] += confidence_sum
+        point[2] += responses
+    
+    return [
+        {
+            "bucket": bucket,
+            "course": row_course,
+            "results": results,
+            "responses": responses,
+            "average_confidence": round(confidence_sum / results, 4) if results else 0.0
+        }
+        for (bucket, row_course), (results, confidence_sum, responses) in sorted(points.items())
+    ]
+
+def _hour_expression(dialect_name: str, column):
+    # Hora em UTC, como hour_bucket; no PostgreSQL date_trunc usaria o fuso da sessão
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00", column)
+    return func.date_trunc("hour", func.timezone("UTC", column))
+
+def _as_bucket(value) -> datetime:
+    # SQLite devolve texto; PostgreSQL devolve timestamp com fuso
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return hour_bucket(value)
+
+def compute_rollups(db: Session, since: Optional[datetime] = None) -> Dict[Tuple[datetime, str], List]:
+    """Recalcula as rollups com GROUP BY no banco (uma linha por hora e curso)"""
+    hour = _hour_expression(db.bind.dialect.name, RecommendationResult.created_at)
+    
+    results_query = select(
+        hour, RecommendationResult.recommended_course,
+        func.count(), func.sum(RecommendationResult.confidence_score)
+    ).group_by(hour, RecommendationResult.recommended_course)
+    
+    responses_query = select(
+        hour, RecommendationResult.recommended_course, func.count(QuestionnaireResponse.id)
+    ).join(
+        QuestionnaireResponse, QuestionnaireResponse.session_id == RecommendationResult.session_id
+    ).group_by(hour, RecommendationResult.recommended_course)
+    
+    if since is not None:
+        # Instante com fuso: created_at é timestamptz no PostgreSQL
+        since = to_utc_naive(since).replace(tzinfo=timezone.utc)
+        results_query = results_query.where(RecommendationResult.created_at >= since)
+        responses_query = responses_query.where(RecommendationResult.created_at >= since)
+    
+    rollups: Dict[Tuple[datetime, str], List] = {}
+    for bucket, course, results, confidence_sum in db.execute(results_query):
+        if bucket is not None:
+            rollups[(_as_bucket(bucket), course)] = [results, float(confidence_sum or 0.0), 0]
+    
+    for bucket, course, responses in db.execute(responses_query):
+        key = (_as_bucket(bucket), course) if bucket is not None else None
+        if key in rollups:
+            rollups[key][2] = responses
+    
+    return rollups
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None) -> int:
+    """Substitui as rollups (todas ou a partir de since) pelos valores recalculados"""
+    if since is not None:
+        since = hour_bucket(since)
+    
+    # Bloqueia as escritas incrementais enquanto recalcula (SQLite já trava no DELETE)
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {ResultRollupHourly.__tablename__} IN EXCLUSIVE MODE"))
+    
+    stale = delete(ResultRollupHourly)
+    if since is not None:
+        stale = stale.where(ResultRollupHourly.bucket_start >= since)
+    db.execute(stale)
+    
+    rollups = compute_rollups(db, since)
+    if rollups:
+        db.execute(insert(ResultRollupHourly), [
+            {
+                "bucket_start": bucket_start,
+                "course": course,
+                "results": results,
+                "confidence_sum": confidence_sum,
+                "responses": responses
+            }
+            for (bucket_start, course), (results, confidence_sum, responses) in sorted(rollups.items())
+        ])
+    db.commit()
+    return len(rollups)
+
+def rollups_missing() -> bool:
+    """Banco com resultados e sem rollups (consulta barata, feita antes de atender requisições)"""
+    db = SessionLocal()
+    try:
+        has_rollups = db.scalar(select(ResultRollupHourly.bucket_start).limit(1)) is not None
+        has_results = db.scalar(select(RecommendationResult.id).limit(1)) is not None
+        return has_results and not has_rollups
+    finally:
+        db.close()
+
+def backfill_rollups():
+    """Recalcula as rollups na primeira inicialização de um banco que já tem resultados"""
+    db = SessionLocal()
+    try:
+        buckets = rebuild_rollups(db)
+        print(f"Rollups horárias recalculadas ({buckets} buckets)")
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao recalcular rollups horárias: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Uso: python -m app.services.rollups [AAAA-MM-DD] (a partir de backend/)
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    session = SessionLocal()
+    try:
+        buckets = rebuild_rollups(session, since)
+        print(f"{buckets} buckets recalculados")
+    finally:
+        session.close()
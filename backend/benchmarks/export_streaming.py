@@ -0,0 +1,140 @@
+"""Tempo e pico de memória da exportação de resultados com cursor no servidor x tudo em memória
+
+Uso (a partir de backend/): python -m benchmarks.export_streaming [--rows 1000000] [--formats csv excel]
+
+Cria um banco SQLite temporário com --rows resultados e mede, no mesmo processo:
+  stream_csv       corpo de GET /admin/export/csv (StreamingResponse)
+  write_export     arquivo dos jobs em segundo plano (um por formato pedido)
+  tudo em memória  .all() seguido de um único csv.writer, como uma exportação ingênua
+O pico é o maior RSS acima do início de cada medição, amostrado a cada 10 ms (somente Linux).
+"""
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+
+# Banco temporário; precisa vir antes de importar o app
+_workdir = tempfile.mkdtemp(prefix="export-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/export.db"
+
+import asyncio
+import csv
+import io
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.core.database import SessionLocal, sync_schema
+from app.models import RecommendationResult
+from app.services.export import EXPORT_HEADERS, export_query, stream_csv, write_export
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE / 2 ** 20
+
+class PeakMemory:
+    """Amostra o RSS em uma thread enquanto o bloco executa"""
+
+    def __enter__(self):
+        self.start = rss_mb()
+        self.peak = self.start
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self.started = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while self._running:
+            self.peak = max(self.peak, rss_mb())
+            time.sleep(0.01)
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self._running = False
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+def populate(rows: int, batch: int = 50000):
+    courses = ["Tecnologia da Informação", "Enfermagem", "Logística", "Administração", "Estética"]
+    started_at = datetime(2024, 1, 1)
+    db = SessionLocal()
+    try:
+        for offset in range(0, rows, batch):
+            db.execute(insert(RecommendationResult), [
+                {
+                    "session_id": f"sessao-{i:08d}",
+                    "score_ti": random.random() * 100,
+                    "score_enfermagem": random.random() * 100,
+                    "score_logistica": random.random() * 100,
+                    "score_administracao": random.random() * 100,
+                    "score_estetica": random.random() * 100,
+                    "recommended_course": random.choice(courses),
+                    "confidence_score": random.random(),
+                    "model_version": "bench",
+                    "processing_time_ms": random.randint(1, 50),
+                    "created_at": started_at + timedelta(seconds=i * 30)
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+async def consume_stream() -> int:
+    size = 0
+    async for chunk in stream_csv():
+        size += len(chunk)
+    return size
+
+def export_all_in_memory(path: str) -> int:
+    db = SessionLocal()
+    try:
+        rows = db.execute(export_query().execution_options(yield_per=None)).all()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADERS)
+        writer.writerows(rows)
+        with open(path, "w") as output:
+            output.write(buffer.getvalue())
+        return len(rows)
+    finally:
+        db.close()
+
+def report(label: str, measurement: PeakMemory, detail: str):
+    print(f"{label:<22} {measurement.seconds:7.1f}s  pico +{measurement.peak - measurement.start:7.1f} MB  {detail}")
+
+def main(args):
+    sync_schema()
+    started = time.perf_counter()
+    populate(args.rows)
+    print(f"{args.rows} resultados gravados em {time.perf_counter() - started:.0f}s; RSS inicial {rss_mb():.0f} MB")
+
+    with PeakMemory() as measurement:
+        size = asyncio.run(consume_stream())
+    report("stream_csv", measurement, f"{size / 2 ** 20:.0f} MB de CSV")
+
+    for format in args.formats:
+        path = os.path.join(_workdir, f"export.{format}")
+        with PeakMemory() as measurement:
+            written = write_export(format, path)
+        report(f"write_export {format}", measurement, f"{written} linhas, {os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+    # Por último: a memória liberada nem sempre volta ao sistema
+    path = os.path.join(_workdir, "export-all.csv")
+    with PeakMemory() as measurement:
+        written = export_all_in_memory(path)
+    report("tudo em memória (csv)", measurement, f"{written} linhas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="*", default=["csv"], choices=["csv", "excel"])
+    main(parser.parse_args())
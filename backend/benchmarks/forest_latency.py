@@ -0,0 +1,71 @@
+"""Latência de uma linha: predict_proba do sklearn x floresta empacotada (PackedForest)
+
+Uso (a partir de backend/): python -m benchmarks.forest_latency [--trees 100] [--features 20] [--repeat 2000] [--min-speedup 10]
+
+Mede o caminho de predict_courses para uma submissão: escala + probabilidades.
+Confere que as duas saídas são idênticas e sai com erro se o ganho ficar abaixo de --min-speedup.
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from app.ml.forest import compile_forest
+
+def timed(function, rows, repeat):
+    """Mediana e p99 (µs) de uma chamada por linha"""
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        row = rows[i % len(rows)]
+        started = time.perf_counter()
+        function(row)
+        latencies[i] = time.perf_counter() - started
+    return np.percentile(latencies, 50) * 1e6, np.percentile(latencies, 99) * 1e6
+
+def main(args):
+    rng = np.random.RandomState(42)
+    X = rng.randn(1000, args.features)
+    y = rng.randint(0, 5, 1000)
+    scaler = StandardScaler().fit(X)
+    rf_model = RandomForestClassifier(n_estimators=args.trees, random_state=42).fit(scaler.transform(X), y)
+    forest = compile_forest(rf_model)
+    if forest is None:
+        raise SystemExit("Floresta compilada diverge do sklearn")
+
+    rows = [rng.randn(1, args.features) for _ in range(256)]
+    for row in rows:
+        assert np.array_equal(forest.predict_proba(scaler.transform(row)), rf_model.predict_proba(scaler.transform(row)))
+
+    def sklearn_path(row):
+        return rf_model.predict_proba(scaler.transform(row))
+
+    def packed_path(row):
+        scaled = np.array(row, dtype=np.float64)
+        scaled -= scaler.mean_
+        scaled /= scaler.scale_
+        return forest.predict_proba(scaled)
+
+    # Aquecimento
+    timed(sklearn_path, rows, 100)
+    timed(packed_path, rows, 100)
+
+    sklearn_p50, sklearn_p99 = timed(sklearn_path, rows, args.repeat)
+    packed_p50, packed_p99 = timed(packed_path, rows, args.repeat)
+    speedup = sklearn_p50 / packed_p50
+
+    print(f"{args.trees} árvores, {args.features} features, profundidade máxima {forest.max_depth}")
+    print(f"sklearn:    p50={sklearn_p50:8.1f}µs p99={sklearn_p99:8.1f}µs")
+    print(f"empacotada: p50={packed_p50:8.1f}µs p99={packed_p99:8.1f}µs")
+    print(f"ganho (p50): {speedup:.1f}x")
+    if speedup < args.min_speedup:
+        raise SystemExit(f"Ganho abaixo de {args.min_speedup}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""Vazão das classificações de submissões com e sem micro-batching da inferência
+
+Uso (a partir de backend/): python -m benchmarks.inference_batching [--concurrency 64] [--duration 10] [--sklearn]
+
+Roda o mesmo caminho do POST /submit (InferenceExecutor.classify) com submissões
+concorrentes, uma vez com ML_BATCH_MAX_SIZE=1 (sem agrupamento) e outra com o tamanho
+de lote pedido. Treina 100 árvores sobre dados sintéticos em um diretório temporário.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml.executor import InferenceExecutor
+from app.ml.features import response_feature_names, response_features
+from app.ml.service import COURSE_KEYS, MLService
+
+def random_responses(n_questions=6):
+    return [
+        {
+            "question_id": question_id,
+            "selected_option_id": question_id * 10 + random.randint(1, 4),
+            "response_time_ms": random.randint(500, 8000),
+            "weights": {f"weight_{course}": random.uniform(0, 10) for course in COURSE_KEYS}
+        }
+        for question_id in range(1, n_questions + 1)
+    ]
+
+async def run(ml_service, batch_max_size, args):
+    executor = InferenceExecutor(
+        ml_service,
+        max_workers=args.workers,
+        max_concurrency=args.workers * 2,
+        timeout_ms=0,
+        batch_max_size=batch_max_size,
+        batch_window_ms=args.window_ms,
+        shadow_enabled=False
+    )
+    sessions = [random_responses() for _ in range(512)]
+    latencies = []
+
+    async def client(deadline):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await executor.classify(random.choice(sessions))
+            latencies.append(time.perf_counter() - started)
+
+    # Aquecimento
+    await asyncio.gather(*[client(time.perf_counter() + 1) for _ in range(args.concurrency)])
+    latencies.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(started + args.duration) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+
+    values = np.array(latencies) * 1000
+    label = "sem lote" if batch_max_size == 1 else f"lote até {batch_max_size}"
+    batching = executor.stats().get("batching")
+    print(
+        f"{label:<14} {len(values) / elapsed:8.1f} classificações/s  "
+        f"p50={np.percentile(values, 50):6.1f}ms p95={np.percentile(values, 95):6.1f}ms"
+        + (f"  lote médio {batching['average_batch_size']}" if batching else "")
+    )
+    return len(values) / elapsed
+
+def main(args):
+    with tempfile.TemporaryDirectory() as model_path:
+        ml_service = MLService(model_path=model_path, autoload=False, compiled_forest=not args.sklearn)
+        # Linhas de treino montadas como na inferência, a partir de sessões aleatórias
+        X = np.vstack([response_features(random_responses()) for _ in range(2000)])
+        trained = ml_service.train(X, np.random.RandomState(42).randint(0, 5, len(X)), response_feature_names(X.shape[1]))
+        if not trained["success"]:
+            raise SystemExit(trained["error"])
+        engine = "sklearn" if args.sklearn else "floresta empacotada"
+        print(f"{args.concurrency} submissões concorrentes, {args.workers} threads de inferência, {engine}")
+        unbatched = asyncio.run(run(ml_service, 1, args))
+        batched = asyncio.run(run(ml_service, args.batch_size, args))
+        print(f"ganho: {batched / unbatched:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--sklearn", action="store_true", help="avalia com o predict_proba do sklearn")
+    main(parser.parse_args())
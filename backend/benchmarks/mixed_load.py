@@ -0,0 +1,242 @@
+"""Carga mista de leitura e escrita, com uma consulta administrativa pesada em paralelo
+
+Uso (a partir de backend/): python -m benchmarks.mixed_load [--concurrency 8 16] [--duration 15] [--baseline-ref d966a3e]
+Contra uma API já em execução: python -m benchmarks.mixed_load --url http://127.0.0.1:8000 --token <token de admin>
+
+Sem --url, sobe a API desta árvore e a de --baseline-ref (checkout em um git worktree
+temporário; por padrão a última versão com sessões síncronas) com uvicorn de 1 worker,
+cada uma com seu banco SQLite semeado com --results resultados e um usuário admin.
+Cada cliente alterna entre GET /questions, GET /result/{sessão} e POST /submit, na
+proporção dada por --write-ratio; --admin-clients clientes repetem GET --admin-path
+(por padrão /admin/responses, que agrega todos os resultados) ao mesmo tempo. Mostra vazão e
+p50/p95/p99 por rota para as duas árvores.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+from jose import jwt
+
+API = "/api/v1/questionnaire"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = "mixed-load-benchmark"
+COURSES = ["Tecnologia da Informação", "Enfermagem", "Logística", "Administração", "Estética"]
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return f"p50={np.percentile(values, 50):7.1f}ms p95={np.percentile(values, 95):7.1f}ms p99={np.percentile(values, 99):7.1f}ms"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def random_submission(questions):
+    return {
+        "session_id": f"bench-{uuid.uuid4().hex}",
+        "responses": [
+            {
+                "question_id": question["id"],
+                "selected_option_id": random.choice(question["options"])["id"],
+                "response_time_ms": random.randint(500, 8000)
+            }
+            for question in questions
+        ]
+    }
+
+async def client_loop(http, questions, sessions, deadline, write_ratio, latencies, errors):
+    while time.perf_counter() < deadline:
+        roll = random.random()
+        started = time.perf_counter()
+        try:
+            if roll < write_ratio or not sessions:
+                route = "POST /submit"
+                payload = random_submission(questions)
+                response = await http.post(f"{API}/submit", json=payload)
+                if response.status_code == 200:
+                    sessions.append(payload["session_id"])
+            elif roll < write_ratio + (1 - write_ratio) / 2:
+                route = "GET /questions"
+                response = await http.get(f"{API}/questions")
+            else:
+                route = "GET /result"
+                response = await http.get(f"{API}/result/{random.choice(sessions)}")
+        except httpx.HTTPError as e:
+            errors[f"{route} {type(e).__name__}"] += 1
+            continue
+        latencies[route].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors[f"{route} {response.status_code}"] += 1
+
+async def admin_loop(http, path, token, deadline, latencies, errors):
+    """Repete a consulta administrativa, lendo o corpo inteiro"""
+    route = f"GET {path.replace('/api/v1', '')}"
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with http.stream("GET", path, headers=headers) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+        except httpx.HTTPError as e:
+            errors[f"{route} {type(e).__name__}"] += 1
+            continue
+        latencies[route].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors[f"{route} {response.status_code}"] += 1
+
+async def run_load(url, token, args, concurrency):
+    limits = httpx.Limits(max_connections=concurrency + args.admin_clients, max_keepalive_connections=concurrency + args.admin_clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as http:
+        questions = (await http.get(f"{API}/questions")).json()
+        if not questions:
+            raise SystemExit("Nenhuma pergunta ativa na API")
+
+        latencies, errors, sessions = defaultdict(list), defaultdict(int), []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [
+            client_loop(http, questions, sessions, deadline, args.write_ratio, latencies, errors)
+            for _ in range(concurrency)
+        ]
+        if token:
+            clients += [admin_loop(http, args.admin_path, token, deadline, latencies, errors) for _ in range(args.admin_clients)]
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"  {concurrency} clientes + {args.admin_clients if token else 0} admin, {elapsed:.1f}s, {total} requisições, {total / elapsed:.1f} req/s")
+    for route, values in sorted(latencies.items()):
+        print(f"    {route:<22} {len(values):>6}  {len(values) / elapsed:7.1f} req/s  {percentiles(values)}")
+    for error, count in sorted(errors.items()):
+        print(f"    erro {error}: {count}")
+
+def seed_database(path: str, results: int) -> int:
+    """Usuário admin e resultados antigos, direto no SQLite; retorna o id do admin"""
+    now = datetime.utcnow()
+    connection = sqlite3.connect(path, timeout=60)
+    try:
+        cursor = connection.execute(
+            "INSERT INTO users (email, hashed_password, full_name, role, is_active) VALUES (?, ?, ?, ?, ?)",
+            ("bench-admin@example.com", "x", "Benchmark", "ADMIN", True)
+        )
+        admin_id = cursor.lastrowid
+        rng = np.random.RandomState(0)
+        connection.executemany(
+            "INSERT INTO recommendation_results (session_id, score_ti, score_enfermagem, score_logistica, "
+            "score_administracao, score_estetica, recommended_course, confidence_score, model_version, "
+            "processing_time_ms, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (f"seed-{i}", *(float(score) for score in rng.rand(5) * 100), COURSES[i % len(COURSES)],
+                 float(rng.rand()), "seed", 10, (now - timedelta(minutes=i)).isoformat(sep=" "))
+                for i in range(results)
+            )
+        )
+        connection.commit()
+        return admin_id
+    finally:
+        connection.close()
+
+def admin_token(admin_id: int) -> str:
+    expires = datetime.utcnow() + timedelta(hours=2)
+    return jwt.encode({"sub": str(admin_id), "exp": expires, "type": "access"}, SECRET_KEY, algorithm="HS256")
+
+def wait_ready(url: str, server: subprocess.Popen):
+    """/ready quando existe; versões antigas só têm /health"""
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("API encerrou durante a inicialização")
+        try:
+            ready = httpx.get(f"{url}/ready", timeout=5)
+            if ready.status_code == 200 or (ready.status_code == 404 and httpx.get(f"{url}/health", timeout=5).status_code == 200):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit("API não ficou pronta")
+
+def benchmark_tree(label: str, backend_dir: str, workdir: str, args):
+    database = os.path.join(workdir, f"{label}.db")
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        MODEL_PATH=os.path.join(workdir, f"models-{label}"),
+        EXPORT_JOBS_DIR=os.path.join(workdir, f"exports-{label}"),
+        RESULTS_SNAPSHOT_DIR=os.path.join(workdir, f"analytics-{label}"),
+        SECRET_KEY=SECRET_KEY,
+        RESULTS_SNAPSHOT_ENABLED="false",
+        RETRAIN_SCHEDULER_ENABLED="false",
+        ML_SHADOW_ENABLED="false"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(url, server)
+        token = admin_token(seed_database(database, args.results))
+        print(f"{label}: {args.results} resultados semeados")
+        for concurrency in args.concurrency:
+            asyncio.run(run_load(url, token, args, concurrency))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+def main(args):
+    if args.url:
+        print(args.url)
+        for concurrency in args.concurrency:
+            asyncio.run(run_load(args.url, args.token, args, concurrency))
+        return
+
+    repository = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout.strip()
+    with tempfile.TemporaryDirectory(prefix="mixed-load-") as workdir:
+        if args.baseline_ref:
+            baseline = os.path.join(workdir, "baseline")
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", baseline, args.baseline_ref],
+                cwd=repository, check=True, capture_output=True
+            )
+            try:
+                backend = os.path.join(baseline, os.path.relpath(BACKEND_DIR, repository))
+                benchmark_tree(f"base {args.baseline_ref}", backend, workdir, args)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", baseline], cwd=repository, capture_output=True)
+        benchmark_tree("esta árvore", BACKEND_DIR, workdir, args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="API já em execução (não sobe servidores nem compara)")
+    parser.add_argument("--token", help="token de admin para --url (sem ele, só as rotas públicas)")
+    parser.add_argument("--baseline-ref", default="d966a3e", help="revisão de comparação; vazio para pular")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 16])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--admin-clients", type=int, default=1)
+    parser.add_argument("--admin-path", default="/api/v1/admin/responses")
+    parser.add_argument("--results", type=int, default=20000, help="resultados semeados antes da carga")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    main(parser.parse_args())
@@ -0,0 +1,148 @@
+"""Memória por worker do uvicorn com os artefatos do modelo mapeados em memória ou copiados
+
+Uso (a partir de backend/): python -m benchmarks.worker_memory [--workers 1 4 8] [--samples 40000] [--submits-per-worker 200]
+
+Treina e publica um modelo em um diretório temporário, sobe a API com N workers para
+ML_SHARED_ARTIFACTS=true e false, envia algumas submissões para os workers usarem o
+modelo e lê RSS e PSS de cada worker em /proc (somente Linux).
+O PSS divide as páginas compartilhadas entre os processos que as usam; é a medida que
+mostra o ganho do mmap.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from app.ml.features import response_feature_names
+from app.ml.service import MLService
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def worker_pids(pid: int):
+    """Workers do uvicorn: filhos diretos iniciados pelo multiprocessing (sem o resource_tracker)"""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                # O nome do processo pode ter espaços; o ppid vem logo depois do ")"
+                parent = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as cmdline_file:
+                cmdline = cmdline_file.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid and b"spawn_main" in cmdline:
+            found.append(int(entry))
+    return found
+
+def memory_mb(pid: int):
+    """(RSS, PSS) em MB, de /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0]) / 1024
+    return values["Rss"], values["Pss"]
+
+def submit_sessions(url: str, count: int, prefix: str):
+    """Submissões aleatórias, distribuídas pelo uvicorn entre os workers"""
+    with httpx.Client(base_url=url, timeout=60) as http:
+        questions = http.get("/api/v1/questionnaire/questions").json()
+        rng = np.random.RandomState(0)
+        for i in range(count):
+            http.post("/api/v1/questionnaire/submit", json={
+                "session_id": f"{prefix}-{i}",
+                "responses": [
+                    {
+                        "question_id": question["id"],
+                        "selected_option_id": question["options"][rng.randint(len(question["options"]))]["id"],
+                        "response_time_ms": int(rng.randint(500, 8000))
+                    }
+                    for question in questions
+                ]
+            })
+
+def measure(workdir: str, model_path: str, workers: int, shared: bool, submits: int, settle_seconds: float):
+    port = free_port()
+    env = dict(
+        os.environ,
+        # Um banco só: a primeira rodada (1 worker) cria as tabelas antes dos imports concorrentes
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        MODEL_PATH=model_path,
+        ML_SHARED_ARTIFACTS=str(shared).lower(),
+        ML_EXECUTOR="thread",
+        EXPORT_JOBS_DIR=os.path.join(workdir, "exports"),
+        RESULTS_SNAPSHOT_ENABLED="false",
+        RETRAIN_SCHEDULER_ENABLED="false",
+        ML_SHADOW_ENABLED="false"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        # Cada /ready cai em um worker qualquer; várias respostas seguidas indicam todos prontos
+        ready_in_a_row = 0
+        deadline = time.monotonic() + 300
+        while ready_in_a_row < workers * 4:
+            if time.monotonic() > deadline:
+                raise SystemExit("API não ficou pronta")
+            try:
+                ready = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=5).status_code == 200
+            except httpx.HTTPError:
+                ready = False
+            ready_in_a_row = ready_in_a_row + 1 if ready else 0
+            time.sleep(0.2)
+        # Submissões proporcionais aos workers: cada um percorre uma parte parecida das árvores
+        submit_sessions(f"http://127.0.0.1:{port}", submits * workers, f"memoria-{workers}-{shared}")
+        time.sleep(settle_seconds)
+
+        # Com um worker só, o uvicorn atende no próprio processo
+        pids = worker_pids(server.pid) if workers > 1 else [server.pid]
+        return [memory_mb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.join(workdir, "models")
+        rng = np.random.RandomState(42)
+        X = rng.randn(args.samples, 20)
+        service = MLService(model_path=model_path, autoload=False)
+        started = time.perf_counter()
+        trained = service.train(X, rng.randint(0, 5, args.samples), response_feature_names(20))
+        if not trained["success"]:
+            raise SystemExit(trained["error"])
+        forest = service.models.forest
+        forest_mb = sum(array.nbytes for array in (forest.feature, forest.threshold, forest.left, forest.right, forest.value)) / 2 ** 20
+        print(f"Modelo: {len(forest.roots)} árvores, floresta empacotada {forest_mb:.0f} MB (treino {time.perf_counter() - started:.0f}s)")
+
+        print(f"{'artefatos':<10} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'PSS total':>10}")
+        for shared in (True, False):
+            for workers in args.workers:
+                usage = measure(workdir, model_path, workers, shared, args.submits_per_worker, args.settle)
+                rss = np.mean([rss for rss, _ in usage])
+                pss = [pss for _, pss in usage]
+                label = "mmap" if shared else "cópia"
+                print(f"{label:<10} {workers:>7} {rss:>9.0f}MB {np.mean(pss):>9.0f}MB {sum(pss):>8.0f}MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="comece por 1 para criar o banco")
+    parser.add_argument("--samples", type=int, default=40000, help="amostras de treino (controla o tamanho das árvores)")
+    parser.add_argument("--submits-per-worker", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=3.0, help="espera (s) depois de todos prontos")
+    main(parser.parse_args())
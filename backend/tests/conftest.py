@@ -0,0 +1,134 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Banco, modelos e arquivos de trabalho temporários; precisa vir antes de importar o app
+_workdir = tempfile.mkdtemp(prefix="caminhos-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/test.db"
+os.environ["MODEL_PATH"] = os.path.join(_workdir, "models")
+os.environ["EXPORT_JOBS_DIR"] = os.path.join(_workdir, "exports")
+os.environ["RESULTS_SNAPSHOT_DIR"] = os.path.join(_workdir, "analytics")
+os.environ["RESULTS_SNAPSHOT_ENABLED"] = "false"
+os.environ["RETRAIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ML_SHADOW_ENABLED"] = "false"
+os.environ["RESPONSES_WRITE_BEHIND"] = "false"
+
+from contextlib import contextmanager
+
+import httpx
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.api.v1.admin import get_admin_user
+from app.api.v1.questionnaire import create_sample_questions, questions_cache
+from app.core.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.ml.features import ResponseEncoder
+from app.ml.service import MLService
+from app.ml.snapshot import QuestionnaireSnapshot, questionnaire_snapshot
+from app.models import User, UserRole
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Cada teste começa com as tabelas vazias e o snapshot recarregado"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    questionnaire_snapshot.invalidate()
+    questions_cache.invalidate()
+    yield
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def sample_questions(db):
+    create_sample_questions(db)
+    return db
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        yield http
+
+@pytest.fixture
+def admin(db):
+    user = User(email="admin@example.com", hashed_password="x", full_name="Admin", role=UserRole.ADMIN)
+    db.add(user)
+    db.commit()
+    app.dependency_overrides[get_admin_user] = lambda: user
+    yield user
+    app.dependency_overrides.pop(get_admin_user, None)
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+@contextmanager
+def count_queries():
+    """Conta os comandos SQL enviados pela engine assíncrona das rotas"""
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture
+def query_counter():
+    return count_queries
+
+@pytest.fixture
+def small_snapshot():
+    """Questionário em memória: 4 perguntas com 2 opções (10 mil combinações com as faixas de tempo)"""
+    rng = np.random.RandomState(7)
+    questions = [(question_id, question_id) for question_id in range(1, 5)]
+    options = [
+        (question_id * 10 + choice, question_id) + tuple(float(weight) for weight in rng.randint(0, 11, 5))
+        for question_id in range(1, 5)
+        for choice in range(2)
+    ]
+    return QuestionnaireSnapshot(questions, options)
+
+@pytest.fixture
+def make_sessions(small_snapshot):
+    """Sessões aleatórias do small_snapshot, com os pesos como o submit monta"""
+    def make(count, seed=0):
+        rng = np.random.RandomState(seed)
+        sessions = []
+        for _ in range(count):
+            session = []
+            for question_id, _ in small_snapshot.questions:
+                option_id = question_id * 10 + int(rng.randint(2))
+                session.append({
+                    "question_id": question_id,
+                    "selected_option_id": option_id,
+                    "response_time_ms": int(rng.randint(0, 40000)),
+                    "weights": small_snapshot.weights_for(small_snapshot.option_index[option_id])
+                })
+            sessions.append(session)
+        return sessions
+    return make
+
+@pytest.fixture
+def encoded_service(tmp_path, small_snapshot, make_sessions):
+    """MLService treinado com ResponseEncoder sobre o small_snapshot"""
+    service = MLService(model_path=str(tmp_path / "models"), autoload=False)
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+    sessions = make_sessions(300, seed=1)
+    y = np.random.RandomState(2).randint(0, 5, len(sessions))
+    assert service.train(encoder.transform_batch(sessions), y, encoder.feature_names, encoder)["success"]
+    return service
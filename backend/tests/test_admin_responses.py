@@ -0,0 +1,53 @@
+# tests/test_admin_responses.py
+from datetime import datetime
+
+from app.models import RecommendationResult
+
+def add_results(db, created_at, count):
+    for i in range(count):
+        db.add(RecommendationResult(
+            session_id=f"session-{created_at:%H%M%S}-{i}",
+            score_ti=50.0, score_enfermagem=20.0, score_logistica=10.0,
+            score_administracao=10.0, score_estetica=10.0,
+            recommended_course="Tecnologia da Informação",
+            confidence_score=0.3,
+            model_version="test",
+            processing_time_ms=1,
+            created_at=created_at
+        ))
+    db.commit()
+
+async def fetch_all_pages(client, page_size, max_pages=20):
+    ids, cursor = [], None
+    for _ in range(max_pages):
+        params = {"page_size": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/v1/admin/responses", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        ids.extend(row["id"] for row in body["results"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, body["total_results"]
+    raise AssertionError("a paginação não terminou")
+
+async def test_keyset_pages_have_no_repeats_or_gaps(client, admin, db):
+    # Vários resultados no mesmo segundo, dos dois lados da divisa entre páginas
+    add_results(db, datetime(2025, 3, 1, 10, 0, 0), 7)
+    add_results(db, datetime(2025, 3, 1, 10, 0, 1), 9)
+    add_results(db, datetime(2025, 3, 1, 10, 0, 2), 4)
+
+    ids, total = await fetch_all_pages(client, page_size=5)
+
+    assert total == 20
+    assert len(ids) == len(set(ids)) == 20
+    expected = [row.id for row in db.query(RecommendationResult).order_by(
+        RecommendationResult.created_at.desc(), RecommendationResult.id.desc()
+    )]
+    assert ids == expected
+
+async def test_invalid_cursor_is_rejected(client, admin, db):
+    add_results(db, datetime(2025, 3, 1, 10, 0, 0), 1)
+    response = await client.get("/api/v1/admin/responses", params={"cursor": "nao-e-um-cursor"})
+    assert response.status_code == 400
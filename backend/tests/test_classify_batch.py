@@ -0,0 +1,39 @@
+# tests/test_classify_batch.py
+import numpy as np
+import pytest
+
+from app.ml.features import response_feature_names
+from app.ml.service import MLService
+
+def assert_same_results(service, sessions):
+    batch = service.classify_batch(sessions)
+
+    assert len(batch) == len(sessions)
+    # Sem erro engolido: o resultado padrão tem sempre as mesmas pontuações
+    assert len({tuple(result["scores"].values()) for result in batch}) > 1
+    for session, result in zip(sessions, batch):
+        single = service.classify_responses(session)
+        assert result["recommended_course"] == single["recommended_course"]
+        assert result["confidence_score"] == pytest.approx(single["confidence_score"])
+        assert result["scores"] == pytest.approx(single["scores"])
+        assert result["model_version"] == single["model_version"]
+
+def test_batch_matches_single_sessions_with_encoder(encoded_service, make_sessions):
+    assert_same_results(encoded_service, make_sessions(100, seed=3))
+
+def test_batch_matches_single_sessions_with_positional_model(tmp_path, make_sessions):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    rng = np.random.RandomState(4)
+    X = np.hstack([rng.randint(1, 5, (200, 1)), rng.randint(10, 42, (200, 1)), rng.randint(0, 40000, (200, 1))] * 4)
+    assert service.train(X, rng.randint(0, 5, 200), response_feature_names(12))["success"]
+
+    assert_same_results(service, make_sessions(100, seed=5))
+
+def test_batch_matches_single_sessions_with_weights_only(tmp_path, make_sessions):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    assert not service.has_model
+
+    sessions = make_sessions(50, seed=6)
+    # Sessão sem pesos usa os pesos padrão nos dois caminhos
+    sessions.append([{key: value for key, value in response.items() if key != "weights"} for response in sessions[0]])
+    assert_same_results(service, sessions)
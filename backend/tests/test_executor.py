@@ -0,0 +1,39 @@
+# tests/test_executor.py
+import asyncio
+import threading
+
+from app.ml.executor import InferenceExecutor
+
+async def test_timed_out_inference_keeps_its_slot_until_the_pool_finishes(encoded_service, make_sessions, monkeypatch):
+    unblock = threading.Event()
+    predict_courses = encoded_service.predict_courses
+
+    def slow_predict(features):
+        unblock.wait(10)
+        return predict_courses(features)
+
+    monkeypatch.setattr(encoded_service, "predict_courses", slow_predict)
+    executor = InferenceExecutor(encoded_service, max_workers=2, max_concurrency=1, timeout_ms=50, shadow_enabled=False)
+    try:
+        result = await executor.classify(make_sessions(1)[0])
+        assert result["recommended_course"]
+
+        # O pool ainda roda a chamada abandonada: a vaga continua ocupada
+        stats = executor.stats()
+        assert stats["timeouts"] == 1
+        assert stats["abandoned"] == stats["abandoned_in_flight"] == stats["in_flight"] == 1
+        assert executor._semaphore.locked()
+
+        unblock.set()
+        for _ in range(500):
+            if not executor.metrics.in_flight:
+                break
+            await asyncio.sleep(0.01)
+
+        stats = executor.stats()
+        assert stats["in_flight"] == stats["abandoned_in_flight"] == 0
+        assert stats["abandoned"] == 1
+        assert not executor._semaphore.locked()
+    finally:
+        unblock.set()
+        executor.shutdown()
@@ -0,0 +1,106 @@
+# tests/test_features.py
+import numpy as np
+import pandas as pd
+
+from app.ml.features import FEATURE_LAYOUT, LEGACY_FEATURE_LAYOUT, ResponseEncoder, response_feature_names
+from app.ml.registry import read_metadata, resolve_artifacts
+from app.ml.service import MLService, ModelSet
+
+# Enviadas fora da ordem das perguntas
+RESPONSES = [
+    {"question_id": 3, "selected_option_id": 11, "response_time_ms": 3000},
+    {"question_id": 1, "selected_option_id": 2, "response_time_ms": 1000},
+    {"question_id": 2, "selected_option_id": 7, "response_time_ms": 2000}
+]
+
+def test_legacy_models_keep_submission_order(tmp_path):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    legacy = ModelSet(feature_names=response_feature_names(9), metadata={})
+
+    features = service.preprocess_responses(RESPONSES, legacy)
+
+    assert legacy.feature_layout == LEGACY_FEATURE_LAYOUT
+    assert features.tolist() == [[3, 11, 3000, 1, 2, 1000, 2, 7, 2000]]
+
+def test_current_layout_orders_by_question(tmp_path):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    models = ModelSet(feature_names=response_feature_names(9), metadata={"feature_layout": FEATURE_LAYOUT})
+
+    features = service.preprocess_responses(RESPONSES, models)
+
+    assert features.tolist() == [[1, 2, 1000, 2, 7, 2000, 3, 11, 3000]]
+
+def test_training_records_feature_layout(tmp_path):
+    service = MLService(model_path=str(tmp_path), autoload=False, compiled_forest=False)
+    rng = np.random.RandomState(0)
+    X, y = rng.rand(60, 9), rng.randint(0, 5, 60)
+
+    assert service.train(X, y, response_feature_names(9))["success"]
+    assert service.models.feature_layout == FEATURE_LAYOUT
+    assert read_metadata(resolve_artifacts(str(tmp_path))[0])["feature_layout"] == FEATURE_LAYOUT
+
+    # Linhas montadas fora do pipeline de treino seguem a ordem de envio
+    frame = pd.DataFrame(X, columns=response_feature_names(9)).assign(target=y)
+    assert service.retrain_model(frame)["success"]
+    assert service.models.feature_layout == LEGACY_FEATURE_LAYOUT
+
+    result = service.update_incremental(X, y, response_feature_names(9))
+    assert not result["success"]
+
+def test_encoder_columns_follow_snapshot(small_snapshot):
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+
+    # Uma coluna por opção, depois cinco faixas de tempo por pergunta
+    names = encoder.feature_names
+    assert encoder.n_features == len(names) == 8 + 4 * 5
+    assert names[:3] == ["option_10", "option_11", "option_20"]
+    assert names[8:13] == [
+        "q1_time_0_2000ms", "q1_time_2000_5000ms", "q1_time_5000_10000ms", "q1_time_10000_30000ms", "q1_time_30000ms_plus"
+    ]
+
+def test_encoder_csr_ignores_submission_order_and_unknown_ids(small_snapshot):
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+    names = encoder.feature_names
+    responses = [
+        {"question_id": 3, "selected_option_id": 31, "response_time_ms": 2000},
+        {"question_id": 1, "selected_option_id": 11, "response_time_ms": None},
+        {"question_id": 9, "selected_option_id": 91, "response_time_ms": 1000}
+    ]
+
+    features = encoder.transform(responses)
+
+    assert features.format == "csr" and features.shape == (1, encoder.n_features)
+    assert sorted(names[column] for column in features.indices) == [
+        "option_11", "option_31", "q1_time_0_2000ms", "q3_time_2000_5000ms"
+    ]
+    assert (encoder.transform(responses[::-1]) != features).nnz == 0
+
+def test_encoder_batch_matches_single_sessions(small_snapshot, make_sessions):
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+    sessions = make_sessions(20)
+
+    batch = encoder.transform_batch(sessions)
+
+    assert batch.shape == (20, encoder.n_features)
+    for i, session in enumerate(sessions):
+        assert (batch[i] != encoder.transform(session)).nnz == 0
+
+def test_encoder_models_ignore_feature_layout(tmp_path, small_snapshot):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+    responses = [
+        {"question_id": 2, "selected_option_id": 21, "response_time_ms": 6000},
+        {"question_id": 1, "selected_option_id": 11, "response_time_ms": 500}
+    ]
+
+    # Com encoder as colunas não dependem da ordem de envio; sem, a disposição decide
+    for layout in (LEGACY_FEATURE_LAYOUT, FEATURE_LAYOUT):
+        models = ModelSet(feature_names=encoder.feature_names, metadata={"feature_layout": layout}, encoder=encoder)
+        assert (service.preprocess_responses(responses, models) != encoder.transform(responses[::-1])).nnz == 0
+
+    positional = [
+        service.preprocess_responses(responses, ModelSet(feature_names=response_feature_names(6), metadata={"feature_layout": layout}))
+        for layout in (LEGACY_FEATURE_LAYOUT, FEATURE_LAYOUT)
+    ]
+    assert positional[0].tolist() == [[2, 21, 6000, 1, 11, 500]]
+    assert positional[1].tolist() == [[1, 11, 500, 2, 21, 6000]]
@@ -0,0 +1,71 @@
+# tests/test_forest.py
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.ml.forest import PackedForest, load_packed_forest, pack_forest, save_packed_forest
+
+def fitted_forest(seed, n_features=20, n_classes=5, **params):
+    rng = np.random.RandomState(seed)
+    X = rng.randn(600, n_features)
+    y = rng.randint(0, n_classes, 600)
+    return RandomForestClassifier(n_estimators=50, random_state=seed, **params).fit(X, y)
+
+def random_inputs(rf_model, seed, n_rows=2000):
+    """Linhas aleatórias, metade delas com valores exatamente sobre os limiares das árvores"""
+    rng = np.random.RandomState(seed + 1000)
+    X = rng.randn(n_rows, rf_model.n_features_in_) * 2
+    thresholds = np.concatenate([estimator.tree_.threshold for estimator in rf_model.estimators_])
+    thresholds = thresholds[thresholds != -2]
+    X[: n_rows // 2] = rng.choice(thresholds, size=(n_rows // 2, rf_model.n_features_in_))
+    return X
+
+@pytest.mark.parametrize("seed, params", [
+    (0, {}),
+    (1, {"max_depth": 4}),
+    (2, {"min_samples_leaf": 5, "class_weight": "balanced"}),
+    (3, {"max_features": None, "bootstrap": False})
+])
+def test_predict_proba_matches_sklearn_bit_for_bit(seed, params):
+    rf_model = fitted_forest(seed, **params)
+    forest = PackedForest(pack_forest(rf_model))
+    X = random_inputs(rf_model, seed)
+
+    assert np.array_equal(forest.classes_, rf_model.classes_)
+    assert np.array_equal(forest.predict_proba(X), rf_model.predict_proba(X))
+    # Uma linha por vez, como no caminho da submissão
+    for row in X[:50]:
+        assert np.array_equal(forest.predict_proba(row[np.newaxis, :]), rf_model.predict_proba(row[np.newaxis, :]))
+
+def test_memory_mapped_forest_matches_sklearn(tmp_path):
+    rf_model = fitted_forest(4, n_classes=3)
+    save_packed_forest(pack_forest(rf_model), str(tmp_path))
+    forest = load_packed_forest(str(tmp_path), mmap_mode="r")
+    X = random_inputs(rf_model, 4)
+
+    assert np.array_equal(forest.predict_proba(X), rf_model.predict_proba(X))
+
+def test_publish_packs_forest_once(tmp_path, monkeypatch):
+    from app.ml import forest as forest_module, service as service_module
+    from app.ml.registry import resolve_artifacts
+    from app.ml.service import FOREST_DIR, MLService
+
+    packs = []
+    def counting_pack_forest(rf_model):
+        packs.append(rf_model)
+        return pack_forest(rf_model)
+
+    monkeypatch.setattr(forest_module, "pack_forest", counting_pack_forest)
+    monkeypatch.setattr(service_module, "pack_forest", counting_pack_forest, raising=False)
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    rng = np.random.RandomState(5)
+    X, y = rng.rand(60, 9), rng.randint(0, 5, 60)
+
+    assert service.train(X, y, [f"feature_{i}" for i in range(9)])["success"]
+    assert len(packs) == 1
+
+    in_memory = service.models.forest
+    published = load_packed_forest(os.path.join(resolve_artifacts(str(tmp_path))[0], FOREST_DIR))
+    assert np.array_equal(published.value, in_memory.value)
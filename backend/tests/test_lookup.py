@@ -0,0 +1,67 @@
+# tests/test_lookup.py
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml import lookup as lookup_module
+from app.ml.executor import InferenceExecutor
+from app.ml.features import LEGACY_FEATURE_LAYOUT, response_feature_names
+from app.ml.service import MLService
+
+def wait_for_table(lookup, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not lookup.table:
+        assert time.monotonic() < deadline, "a tabela não ficou pronta"
+        time.sleep(0.01)
+
+@pytest.fixture(autouse=True)
+def build_without_pauses(monkeypatch):
+    monkeypatch.setattr(lookup_module, "TABLE_YIELD_RATIO", 0.0)
+
+def test_table_matches_model_outputs(encoded_service, small_snapshot, make_sessions):
+    lookup = encoded_service.answer_lookup.get(small_snapshot)
+    wait_for_table(lookup)
+    assert len(lookup.table) == 10000
+
+    # Tempos quaisquer caem na mesma faixa do tempo representativo usado na montagem
+    for session in make_sessions(300, seed=3):
+        scores, course, confidence = lookup.get(lookup.key(session))[:3]
+        expected = encoded_service.classify_responses(session)
+        assert scores == tuple(expected["scores"].values())
+        assert (course, confidence) == (expected["recommended_course"], expected["confidence_score"])
+
+def test_weights_only_table_ignores_response_time(tmp_path, small_snapshot, make_sessions):
+    service = MLService(model_path=str(tmp_path), autoload=False)
+    lookup = service.answer_lookup.get(small_snapshot)
+    wait_for_table(lookup)
+
+    assert len(lookup.table) == 2 ** 4
+    session = make_sessions(1)[0]
+    assert lookup.get(lookup.key(session))[1] == service.classify_responses(session)["recommended_course"]
+
+async def test_positional_model_uses_memo_keyed_on_raw_inputs(tmp_path, small_snapshot, make_sessions):
+    service = MLService(model_path=str(tmp_path), autoload=False, compiled_forest=False)
+    rng = np.random.RandomState(0)
+    frame = pd.DataFrame(rng.rand(60, 12), columns=response_feature_names(12)).assign(target=rng.randint(0, 5, 60))
+    assert service.retrain_model(frame)["success"]
+    assert service.models.feature_layout == LEGACY_FEATURE_LAYOUT
+
+    executor = InferenceExecutor(service, batch_max_size=1, shadow_enabled=False)
+    try:
+        session = make_sessions(1)[0]
+        first = await executor.classify(session, small_snapshot)
+        again = await executor.classify(session, small_snapshot)
+        # Na disposição antiga a ordem de envio muda as features: outra chave
+        await executor.classify(list(reversed(session)), small_snapshot)
+    finally:
+        executor.shutdown()
+
+    stats = service.answer_lookup.stats()["current"]
+    assert stats["table_supported"] is False and stats["table_note"]
+    assert stats["table_entries"] == 0
+    assert (stats["hits"], stats["misses"], stats["memo_entries"]) == (1, 2, 2)
+    assert {key: again[key] for key in ("scores", "recommended_course")} == {
+        key: first[key] for key in ("scores", "recommended_course")
+    }
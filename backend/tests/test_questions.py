@@ -0,0 +1,34 @@
+# tests/test_questions.py
+from app.ml.snapshot import bump_revision
+from app.models import Question
+
+async def test_etag_revalidates_until_revision_changes(client, sample_questions):
+    first = await client.get("/api/v1/questionnaire/questions")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = await client.get("/api/v1/questionnaire/questions", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    # Alteração feita por outro worker: o cache local não foi invalidado, só a revisão mudou
+    db = sample_questions
+    question = db.query(Question).order_by(Question.order).first()
+    question.text = "Pergunta alterada"
+    bump_revision(db)
+    db.commit()
+
+    changed = await client.get("/api/v1/questionnaire/questions", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()[0]["text"] == "Pergunta alterada"
+
+async def test_admin_edit_changes_etag(client, admin, sample_questions):
+    first = await client.get("/api/v1/questionnaire/questions")
+    question_id = first.json()[0]["id"]
+
+    response = await client.put(f"/api/v1/admin/questions/{question_id}", json={"text": "Nova pergunta"})
+    assert response.status_code == 200
+
+    changed = await client.get("/api/v1/questionnaire/questions", headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.json()[0]["text"] == "Nova pergunta"
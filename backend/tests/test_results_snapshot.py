@@ -0,0 +1,50 @@
+# tests/test_results_snapshot.py
+from datetime import datetime, timedelta
+
+from app.models import RecommendationResult
+from app.services.results_snapshot import ResultsSnapshot
+
+def add_result(db, result_id, course="Enfermagem"):
+    """Resultado com id explícito, criado antes do atraso do snapshot"""
+    db.add(RecommendationResult(
+        id=result_id,
+        session_id=f"sessao-{result_id}",
+        score_ti=10.0, score_enfermagem=60.0, score_logistica=10.0, score_administracao=10.0, score_estetica=10.0,
+        recommended_course=course,
+        confidence_score=0.5,
+        model_version="teste",
+        processing_time_ms=10,
+        created_at=datetime.utcnow() - timedelta(minutes=5)
+    ))
+    db.commit()
+
+def test_late_commit_below_watermark_is_appended(db, tmp_path):
+    snapshot = ResultsSnapshot(str(tmp_path), lag_seconds=0)
+    add_result(db, 1)
+    add_result(db, 3)
+
+    # O id 2 foi reservado por uma transação que ainda não fez commit
+    assert snapshot.refresh() == 2
+    columns = snapshot.load()
+    assert (columns.watermark, columns.pending_ids) == (3, 1)
+
+    add_result(db, 2, course="Logística")
+    assert snapshot.refresh() == 1
+
+    columns = snapshot.load()
+    assert sorted(columns.id.tolist()) == [1, 2, 3]
+    assert (columns.watermark, columns.pending_ids) == (3, 0)
+    assert columns.courses[columns.course[columns.id == 2][0]] == "Logística"
+    assert snapshot.refresh() == 0
+
+def test_skipped_ids_expire_after_retention(db, tmp_path):
+    snapshot = ResultsSnapshot(str(tmp_path), lag_seconds=0, gap_retention_seconds=3600)
+    add_result(db, 1)
+    add_result(db, 4)
+    snapshot.refresh()
+    assert snapshot.load().pending_ids == 2
+
+    # Transações desfeitas nunca aparecem; a lista não cresce para sempre
+    snapshot.gap_retention_seconds = -1
+    assert snapshot.refresh() == 0
+    assert snapshot.load().pending_ids == 0
@@ -0,0 +1,30 @@
+# tests/test_rollups.py
+from app.models import Question, RecommendationResult, ResultRollupHourly
+from app.services.rollups import hour_bucket, rebuild_rollups
+
+def rollup_rows(db):
+    db.expire_all()
+    return sorted(
+        (row.bucket_start, row.course, row.results, round(row.confidence_sum, 6), row.responses)
+        for row in db.query(ResultRollupHourly)
+    )
+
+async def test_incremental_rollups_match_rebuild(client, db, sample_questions):
+    questions = sample_questions.query(Question).order_by(Question.order).all()
+    for index in range(3):
+        response = await client.post("/api/v1/questionnaire/submit", json={
+            "session_id": f"rollup-{index}",
+            "responses": [
+                {"question_id": question.id, "selected_option_id": question.options[index % 2].id, "response_time_ms": 1500}
+                for question in questions
+            ]
+        })
+        assert response.status_code == 200
+
+    # As rollups incrementais usam o mesmo created_at que o recálculo agrupa
+    incremental = rollup_rows(db)
+    buckets = {hour_bucket(result.created_at) for result in db.query(RecommendationResult)}
+    rebuild_rollups(db)
+
+    assert incremental and rollup_rows(db) == incremental
+    assert {row[0] for row in incremental} == buckets
@@ -0,0 +1,90 @@
+# tests/test_shadow.py
+import time
+
+import numpy as np
+
+from app.ml import lookup as lookup_module
+from app.ml.executor import InferenceExecutor
+from app.ml.features import ResponseEncoder
+from app.ml.registry import SHADOW_POINTER, current_version
+from app.ml.service import MLService
+
+def train_candidate(service, make_sessions, seed=5):
+    """Publica uma versão candidata (ponteiro SHADOW) com o mesmo encoder da atual"""
+    encoder = service.models.encoder
+    sessions = make_sessions(300, seed=seed)
+    y = np.random.RandomState(seed).randint(0, 5, len(sessions))
+    result = service.train(encoder.transform_batch(sessions), y, encoder.feature_names, encoder, shadow=True)
+    assert result["success"]
+    return result["version"]
+
+def wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.01)
+
+async def test_table_hits_feed_model_comparison(encoded_service, small_snapshot, make_sessions, monkeypatch):
+    monkeypatch.setattr(lookup_module, "TABLE_YIELD_RATIO", 0.0)
+    candidate = train_candidate(encoded_service, make_sessions)
+    lookup = encoded_service.answer_lookup.get(small_snapshot)
+    wait_until(lambda: lookup.table)
+
+    executor = InferenceExecutor(encoded_service, batch_max_size=1, shadow_budget_ms=10000)
+    try:
+        for session in make_sessions(50, seed=9):
+            await executor.classify(session, small_snapshot)
+            wait_until(lambda: executor.shadow._pending == 0)
+        summary = executor.shadow.summary()
+    finally:
+        executor.shutdown()
+
+    assert lookup.hits == 50
+    assert summary["candidate_version"] == candidate
+    assert summary["scored"] == 50
+    assert summary["model_agreement_rate"] is not None
+    assert summary["latency_ms"]["primary"] is not None
+
+def test_promote_makes_candidate_current_for_every_worker(encoded_service, make_sessions):
+    primary = encoded_service.model_version
+    candidate = train_candidate(encoded_service, make_sessions)
+    other_worker = MLService(model_path=encoded_service.model_path)
+    assert other_worker.shadow_models.version == candidate
+
+    assert encoded_service.promote_shadow() == candidate
+    assert encoded_service.model_version == candidate and encoded_service.shadow_models is None
+    assert current_version(encoded_service.model_path, SHADOW_POINTER) is None
+
+    assert other_worker.reload_if_changed()
+    assert other_worker.model_version == candidate != primary
+    assert other_worker.shadow_models is None
+
+def test_discard_keeps_current_version(encoded_service, make_sessions):
+    primary = encoded_service.model_version
+    candidate = train_candidate(encoded_service, make_sessions)
+    other_worker = MLService(model_path=encoded_service.model_path)
+
+    assert encoded_service.discard_shadow() == candidate
+    assert encoded_service.discard_shadow() is None
+    assert encoded_service.model_version == primary
+
+    assert not other_worker.reload_if_changed()
+    assert other_worker.model_version == primary
+    assert other_worker.shadow_models is None
+
+def test_hot_swap_clears_weights_only_detail(tmp_path, small_snapshot, make_sessions):
+    # Worker subiu antes do primeiro treino: só pesos até a versão nova aparecer
+    model_path = str(tmp_path / "models")
+    (tmp_path / "models").mkdir()
+    worker = MLService(model_path=model_path)
+    assert worker.status_detail == "Modelos não encontrados; usando apenas pesos"
+
+    trainer = MLService(model_path=model_path, autoload=False)
+    encoder = ResponseEncoder.from_snapshot(small_snapshot)
+    sessions = make_sessions(300, seed=1)
+    y = np.random.RandomState(2).randint(0, 5, len(sessions))
+    assert trainer.train(encoder.transform_batch(sessions), y, encoder.feature_names, encoder)["success"]
+    assert trainer.status == "ready" and trainer.status_detail is None
+
+    assert worker.reload_if_changed()
+    assert worker.has_model and worker.status_detail is None
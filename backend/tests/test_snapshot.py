@@ -0,0 +1,66 @@
+# tests/test_snapshot.py
+import threading
+import time
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.ml.snapshot import QuestionnaireSnapshot, SnapshotStore, bump_revision, questionnaire_revision
+from app.models import QuestionOption
+
+def edit_from_another_worker(db, weight):
+    """Altera um peso direto no banco, como faria o admin em outro worker"""
+    option = db.query(QuestionOption).order_by(QuestionOption.id).first()
+    option.weight_ti = weight
+    bump_revision(db)
+    db.commit()
+    return option.id
+
+def test_snapshot_follows_revision_stored_in_database(sample_questions):
+    db = sample_questions
+    store = SnapshotStore(ttl_seconds=3600)
+    before = store.get(db)
+    assert store.get(db) is before
+
+    option_id = edit_from_another_worker(db, 42)
+    after = store.get(db)
+
+    assert after.revision == questionnaire_revision(db) == before.revision + 1
+    assert after.weights_for(after.option_index[option_id])["ti"] == 42
+
+async def test_async_snapshot_follows_revision_stored_in_database(sample_questions):
+    store = SnapshotStore(ttl_seconds=3600)
+    async with AsyncSessionLocal() as session:
+        before = await store.get_async(session)
+        option_id = edit_from_another_worker(sample_questions, 17)
+        after = await store.get_async(session)
+
+    assert after is not before
+    assert after.weights_for(after.option_index[option_id])["ti"] == 17
+
+def test_concurrent_readers_rebuild_once(sample_questions, monkeypatch):
+    store = SnapshotStore(ttl_seconds=3600)
+    builds = []
+    from_db = QuestionnaireSnapshot.from_db
+
+    def slow_from_db(db, revision=None):
+        builds.append(revision)
+        time.sleep(0.05)
+        return from_db(db, revision)
+
+    monkeypatch.setattr(QuestionnaireSnapshot, "from_db", slow_from_db)
+
+    snapshots = []
+    def read():
+        session = SessionLocal()
+        try:
+            snapshots.append(store.get(session))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len({id(snapshot) for snapshot in snapshots}) == 1
@@ -0,0 +1,79 @@
+# tests/test_submit.py
+import pytest
+
+from app.models import Question, QuestionnaireResponse, RecommendationResult
+
+@pytest.fixture
+def questions(sample_questions):
+    """Perguntas de exemplo com suas opções, na ordem do questionário"""
+    return [
+        (question.id, [option.id for option in question.options])
+        for question in sample_questions.query(Question).order_by(Question.order)
+    ]
+
+def submission(session_id, questions, count=None, choice=0):
+    return {
+        "session_id": session_id,
+        "responses": [
+            {"question_id": question_id, "selected_option_id": options[choice], "response_time_ms": 1500}
+            for question_id, options in questions[:count]
+        ]
+    }
+
+async def test_submit_query_count_does_not_grow_with_answers(client, questions, query_counter):
+    # Primeira submissão carrega o snapshot do questionário
+    response = await client.post("/api/v1/questionnaire/submit", json=submission("aquecimento", questions))
+    assert response.status_code == 200
+
+    with query_counter() as one_answer:
+        response = await client.post("/api/v1/questionnaire/submit", json=submission("uma-resposta", questions, count=1))
+        assert response.status_code == 200
+    with query_counter() as all_answers:
+        response = await client.post("/api/v1/questionnaire/submit", json=submission("todas-respostas", questions))
+        assert response.status_code == 200
+
+    assert len(questions) > 1
+    assert len(one_answer) == len(all_answers), all_answers.statements
+
+async def test_resubmit_with_same_answers_returns_stored_result(client, questions, db, query_counter):
+    payload = submission("repetida", questions)
+    first = await client.post("/api/v1/questionnaire/submit", json=payload)
+    assert first.status_code == 200
+
+    # Ordem e tempos diferentes não mudam a submissão
+    payload["responses"] = [dict(response, response_time_ms=900) for response in reversed(payload["responses"])]
+    with query_counter() as retry:
+        second = await client.post("/api/v1/questionnaire/submit", json=payload)
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert not any(statement.lstrip().upper().startswith("INSERT") for statement in retry.statements)
+    assert db.query(RecommendationResult).filter_by(session_id="repetida").count() == 1
+    assert db.query(QuestionnaireResponse).filter_by(session_id="repetida").count() == len(questions)
+
+async def test_resubmit_with_different_answers_conflicts(client, questions, db):
+    first = await client.post("/api/v1/questionnaire/submit", json=submission("conflito", questions, choice=0))
+    assert first.status_code == 200
+
+    second = await client.post("/api/v1/questionnaire/submit", json=submission("conflito", questions, choice=1))
+
+    assert second.status_code == 409
+    assert db.query(RecommendationResult).filter_by(session_id="conflito").count() == 1
+
+async def test_submit_rejects_unknown_option(client, questions, db):
+    payload = submission("opcao-invalida", questions)
+    payload["responses"][0]["selected_option_id"] = 999999
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+
+    assert response.status_code == 400
+    assert db.query(RecommendationResult).filter_by(session_id="opcao-invalida").count() == 0
+
+async def test_submit_rejects_option_from_another_question(client, questions, db):
+    payload = submission("opcao-trocada", questions)
+    payload["responses"][0]["selected_option_id"] = questions[1][1][0]
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+
+    assert response.status_code == 400
+    assert db.query(QuestionnaireResponse).filter_by(session_id="opcao-trocada").count() == 0
@@ -0,0 +1,79 @@
+# tests/test_training.py
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml import training
+from app.ml.registry import read_metadata, resolve_artifacts
+from app.ml.scheduler import retrain_command
+from app.ml.service import COURSE_INDEX
+from app.ml.training import build_training_matrix, parse_since
+from app.models import QuestionnaireResponse, RecommendationResult
+
+def add_session(db, session_id, created_at, course="Enfermagem", choice=0):
+    db.add(RecommendationResult(
+        session_id=session_id, score_ti=0.0, score_enfermagem=1.0, score_logistica=0.0,
+        score_administracao=0.0, score_estetica=0.0, recommended_course=course,
+        confidence_score=0.5, model_version="1.0.0", processing_time_ms=10, created_at=created_at
+    ))
+    for question_id in range(1, 5):
+        db.add(QuestionnaireResponse(
+            session_id=session_id, question_id=question_id,
+            selected_option_id=question_id * 10 + choice, response_time_ms=1500, created_at=created_at
+        ))
+    db.commit()
+
+def test_retrain_command_passes_trained_at_instant(encoded_service):
+    command = retrain_command(encoded_service.model_path, "incremental")
+
+    since = command[command.index("--since") + 1]
+    trained_at = datetime.fromisoformat(read_metadata(resolve_artifacts(encoded_service.model_path)[0])["trained_at"])
+    assert "--incremental" in command
+    assert parse_since(since) == trained_at.replace(tzinfo=timezone.utc)
+
+def test_since_skips_sessions_earlier_on_the_same_day(db):
+    add_session(db, "antes", datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc))
+    add_session(db, "depois", datetime(2026, 3, 10, 15, 0, tzinfo=timezone.utc))
+
+    X, _, _, _ = build_training_matrix(since=parse_since("2026-03-10T12:00:00"))
+
+    assert X.shape[0] == 1
+
+def test_incremental_update_adds_trees_to_current_model(encoded_service, make_sessions):
+    base_version = encoded_service.model_version
+    trees = encoded_service._sklearn_forest(encoded_service.models).n_estimators
+    encoder = encoded_service.models.encoder
+    sessions = make_sessions(100, seed=11)
+    y = np.arange(len(sessions)) % 5
+
+    # 20 árvores novas; acima de max_trees as mais antigas saem
+    result = encoded_service.update_incremental(encoder.transform_batch(sessions), y, encoder.feature_names, max_trees=trees + 10)
+
+    assert result["success"], result
+    assert result["n_estimators"] == trees + 10
+    assert encoded_service.model_version == result["version"] != base_version
+    assert encoded_service.models.metadata["mode"] == "incremental"
+    assert encoded_service.models.metadata["base_version"] == base_version
+
+    result = encoded_service.update_incremental(encoder.transform_batch(sessions), y, encoder.feature_names[::-1])
+    assert not result["success"]
+    assert encoded_service.models.metadata["base_version"] == base_version
+
+def test_incremental_cli_trains_on_sessions_since(db, encoded_service, monkeypatch):
+    courses = sorted(COURSE_INDEX, key=COURSE_INDEX.get)
+    add_session(db, "antiga", datetime(2026, 3, 1, tzinfo=timezone.utc))
+    for i in range(60):
+        add_session(db, f"nova-{i}", datetime(2026, 3, 10, tzinfo=timezone.utc), courses[i % 5], choice=i // 5 % 2)
+    base_version = encoded_service.model_version
+    monkeypatch.setattr(settings, "model_path", encoded_service.model_path)
+    monkeypatch.setattr(sys, "argv", ["training", "--incremental", "--since", "2026-03-05T00:00:00"])
+
+    training.main()
+
+    directory, version = resolve_artifacts(encoded_service.model_path)
+    metadata = read_metadata(directory)
+    assert version != base_version
+    assert metadata["mode"] == "incremental" and metadata["base_version"] == base_version
+    assert metadata["samples"] == 60
@@ -0,0 +1,93 @@
+# tests/test_write_behind.py
+import pytest
+from sqlalchemy import func
+
+from app.api.v1 import admin as admin_routes, questionnaire
+from app.core.config import settings
+from app.core.write_buffer import WriteBehindBuffer
+from app.models import AggregateCounter, Question, QuestionnaireResponse, ResultRollupHourly
+from app.services.aggregates import TOTAL_RESPONSES
+
+@pytest.fixture
+def payload(sample_questions):
+    return {
+        "session_id": "write-behind",
+        "responses": [
+            {"question_id": question.id, "selected_option_id": question.options[0].id, "response_time_ms": 1500}
+            for question in sample_questions.query(Question).order_by(Question.order)
+        ]
+    }
+
+@pytest.fixture
+def use_writer(monkeypatch):
+    """Liga o write-behind com um buffer novo, parado só quando o teste manda"""
+    monkeypatch.setattr(settings, "responses_write_behind", True)
+
+    def install(on_flush=questionnaire.count_responses):
+        writer = WriteBehindBuffer(QuestionnaireResponse, flush_interval_ms=60000, on_flush=on_flush)
+        writer.start()
+        monkeypatch.setattr(questionnaire, "response_writer", writer)
+        monkeypatch.setattr(admin_routes, "response_writer", writer)
+        return writer
+
+    return install
+
+def response_counts(db):
+    """Respostas gravadas, contador total e soma das rollups"""
+    db.expire_all()
+    counter = db.get(AggregateCounter, TOTAL_RESPONSES)
+    return (
+        db.query(QuestionnaireResponse).count(),
+        counter.count if counter else 0,
+        db.query(func.coalesce(func.sum(ResultRollupHourly.responses), 0)).scalar()
+    )
+
+async def test_buffered_responses_are_counted_when_flushed(client, db, payload, use_writer):
+    writer = use_writer()
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+    assert response.status_code == 200
+    assert response_counts(db) == (0, 0, 0)
+
+    await writer.stop()
+    assert response_counts(db) == (len(payload["responses"]),) * 3
+
+async def test_failed_flush_does_not_count_responses(client, db, payload, use_writer):
+    async def failing_flush(session, rows):
+        await questionnaire.count_responses(session, rows)
+        raise RuntimeError("falha simulada")
+
+    writer = use_writer(on_flush=failing_flush)
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+    assert response.status_code == 200
+
+    await writer.stop()
+    assert writer.failed_rows == len(payload["responses"])
+    assert response_counts(db) == (0, 0, 0)
+
+async def test_rejected_rows_are_counted_with_direct_insert(client, db, payload, use_writer):
+    # Buffer parado: as linhas voltam para a rota, que grava e conta na mesma transação
+    writer = use_writer()
+    await writer.stop()
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+    assert response.status_code == 200
+    assert writer.rejected == 1
+    assert response_counts(db) == (len(payload["responses"]),) * 3
+
+async def test_delete_question_sees_buffered_responses(client, db, payload, use_writer, admin):
+    writer = use_writer()
+
+    response = await client.post("/api/v1/questionnaire/submit", json=payload)
+    assert response.status_code == 200
+    assert writer.stats()["pending_rows"] == len(payload["responses"])
+
+    question_id = payload["responses"][0]["question_id"]
+    response = await client.delete(f"/api/v1/admin/questions/{question_id}")
+
+    assert response.status_code == 200
+    assert "desativada" in response.json()["message"]
+    db.expire_all()
+    assert db.get(Question, question_id).is_active is False
+    await writer.stop()